@@ -1,45 +1,151 @@
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+import threading
 
-# Load environment variables from .env file
-load_dotenv()
+from llm_client import CachedLLMClient, GeminiBackend, HTTPBackend, NoOpBackend, PromptCache
 
-# Get the Gemini API key from environment variables
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Nothing here loads google.generativeai, reads .env or talks to a model until the first
+# LLM call, so importing this module is cheap and never fails for a missing key.
+#
+# Environment (from the process or the .env file):
+#   LLM_BACKEND          gemini, http or noop. Defaults to gemini when GEMINI_API_KEY is
+#                        set, http when LLM_BACKEND_URL is set, else noop (offline).
+#   GEMINI_API_KEY       Key for the gemini backend.
+#   LLM_BACKEND_URL      Endpoint for the http backend (see llm_client.HTTPBackend).
+#   LLM_MODEL_NAME       Gemini model, e.g. 'gemini-pro' or 'gemini-1.5-pro-latest'.
+#   LLM_TIMEOUT_SECONDS  Seconds before a call falls back.
+#   LLM_CACHE_PATH       SQLite file for cached responses.
+DEFAULT_LLM_MODEL_NAME = 'models/gemini-1.5-flash-latest'
+DEFAULT_LLM_TIMEOUT_SECONDS = 15.0
+DEFAULT_LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.llm_cache.sqlite3')
+LLM_CACHE_MAX_ENTRIES = 10000
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600  # LLM answers about card features rarely change within a week
 
-if not GEMINI_API_KEY:
-    print("Error: GEMINI_API_KEY not found in environment variables. Please check your .env file.")
-    exit()
+_lock = threading.RLock()
+_environment_loaded = False
+_backend = None
+_llm_client = None
+
+def load_environment():
+    """
+    Loads variables from the .env file into the environment, once.
+    """
+    global _environment_loaded
+    if not _environment_loaded:
+        with _lock:
+            if not _environment_loaded:
+                try:
+                    from dotenv import load_dotenv
+                except ImportError:
+                    pass # The variables may come from the real environment instead
+                else:
+                    load_dotenv()
+                _environment_loaded = True
+
+def llm_settings():
+    """
+    Returns the LLM settings from the environment (after loading .env).
+    """
+    load_environment()
+    return {
+        'backend': os.getenv('LLM_BACKEND'),
+        'api_key': os.getenv('GEMINI_API_KEY'),
+        'url': os.getenv('LLM_BACKEND_URL'),
+        'model_name': os.getenv('LLM_MODEL_NAME', DEFAULT_LLM_MODEL_NAME),
+        'timeout': float(os.getenv('LLM_TIMEOUT_SECONDS', DEFAULT_LLM_TIMEOUT_SECONDS)),
+        'cache_path': os.getenv('LLM_CACHE_PATH', DEFAULT_LLM_CACHE_PATH),
+    }
+
+def create_backend(settings):
+    """
+    Builds the LLM backend chosen by `settings` (see llm_settings).
+
+    Raises:
+        ValueError: If the backend is unknown or its settings are missing.
+    """
+    name = settings['backend'] or ('gemini' if settings['api_key'] else 'http' if settings['url'] else 'noop')
+    if name == 'gemini':
+        if not settings['api_key']:
+            raise ValueError("GEMINI_API_KEY not found in environment variables. Please check your .env file.")
+        return GeminiBackend(settings['api_key'], settings['model_name'], timeout=settings['timeout'])
+    if name == 'http':
+        if not settings['url']:
+            raise ValueError("LLM_BACKEND_URL is required for the http LLM backend.")
+        return HTTPBackend(settings['url'], timeout=settings['timeout'])
+    if name == 'noop':
+        return NoOpBackend()
+    raise ValueError(f"Unknown LLM_BACKEND: {name!r}")
+
+def get_backend():
+    """
+    Returns the configured LLM backend, created on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = create_backend(llm_settings())
+    return _backend
+
+def set_backend(backend):
+    """
+    Replaces the LLM backend (e.g. with a stub in tests). Drops the current client so the
+    next call builds one around the new backend.
+    """
+    global _backend, _llm_client
+    with _lock:
+        _backend = backend
+        _llm_client = None
+
+def get_llm_client():
+    """
+    Returns the cached, time-bounded client around the backend, created on first use.
+    """
+    global _llm_client
+    if _llm_client is None:
+        with _lock:
+            if _llm_client is None:
+                settings = llm_settings()
+                backend = get_backend()
+                cache = None
+                if not isinstance(backend, NoOpBackend):
+                    cache = PromptCache(settings['cache_path'], max_entries=LLM_CACHE_MAX_ENTRIES,
+                                        ttl_seconds=LLM_CACHE_TTL_SECONDS)
+                _llm_client = CachedLLMClient(backend, cache=cache, timeout=settings['timeout'])
+    return _llm_client
+
+def generate_text(prompt):
+    """
+    Calls the backend once, uncached, and returns the response text (None from the
+    no-op backend). Raises on errors.
+    """
+    return get_backend()(prompt)
 
-# Configure the generative AI model
-genai.configure(api_key=GEMINI_API_KEY)
 def list_available_models():
     """
     Lists all available Gemini models and their supported methods.
     """
+    backend = get_backend()
+    if not isinstance(backend, GeminiBackend):
+        print(f"The {type(backend).__name__} does not list models.")
+        return
     print("\n--- Available Gemini Models ---")
-    for m in genai.list_models():
-        if 'generateContent' in m.supported_generation_methods:
-            print(f"Name: {m.name}, Supported Methods: {m.supported_generation_methods}")
+    for m in backend.list_models():
+        print(f"Name: {m.name}, Supported Methods: {m.supported_generation_methods}")
     print("-------------------------------\n")
 def get_llm_response(prompt):
     """
-    Sends a prompt to the Google Gemini LLM and returns the response.
+    Sends a prompt to the configured LLM (Google Gemini by default) and returns the response.
+
+    Repeated prompts are served from a persistent cache, identical concurrent prompts
+    share one call, and a failed or slow (over LLM_TIMEOUT_SECONDS) call, or the no-op
+    backend, returns "Error: Could not get response from LLM." instead.
     """
-    try:
-        # You can try 'gemini-pro' or 'gemini-1.5-pro-latest' if you have access and want to try it
-        model = genai.GenerativeModel('models/gemini-1.5-flash-latest')
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"An error occurred with Gemini: {e}")
-        return "Error: Could not get response from LLM."
+    return get_llm_client().generate(prompt)
 
 # --- Test the LLM interaction ---
 if __name__ == "__main__":
     list_available_models()
-    print("Testing Gemini LLM response...")
+    print("Testing LLM response...")
     test_prompt = "What are the benefits of a credit card?"
     llm_answer = get_llm_response(test_prompt)
     print(f"\nYour Prompt: {test_prompt}")
@@ -49,4 +155,4 @@ if __name__ == "__main__":
     test_prompt_2 = "Summarize the key features of a good travel credit card."
     llm_answer_2 = get_llm_response(test_prompt_2)
     print(f"\nYour Prompt: {test_prompt_2}")
-    print(f"LLM Answer: {llm_answer_2}")
\ No newline at end of file
+    print(f"LLM Answer: {llm_answer_2}")
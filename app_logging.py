@@ -0,0 +1,124 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+# Name of the logger that carries per-card filter traces. It logs at DEBUG regardless
+# of the application log level, but only inside a request that was sampled for tracing.
+TRACE_LOGGER_NAME = 'advisor.trace'
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is
+# emitted as a structured field.
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_trace_enabled = contextvars.ContextVar('card_trace_enabled', default=False)
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line: timestamp, level, logger, message and
+    any fields passed through `extra=`.
+    """
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, stream=None):
+    """
+    Routes all logging through a queue so request threads never block on stdout.
+
+    Records are put on an in-memory queue by a QueueHandler and written by a single
+    background QueueListener thread. Safe to call more than once; only the first call
+    installs handlers.
+
+    Args:
+        level (str, optional): Root log level. Defaults to $LOG_LEVEL or INFO.
+        stream (optional): Where the listener writes. Defaults to stdout.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    output_handler = logging.StreamHandler(stream or sys.stdout)
+    output_handler.setFormatter(StructuredFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    # Trace records are gated by card_trace(), not by the log level.
+    logging.getLogger(TRACE_LOGGER_NAME).setLevel(logging.DEBUG)
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def _restart_listener_after_fork():
+    # Threads do not survive fork(): a child (e.g. a pre-forked server worker) needs its
+    # own writer thread for the queue it inherited.
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def shutdown_logging():
+    """
+    Flushes queued records and stops the background writer.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def should_trace(sample_rate, forced=False):
+    """
+    Decides whether a request gets per-card traces: always when `forced` (e.g. a debug
+    header), otherwise with probability `sample_rate`.
+    """
+    return forced or (sample_rate > 0 and random.random() < sample_rate)
+
+
+@contextmanager
+def card_trace(enabled):
+    """
+    Enables (or disables) per-card tracing for the code running inside the block.
+    """
+    token = _trace_enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _trace_enabled.reset(token)
+
+
+def card_trace_enabled():
+    """
+    True inside a request sampled for tracing. Hot loops check this once and skip
+    building trace messages entirely otherwise.
+    """
+    return _trace_enabled.get()
@@ -0,0 +1,213 @@
+"""
+ASGI version of the /recommend endpoint.
+
+Shares the recommendation pipeline (and its caches and metrics) with the Flask app in
+main.py, so response bodies are identical, but reads MySQL through aiomysql: a request
+waiting on the database yields the event loop instead of holding a worker thread. With
+CATALOG_BACKEND=sqlite or binary the catalog is read from a local file instead (see
+catalog_store.py and binary_catalog.py).
+Run with:
+
+    uvicorn asgi_app:app --port 8000
+"""
+import asyncio
+import functools
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import main
+from async_db import AsyncDatabaseManager, ThreadedAsyncStore
+from card_catalog import CardCatalog
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCatalogLoader:
+    """
+    Loads the card catalog through the async driver and keeps it fresh from a background
+    task, mirroring CardCatalog's own refresh thread.
+    """
+    def __init__(self, catalog, db_manager, refresh_interval):
+        self.catalog = catalog
+        self.db_manager = db_manager
+        self.refresh_interval = refresh_interval
+        self.snapshot = None
+        self._load_lock = asyncio.Lock()
+
+    async def load(self, version=None):
+        load_snapshot = getattr(self.db_manager, 'load_snapshot', None)
+        if load_snapshot is not None:
+            self.snapshot = self.catalog.install_snapshot(await load_snapshot(version))
+            return self.snapshot
+        if version is None:
+            version = await self.db_manager.fetch_catalog_version()
+        rows = await self.db_manager.fetch_all_credit_cards()
+        # Parsing and index building are CPU work; keep them off the event loop.
+        self.snapshot = await run_in_threadpool(self.catalog.install, rows, version)
+        return self.snapshot
+
+    async def ensure_loaded(self):
+        """
+        Loads the catalog if it is not loaded yet. Concurrent callers wait for one load.
+        """
+        if self.snapshot is not None:
+            return
+        async with self._load_lock:
+            if self.snapshot is None:
+                await self.load()
+
+    async def refresh_if_changed(self):
+        version = await self.db_manager.fetch_catalog_version()
+        current = self.snapshot
+        if current is not None and version is not None and version == current.version:
+            return False
+        async with self._load_lock:
+            await self.load(version)
+        return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_if_changed()
+            except Exception as e:
+                logger.error("Error refreshing card catalog: %s", e)
+
+    def current_snapshot(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise RuntimeError("Card catalog is not available.")
+        return snapshot
+
+
+if main.CATALOG_BACKEND in ('sqlite', 'binary'):
+    db_manager = ThreadedAsyncStore(main.db_manager)
+else:
+    db_manager = AsyncDatabaseManager(
+        main.DB_CONFIG,
+        pool_size=main.POOL_CONFIG['pool_size'],
+        acquire_timeout=main.POOL_CONFIG['acquire_timeout'],
+        max_lifetime_seconds=main.POOL_CONFIG['max_lifetime_seconds']
+    )
+card_catalog = CardCatalog(db_manager, refresh_interval=main.CATALOG_REFRESH_INTERVAL)
+card_catalog.add_listener(main.invalidate_caches)
+catalog_loader = AsyncCatalogLoader(card_catalog, db_manager, main.CATALOG_REFRESH_INTERVAL)
+
+
+def wants_ndjson(request):
+    # Same negotiation as the Flask route (werkzeug's Accept parsing).
+    accept = parse_accept_header(request.headers.get('accept'), MIMEAccept)
+    return request.query_params.get('format') == 'ndjson' or \
+        accept.best_match(['application/json', main.NDJSON_MIMETYPE]) == main.NDJSON_MIMETYPE
+
+
+def json_response(body, status=200):
+    # Byte-for-byte what flask.jsonify produces outside debug mode.
+    with main.stage_latency.time(stage='serialize'):
+        content = main.app.json.dumps(body, separators=(",", ":")) + "\n"
+    return Response(content, status_code=status, media_type='application/json')
+
+
+async def _recommend(request):
+    try:
+        user_input_data = json.loads(await request.body())
+        try:
+            await catalog_loader.ensure_loaded()
+        except Exception as e:
+            # Queries that never reach the catalog (no query, no income) are still answered.
+            logger.error("Error loading card catalog: %s", e)
+        handle = functools.partial(
+            main.handle_recommend_request, user_input_data, catalog_loader.current_snapshot,
+            ndjson=wants_ndjson(request), trace_forced=main.trace_requested(request.headers.get(main.TRACE_HEADER)))
+        # Parsing, scoring and waiting for LLM explanations all block; keep them off the
+        # event loop so one request cannot stall the others.
+        payload, status, streamed = await run_in_threadpool(handle)
+        if streamed:
+            return StreamingResponse(main.iter_ndjson(payload), media_type=main.NDJSON_MIMETYPE)
+        return json_response(payload, status)
+
+    except Exception as e:
+        logger.exception("An internal server error occurred in recommend_cards endpoint")
+        return json_response({"error": "An internal server error occurred.", "details": str(e)}, 500)
+
+
+async def recommend_cards(request):
+    """
+    Recommends cards for one natural-language query. Same request and response format
+    as the Flask /recommend route.
+    """
+    started = time.perf_counter()
+    response = await _recommend(request)
+    main.request_latency.observe(time.perf_counter() - started, endpoint='recommend_cards')
+    main.requests_total.inc(endpoint='recommend_cards', status=str(response.status_code))
+    return response
+
+
+async def _portfolio(request):
+    try:
+        try:
+            user_input_data = json.loads(await request.body())
+        except ValueError:
+            user_input_data = None
+        try:
+            await catalog_loader.ensure_loaded()
+        except Exception as e:
+            logger.error("Error loading card catalog: %s", e)
+        # The portfolio search is CPU work.
+        body, status = await run_in_threadpool(
+            main.handle_portfolio_request, user_input_data, catalog_loader.current_snapshot)
+        return json_response(body, status)
+
+    except Exception as e:
+        logger.exception("An internal server error occurred in recommend_portfolio endpoint")
+        return json_response({"error": "An internal server error occurred.", "details": str(e)}, 500)
+
+
+async def recommend_portfolio(request):
+    """
+    Recommends the best combination of cards. Same request and response format as the
+    Flask /recommend/portfolio route.
+    """
+    started = time.perf_counter()
+    response = await _portfolio(request)
+    main.request_latency.observe(time.perf_counter() - started, endpoint='recommend_portfolio')
+    main.requests_total.inc(endpoint='recommend_portfolio', status=str(response.status_code))
+    return response
+
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        await catalog_loader.ensure_loaded()
+    except Exception as e:
+        # Retried by the first request and by the refresh task.
+        logger.error("Error loading card catalog: %s", e)
+    refresh_task = asyncio.create_task(catalog_loader.run())
+    try:
+        yield
+    finally:
+        refresh_task.cancel()
+        await db_manager.close()
+
+
+app = Starlette(
+    routes=[Route('/recommend', recommend_cards, methods=['POST']),
+            Route('/recommend/portfolio', recommend_portfolio, methods=['POST'])],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='127.0.0.1', port=8000)
@@ -0,0 +1,115 @@
+import asyncio
+import functools
+import logging
+
+import aiomysql
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    """
+    Reads card data through aiomysql, for the ASGI server (asgi_app.py).
+
+    Queries match main.DatabaseManager, so rows (and therefore response bodies) are the
+    same on both paths. Connections come from the driver's own pool, opened on first use;
+    a coroutine waiting for MySQL yields the event loop to other requests instead of
+    holding a thread.
+    """
+    def __init__(self, db_config, pool_size=10, acquire_timeout=5.0, max_lifetime_seconds=3600):
+        """
+        Args:
+            db_config (dict): host / user / password / database, as for the sync pool.
+            pool_size (int): Maximum number of open connections.
+            acquire_timeout (float): Seconds a query waits for a free connection before
+                                     raising asyncio.TimeoutError.
+            max_lifetime_seconds (float): Connections older than this are recycled.
+        """
+        self.db_config = dict(db_config)
+        self.pool_size = pool_size
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._counters = {
+            'queries': 0,
+            'acquire_timeouts': 0,
+        }
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        host=self.db_config.get('host', 'localhost'),
+                        port=self.db_config.get('port', 3306),
+                        user=self.db_config['user'],
+                        password=self.db_config['password'],
+                        db=self.db_config['database'],
+                        minsize=1,
+                        maxsize=self.pool_size,
+                        pool_recycle=self.max_lifetime_seconds,
+                        autocommit=True # No REPEATABLE READ snapshot held between queries
+                    )
+        return self._pool
+
+    async def _fetch_all(self, query, params=()):
+        pool = await self._get_pool()
+        try:
+            connection = await asyncio.wait_for(pool.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._counters['acquire_timeouts'] += 1
+            raise
+        try:
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                self._counters['queries'] += 1
+                return await cursor.fetchall()
+        finally:
+            pool.release(connection)
+
+    async def fetch_all_credit_cards(self):
+        return await self._fetch_all("SELECT * FROM credit_cards")
+
+    async def fetch_catalog_version(self):
+        rows = await self._fetch_all("CHECKSUM TABLE credit_cards")
+        return rows[0].get('Checksum') if rows else None
+
+    def pool_stats(self):
+        stats = dict(self._counters)
+        pool = self._pool
+        stats['pool_size'] = self.pool_size
+        stats['open'] = pool.size if pool is not None else 0
+        stats['idle'] = pool.freesize if pool is not None else 0
+        stats['in_use'] = stats['open'] - stats['idle']
+        return stats
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
+class ThreadedAsyncStore:
+    """
+    Async facade over a synchronous CatalogStore (e.g. catalog_store.SQLiteCatalogStore),
+    so the ASGI server can read a local catalog file. Reads run in a worker thread.
+    """
+    def __init__(self, store):
+        self.store = store
+        if hasattr(store, 'load_snapshot'):
+            # Stores that build whole snapshots (binary_catalog.BinaryCatalogStore) skip rows.
+            self.load_snapshot = functools.partial(asyncio.to_thread, store.load_snapshot)
+
+    async def fetch_all_credit_cards(self):
+        return await asyncio.to_thread(self.store.fetch_all_credit_cards)
+
+    async def fetch_catalog_version(self):
+        return await asyncio.to_thread(self.store.fetch_catalog_version)
+
+    def pool_stats(self):
+        return self.store.pool_stats()
+
+    async def close(self):
+        self.store.close_idle()
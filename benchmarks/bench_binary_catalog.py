@@ -0,0 +1,143 @@
+"""
+Compares the memory-mapped binary catalog (binary_catalog.py) with the dict catalog
+loaded from rows: load time, Python heap held by the snapshot, file size, and
+/recommend latency, and checks that both answer every query identically.
+
+From the repository root:
+
+    python benchmarks/bench_binary_catalog.py --cards 2000 --cards 20000 --cards 100000
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING') # Per-request logging would dominate the timings
+
+import main
+from binary_catalog import BinaryCatalogStore, write_binary_catalog
+from card_catalog import CardCatalog
+from synthetic_data import SyntheticCatalogSource, generate_cards, generate_queries, write_sqlite
+
+
+def timed(operation, repeat):
+    """
+    Returns the median seconds of `repeat` calls to operation().
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def heap_bytes(operation):
+    """
+    Returns the Python heap still allocated after operation(), and its result.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = operation()
+        gc.collect()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return allocated, result
+
+
+def serve(source, queries):
+    """
+    Installs a snapshot from `source` and answers every query twice (caches cleared, so
+    the second pass shows the cost once the touched cards exist). Returns the response
+    bodies and the per-pass median latency in microseconds.
+    """
+    main.card_catalog.db_manager = source
+    main.card_catalog.load()
+    client = main.app.test_client()
+    bodies, passes = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(2):
+            main.invalidate_caches()
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                bodies.append(client.post('/recommend', json={'query': query}).get_data())
+                timings.append(time.perf_counter() - started)
+            passes.append(statistics.median(timings) * 1e6)
+    return bodies[:len(queries)], passes
+
+
+def bench(card_count, query_count, seed, repeat, directory):
+    cards = generate_cards(card_count, seed)
+    queries = generate_queries(query_count, seed)
+    source = SyntheticCatalogSource(cards)
+    sqlite_path = os.path.join(directory, 'catalog.sqlite3')
+    binary_path = os.path.join(directory, 'catalog.ccbin')
+    write_sqlite(cards, sqlite_path)
+    build_seconds = timed(lambda: write_binary_catalog(cards, binary_path, source.fetch_catalog_version()), 1)
+    store = BinaryCatalogStore(binary_path)
+
+    # A fresh store per run, so every load maps the file like a new worker would.
+    rows_load = lambda: CardCatalog(source).load()
+    binary_load = lambda: CardCatalog(BinaryCatalogStore(binary_path)).load()
+    rows_heap, rows_snapshot = heap_bytes(rows_load)
+    binary_heap, binary_snapshot = heap_bytes(binary_load)
+    del rows_snapshot, binary_snapshot
+
+    rows_bodies, rows_passes = serve(source, queries)
+    binary_bodies, binary_passes = serve(store, queries)
+    return {
+        'cards': card_count,
+        'identical': rows_bodies == binary_bodies,
+        'rows': {
+            'load_ms': round(timed(rows_load, repeat) * 1000, 2),
+            'heap_kb': rows_heap // 1024,
+            'sqlite_file_kb': os.path.getsize(sqlite_path) // 1024,
+            'recommend_p50_us': [round(value, 1) for value in rows_passes],
+        },
+        'binary': {
+            'build_ms': round(build_seconds * 1000, 2),
+            'load_ms': round(timed(binary_load, repeat) * 1000, 2),
+            'heap_kb': binary_heap // 1024,
+            'file_kb': os.path.getsize(binary_path) // 1024,
+            'recommend_p50_us': [round(value, 1) for value in binary_passes],
+        },
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, action='append', help='Catalog size (repeatable, default 2000 and 20000)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='Loads timed per catalog (median reported)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for card_count in args.cards or (2000, 20000):
+            result = bench(card_count, args.queries, args.seed, args.repeat, directory)
+            rows, binary = result['rows'], result['binary']
+            print(f"{card_count} cards (responses identical: {result['identical']})")
+            print(f"  load:      rows {rows['load_ms']:>9.2f} ms   binary {binary['load_ms']:>9.2f} ms"
+                  f"   ({rows['load_ms'] / binary['load_ms']:.0f}x)")
+            print(f"  heap:      rows {rows['heap_kb']:>9} KB   binary {binary['heap_kb']:>9} KB (mapped file not counted)")
+            print(f"  file:    sqlite {rows['sqlite_file_kb']:>9} KB   binary {binary['file_kb']:>9} KB"
+                  f"   (binary build {binary['build_ms']:.0f} ms)")
+            print(f"  /recommend p50, first and second pass: rows {rows['recommend_p50_us']} us"
+                  f"   binary {binary['recommend_p50_us']} us")
+            if not result['identical']:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,70 @@
+"""
+Golden-output check and microbenchmark for query_parser.
+
+parser_golden.json holds queries together with the output of the original
+regex-per-keyword parse_user_query. Run from the repository root:
+
+    python benchmarks/bench_parser.py
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from query_parser import parse_user_query, tokenize_query
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_golden.json')
+
+
+def check_golden(corpus):
+    """
+    Returns the corpus entries whose parsed output (including spending order) differs.
+    """
+    mismatches = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for entry in corpus:
+            parsed = parse_user_query(entry['query'])
+            expected = entry['expected']
+            if parsed != expected or list(parsed['spending']) != list(expected['spending']):
+                mismatches.append((entry['query'], parsed, expected))
+    return mismatches
+
+
+def bench(corpus, repeat=5):
+    queries = [entry['query'] for entry in corpus]
+    lowered = [query.lower() for query in queries]
+
+    def tokenize_all():
+        for query in lowered:
+            tokenize_query(query)
+
+    def parse_all():
+        for query in queries:
+            parse_user_query(query)
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, func in (('tokenize_query', tokenize_all), ('parse_user_query', parse_all)):
+            number = 20
+            best = min(timeit.repeat(func, number=number, repeat=repeat))
+            results[name] = best / (number * len(queries)) * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    with open(GOLDEN_PATH) as f:
+        corpus = json.load(f)
+
+    mismatches = check_golden(corpus)
+    for query, parsed, expected in mismatches[:10]:
+        print(f"MISMATCH: {query!r}\n  got:      {parsed}\n  expected: {expected}")
+    print(f"Golden corpus: {len(corpus) - len(mismatches)}/{len(corpus)} queries match.")
+
+    for name, micros in bench(corpus).items():
+        print(f"{name:>18}: {micros:.2f} us/query")
+
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,297 @@
+"""
+End-to-end benchmark suite for the recommendation pipeline, with stored baselines.
+
+Benchmarks, each timed per operation over a seeded synthetic catalog and query corpus
+(see synthetic_data.py):
+
+    parse_user_query       one query
+    filter_loop            the per-card filter loop (filter_cards) for one query
+    select_candidates      the indexed candidate selection /recommend uses, one query
+    rewards_per_card       calculate_estimated_rewards for one card and one spending profile
+    rewards_per_catalog    calculate_estimated_rewards for every card in the catalog, one profile
+    score_catalog          the scoring engine ranking every card in the catalog, one profile
+    portfolio              the best 3-card portfolio over every card in the catalog, one profile
+    recommend_cold         POST /recommend through Flask's test client, caches cleared
+    recommend_cached       POST /recommend through Flask's test client, caches warm
+
+The catalog is served from memory (SyntheticCatalogSource), so no MySQL is needed.
+From the repository root:
+
+    python benchmarks/bench_suite.py --save benchmarks/baselines/baseline.json
+    python benchmarks/bench_suite.py --compare benchmarks/baselines/baseline.json
+
+--compare exits with status 1 if any benchmark's percentile (--metric, default p50) is
+more than --threshold (default 10%) slower than the baseline.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING') # Per-request logging would dominate the timings
+
+import main
+from portfolio import PortfolioOptimizer
+from query_parser import parse_user_query
+from synthetic_data import SyntheticCatalogSource, generate_cards, generate_queries
+
+DEFAULT_WORKLOAD = {'cards': 2000, 'queries': 300, 'seed': 0}
+PERCENTILES = (('p50', 0.50), ('p90', 0.90), ('p99', 0.99))
+
+# Upper bounds on the operations timed per round, so large catalogs stay quick to run.
+MAX_PER_CARD_SAMPLES = 20000
+MAX_PER_CATALOG_PROFILES = 20
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(samples_ns):
+    """
+    Returns count, mean and percentiles (microseconds) for per-operation timings.
+    """
+    samples = sorted(samples_ns)
+    total = sum(samples)
+    summary = {'samples': len(samples), 'mean_us': round(total / len(samples) / 1000, 3) if samples else 0.0}
+    for name, fraction in PERCENTILES:
+        summary[f'{name}_us'] = round(percentile(samples, fraction) / 1000, 3)
+    summary['ops_per_sec'] = round(len(samples) / (total / 1e9), 1) if total else 0.0
+    return summary
+
+
+def time_each(operation, arguments, rounds):
+    """
+    Calls operation(argument) for every argument, once to warm up and then `rounds` times,
+    and returns the per-call timings (ns) of the measured rounds.
+    """
+    perf_counter_ns = time.perf_counter_ns
+    for argument in arguments:
+        operation(argument)
+    samples = []
+    for _ in range(rounds):
+        for argument in arguments:
+            started = perf_counter_ns()
+            operation(argument)
+            samples.append(perf_counter_ns() - started)
+    return samples
+
+
+class Workload:
+    """
+    A synthetic catalog loaded into main's card catalog, plus the parsed query corpus.
+    """
+    def __init__(self, card_count, query_count, seed):
+        self.card_count = card_count
+        self.query_count = query_count
+        self.seed = seed
+        self.queries = generate_queries(query_count, seed)
+        main.card_catalog.db_manager = SyntheticCatalogSource(generate_cards(card_count, seed))
+        self.snapshot = main.card_catalog.load()
+        self.parsed = [parse_user_query(query) for query in self.queries]
+        self.with_income = [parsed for parsed in self.parsed if parsed['income'] is not None]
+        self.spendings = [parsed['spending'] for parsed in self.parsed if parsed['spending']]
+
+
+def bench_parse_user_query(workload, rounds):
+    return time_each(parse_user_query, workload.queries, rounds)
+
+
+def bench_filter_loop(workload, rounds):
+    snapshot = workload.snapshot
+    return time_each(lambda parsed: main.filter_cards(snapshot.cards_for_income(parsed['income']), parsed),
+                     workload.with_income, rounds)
+
+
+def bench_select_candidates(workload, rounds):
+    snapshot = workload.snapshot
+    return time_each(lambda parsed: main.select_candidates(snapshot, parsed), workload.with_income, rounds)
+
+
+def bench_rewards_per_card(workload, rounds):
+    cards = workload.snapshot.cards
+    spendings = workload.spendings
+    step = max(1, len(cards) * len(spendings) // MAX_PER_CARD_SAMPLES)
+    pairs = [(cards[i % len(cards)], spendings[i % len(spendings)])
+             for i in range(0, len(cards) * len(spendings), step)][:MAX_PER_CARD_SAMPLES]
+    return time_each(lambda pair: main.calculate_estimated_rewards(*pair), pairs, rounds)
+
+
+def _rewards_for_catalog(cards, spending):
+    for card in cards:
+        main.calculate_estimated_rewards(card, spending)
+
+
+def bench_rewards_per_catalog(workload, rounds):
+    cards = workload.snapshot.cards
+    return time_each(lambda spending: _rewards_for_catalog(cards, spending),
+                     workload.spendings[:MAX_PER_CATALOG_PROFILES], rounds)
+
+
+def bench_score_catalog(workload, rounds):
+    engine = workload.snapshot.scoring_engine
+    return time_each(engine.rank, workload.spendings, rounds)
+
+
+def bench_portfolio(workload, rounds):
+    engine = workload.snapshot.scoring_engine
+    return time_each(lambda spending: PortfolioOptimizer(engine, spending).optimize(main.DEFAULT_PORTFOLIO_CARDS),
+                     workload.spendings, rounds)
+
+
+def _post_recommend(client, query):
+    response = client.post('/recommend', json={'query': query})
+    if response.status_code != 200:
+        raise RuntimeError(f"/recommend returned {response.status_code} for {query!r}: {response.get_data(as_text=True)}")
+
+
+def bench_recommend_cold(workload, rounds):
+    client = main.app.test_client()
+
+    def recommend(query):
+        main.invalidate_caches()
+        _post_recommend(client, query)
+    return time_each(recommend, workload.queries, rounds)
+
+
+def bench_recommend_cached(workload, rounds):
+    client = main.app.test_client()
+    return time_each(lambda query: _post_recommend(client, query), workload.queries, rounds)
+
+
+BENCHMARKS = {
+    'parse_user_query': bench_parse_user_query,
+    'filter_loop': bench_filter_loop,
+    'select_candidates': bench_select_candidates,
+    'rewards_per_card': bench_rewards_per_card,
+    'rewards_per_catalog': bench_rewards_per_catalog,
+    'score_catalog': bench_score_catalog,
+    'portfolio': bench_portfolio,
+    'recommend_cold': bench_recommend_cold,
+    'recommend_cached': bench_recommend_cached,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(card_count, query_count, seed, rounds, names=None):
+    """
+    Runs the selected benchmarks (all by default).
+
+    Returns:
+        dict: {'meta': run settings and environment, 'benchmarks': name -> summary}.
+    """
+    workload = Workload(card_count, query_count, seed)
+    results = {}
+    # Parsers and loggers from older code paths may print; keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in names or BENCHMARKS:
+            results[name] = summarize(BENCHMARKS[name](workload, rounds))
+    return {
+        'meta': {
+            'cards': card_count,
+            'queries': query_count,
+            'seed': seed,
+            'rounds': rounds,
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, metric='p50', threshold=0.10):
+    """
+    Compares `current` against `baseline` (both from run_suite) on one percentile.
+
+    Returns:
+        list: (name, baseline us, current us, relative change, regressed) per benchmark
+              present in both runs.
+    """
+    rows = []
+    key = f'{metric}_us'
+    for name, result in current['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None or not base.get(key):
+            continue
+        change = result[key] / base[key] - 1
+        rows.append((name, base[key], result[key], change, change > threshold))
+    return rows
+
+
+def print_results(report):
+    meta = report['meta']
+    print(f"{meta['cards']} cards, {meta['queries']} queries, seed {meta['seed']}, {meta['rounds']} rounds "
+          f"(revision {meta['revision']}, Python {meta['python']})")
+    for name, result in report['benchmarks'].items():
+        print(f"{name:>20}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, help=f"Catalog size (default {DEFAULT_WORKLOAD['cards']}, or the baseline's)")
+    parser.add_argument('--queries', type=int, help=f"Query corpus size (default {DEFAULT_WORKLOAD['queries']}, or the baseline's)")
+    parser.add_argument('--seed', type=int, help=f"Generator seed (default {DEFAULT_WORKLOAD['seed']}, or the baseline's)")
+    parser.add_argument('--rounds', type=int, default=3, help='Measured passes over the workload (after one warm-up pass)')
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help='Run only these benchmarks (repeatable)')
+    parser.add_argument('--save', metavar='PATH', help='Write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a JSON baseline')
+    parser.add_argument('--metric', choices=[name for name, _ in PERCENTILES], default='p50')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    baseline = None
+    workload = dict(DEFAULT_WORKLOAD)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Run the baseline's workload unless told otherwise, so like is compared with like.
+        workload.update((key, baseline['meta'][key]) for key in workload)
+    for key in workload:
+        if getattr(args, key) is not None:
+            if baseline is not None and getattr(args, key) != workload[key]:
+                print(f"Warning: --{key} differs from the baseline's; results are not comparable.")
+            workload[key] = getattr(args, key)
+
+    report = run_suite(workload['cards'], workload['queries'], workload['seed'], args.rounds, args.only)
+    print_results(report)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline to {args.save}")
+
+    if baseline is not None:
+        rows = compare(baseline, report, args.metric, args.threshold)
+        print(f"\nCompared with {args.compare} on {args.metric} (threshold {args.threshold:.0%}):")
+        for name, base, current, change, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            print(f"{name:>20}: {base:>12.3f} us -> {current:>12.3f} us  {change:+7.1%}{flag}")
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,122 @@
+"""
+Load test for /recommend: throughput and latency of the Flask and ASGI servers under the
+same concurrent load, plus a check that both return identical response bodies.
+
+Start the servers first, e.g.
+
+    gunicorn -w 1 --threads 8 main:app -b 127.0.0.1:5000
+    uvicorn asgi_app:app --port 8000
+
+then run from the repository root:
+
+    python benchmarks/load_test.py --target flask=http://127.0.0.1:5000 --target asgi=http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_golden.json')
+
+
+def load_queries(limit=None):
+    with open(GOLDEN_PATH) as f:
+        queries = [entry['query'] for entry in json.load(f)]
+    return queries[:limit] if limit else queries
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_load(base_url, queries, requests, concurrency, timeout):
+    """
+    Sends `requests` POST /recommend calls, cycling through `queries`, with at most
+    `concurrency` in flight.
+
+    Returns:
+        dict: Throughput, latency percentiles (ms) and error counts.
+    """
+    latencies = []
+    errors = 0
+    next_request = iter(range(requests))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            for number in next_request:
+                started = time.perf_counter()
+                try:
+                    response = await client.post('/recommend', json={'query': queries[number % len(queries)]})
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def compare_bodies(base_urls, queries, timeout):
+    """
+    Returns the queries whose response status or body differs between the targets.
+    """
+    mismatches = []
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        for query in queries:
+            responses = [await client.post(f'{url}/recommend', json={'query': query}) for url in base_urls]
+            first = responses[0]
+            if any((r.status_code, r.content) != (first.status_code, first.content) for r in responses[1:]):
+                mismatches.append(query)
+    return mismatches
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='Server to load, e.g. flask=http://127.0.0.1:5000 (repeatable)')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--queries', type=int, default=None, help='Use only the first N golden queries')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--skip-body-check', action='store_true')
+    args = parser.parse_args()
+
+    targets = dict(target.split('=', 1) for target in args.target)
+    queries = load_queries(args.queries)
+
+    if len(targets) > 1 and not args.skip_body_check:
+        mismatches = await compare_bodies(list(targets.values()), queries, args.timeout)
+        print(f"Response bodies: {len(queries) - len(mismatches)}/{len(queries)} identical across {', '.join(targets)}")
+        for query in mismatches[:10]:
+            print(f"  differs: {query!r}")
+
+    for name, url in targets.items():
+        # Warm caches and connection pools so every target is measured in steady state.
+        await run_load(url, queries, min(len(queries), args.requests), args.concurrency, args.timeout)
+        result = await run_load(url, queries, args.requests, args.concurrency, args.timeout)
+        print(f"{name:>8}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,338 @@
+"""
+Seeded generator of synthetic card catalogs and query workloads for benchmarks.
+
+Cards have the columns main.py reads (min_income, welcome_bonus_value, affiliate_link
+and a reward_rate JSON in the shape calculate_estimated_rewards expects) plus the
+eligibility text, typed eligibility columns, image_url and apply_link of the seeded
+schema. Queries use the phrasing parse_user_query understands. The same seed always
+produces the same data.
+
+From the repository root:
+
+    python benchmarks/synthetic_data.py --cards 10000 --sql /tmp/cards.sql
+    python benchmarks/synthetic_data.py --cards 100000 --sqlite /tmp/cards.sqlite3
+    python benchmarks/synthetic_data.py --queries 5000 --queries-out /tmp/queries.json
+
+In code, generate_cards() / generate_queries() return in-memory fixtures and
+SyntheticCatalogSource serves the cards to card_catalog.CardCatalog in place of MySQL.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from catalog_store import CatalogStore, export_catalog
+from eligibility import ELIGIBILITY_COLUMNS, parse_eligibility_criteria
+
+# Columns of a generated card row, in table order.
+CARD_FIELDS = (
+    'id', 'name', 'issuer', 'joining_fee', 'annual_fee', 'welcome_bonus_value', 'min_income',
+    'reward_type', 'reward_rate', 'eligibility_criteria') + ELIGIBILITY_COLUMNS + (
+    'special_perks', 'image_url', 'apply_link', 'affiliate_link')
+
+MYSQL_SCHEMA = """CREATE TABLE credit_cards (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    issuer VARCHAR(100) NOT NULL,
+    joining_fee INT,
+    annual_fee INT,
+    welcome_bonus_value INT,
+    min_income INT,
+    reward_type VARCHAR(100),
+    reward_rate TEXT,
+    eligibility_criteria TEXT,
+    salaried_min_monthly_income INT UNSIGNED NULL,
+    salaried_min_annual_income INT UNSIGNED NULL,
+    self_employed_min_monthly_income INT UNSIGNED NULL,
+    self_employed_min_annual_income INT UNSIGNED NULL,
+    special_perks TEXT,
+    image_url VARCHAR(255),
+    apply_link VARCHAR(255),
+    affiliate_link VARCHAR(255),
+    INDEX idx_credit_cards_min_income (min_income),
+    INDEX idx_credit_cards_salaried_min_monthly_income (salaried_min_monthly_income),
+    INDEX idx_credit_cards_self_employed_min_annual_income (self_employed_min_annual_income),
+    INDEX idx_credit_cards_reward_type (reward_type)
+);"""
+
+ISSUERS = (
+    ('HDFC Bank', 'hdfcbank.com'), ('SBI Card', 'sbicard.com'), ('ICICI Bank', 'icicibank.com'),
+    ('Axis Bank', 'axisbank.com'), ('Kotak Mahindra Bank', 'kotak.com'), ('American Express', 'americanexpress.com'),
+    ('IDFC FIRST Bank', 'idfcfirstbank.com'), ('AU Small Finance Bank', 'aubank.in'), ('RBL Bank', 'rblbank.com'),
+    ('Standard Chartered', 'sc.com'), ('HSBC', 'hsbc.co.in'), ('IndusInd Bank', 'indusind.com'), ('Yes Bank', 'yesbank.in')
+)
+PRODUCT_NAMES = (
+    'Millennia', 'Regalia', 'Prime', 'Elite', 'Select', 'Neo', 'Ace', 'Magnus', 'Atlas', 'Vistara', 'Coral',
+    'Rubyx', 'Sapphiro', 'Zenith', 'Wealth', 'Legend', 'Pinnacle', 'Cashback', 'SimplyClick', 'SimplySave',
+    'Swiggy', 'Flipkart', 'Amazon Pay', 'BPCL Octane', 'IndianOil', 'MakeMyTrip', 'Air India', 'Ixigo', 'Tata Neu'
+)
+
+# Card tiers, in increasing order of fees and income requirements. Each tier is picked with
+# `weight`, and its fees, incomes, rates and caps are drawn from the listed choices.
+TIERS = (
+    {'name': 'Classic', 'weight': 30, 'fees': (0, 0, 199, 499), 'min_income': (12000, 15000, 20000, 25000),
+     'base_rate': (0.25, 0.5, 1.0), 'accelerated_rate': (1.5, 2.0, 3.0, 5.0), 'caps': (None, 250, 500, 750),
+     'welcome_bonus': (0, 0, 250, 500), 'perks': 1},
+    {'name': 'Platinum', 'weight': 35, 'fees': (499, 500, 999, 1000), 'min_income': (25000, 30000, 35000, 40000),
+     'base_rate': (0.5, 1.0, 1.25), 'accelerated_rate': (2.0, 3.0, 5.0), 'caps': (None, 500, 1000, 1500),
+     'welcome_bonus': (250, 500, 1000), 'perks': 2},
+    {'name': 'Signature', 'weight': 25, 'fees': (1499, 2499, 2999, 3000), 'min_income': (50000, 60000, 75000),
+     'base_rate': (1.0, 1.5, 2.0), 'accelerated_rate': (3.0, 5.0, 6.0, 10.0), 'caps': (None, 1500, 2500, 3000),
+     'welcome_bonus': (1000, 2500, 3000), 'perks': 3},
+    {'name': 'Infinite', 'weight': 10, 'fees': (5000, 10000, 12500), 'min_income': (100000, 150000, 250000),
+     'base_rate': (1.5, 2.0, 3.3), 'accelerated_rate': (5.0, 10.0, 16.5), 'caps': (None, None, 5000, 10000),
+     'welcome_bonus': (5000, 10000, 12500), 'perks': 4},
+)
+TIER_WEIGHTS = tuple(tier['weight'] for tier in TIERS)
+
+REWARD_TYPES = ('Cashback', 'Reward Points', 'Travel Points', 'Air Miles')
+REWARD_TYPE_WEIGHTS = (45, 35, 12, 8)
+SPENDING_CATEGORIES = ('online_shopping', 'groceries', 'fuel', 'dining', 'travel')
+MERCHANT_RULES = (
+    (['Amazon.in'], 'for Prime members'),
+    (['Amazon.in'], ''),
+    (['Flipkart', 'Myntra'], ''),
+    (['Swiggy', 'Zomato'], 'on food delivery'),
+    (['BookMyShow'], 'on movie tickets'),
+)
+# Perk texts, written so the query parser's perk keywords ("lounge", "fuel surcharge
+# waiver", "dining offers", "amazon prime") find them in special_perks.
+PERKS = (
+    'Complimentary lounge access ({n} domestic per year)',
+    'Complimentary lounge access ({n} domestic, {m} international per year)',
+    'Fuel surcharge waiver',
+    'Dining offers with up to 20% off at partner restaurants',
+    'Complimentary Amazon Prime membership',
+    'Welcome e-gift voucher worth Rs {voucher}',
+    'Renewal fee waiver on annual spends of Rs {waiver} Lakhs',
+    'Complimentary movie tickets every month',
+    'Golf program access',
+)
+
+
+def _eligibility_text(rnd, min_income):
+    annual_lakhs = max(3, round(min_income * 12 * rnd.choice((1.2, 1.4, 1.6)) / 100000))
+    salaried = f"Salaried: {rnd.choice(('Net', 'Gross', 'Minimum Net'))} Monthly Income > Rs {min_income:,}"
+    self_employed = f"Self-Employed: ITR > Rs {annual_lakhs} Lakhs p.a."
+    if rnd.random() < 0.5:
+        salaried = f"Salaried: Age 21-60, {salaried[len('Salaried: '):]}"
+    return f"{salaried}; {self_employed}"
+
+
+def _reward_rules(rnd, tier, reward_type):
+    rules = []
+    for category in rnd.sample(SPENDING_CATEGORIES, rnd.choice((0, 1, 1, 2, 2, 3))):
+        rules.append({'category_type': category, 'rate_percent': rnd.choice(tier['accelerated_rate'])})
+    if rnd.random() < 0.3:
+        merchants, condition = rnd.choice(MERCHANT_RULES)
+        rule = {'category_type': 'specific_merchants', 'rate_percent': rnd.choice(tier['accelerated_rate']),
+                'merchants': list(merchants)}
+        if condition:
+            rule['condition'] = condition
+        rules.append(rule)
+    if not rules or rnd.random() < 0.85:
+        rules.append({'category_type': 'all_other_spends', 'rate_percent': rnd.choice(tier['base_rate'])})
+
+    reward_rate = {'rewards': rules}
+    cap = rnd.choice(tier['caps'])
+    if cap is not None and (reward_type == 'Cashback' or rnd.random() < 0.3):
+        reward_rate['max_cashback_per_month'] = cap
+    return reward_rate
+
+
+def _perks(rnd, tier):
+    count = min(len(PERKS), max(0, tier['perks'] + rnd.choice((-1, 0, 0, 1))))
+    return ','.join(perk.format(n=rnd.choice((2, 4, 8)), m=rnd.choice((2, 4)), voucher=rnd.choice(('500', '1,000', '3,000')),
+                                waiver=rnd.choice((1, 2, 3, 5)))
+                    for perk in rnd.sample(PERKS, count))
+
+
+def generate_card(rnd, card_id):
+    """
+    Generates one card row.
+
+    Args:
+        rnd (random.Random): Source of randomness.
+        card_id (int): The card's id; also makes its name and links unique.
+
+    Returns:
+        dict: Column -> value, with the keys in CARD_FIELDS.
+    """
+    tier = rnd.choices(TIERS, weights=TIER_WEIGHTS)[0]
+    issuer, domain = rnd.choice(ISSUERS)
+    reward_type = rnd.choices(REWARD_TYPES, weights=REWARD_TYPE_WEIGHTS)[0]
+    product = rnd.choice(PRODUCT_NAMES)
+    slug = f"{product}-{tier['name']}-{card_id}".lower().replace(' ', '-')
+    annual_fee = rnd.choice(tier['fees'])
+    min_income = rnd.choice(tier['min_income'])
+    eligibility_criteria = _eligibility_text(rnd, min_income)
+
+    card = {
+        'id': card_id,
+        'name': f"{issuer} {product} {tier['name']} Credit Card {card_id}",
+        'issuer': issuer,
+        'joining_fee': annual_fee if rnd.random() < 0.8 else 0,
+        'annual_fee': annual_fee,
+        'welcome_bonus_value': rnd.choice(tier['welcome_bonus']),
+        'min_income': min_income,
+        'reward_type': reward_type,
+        'reward_rate': json.dumps(_reward_rules(rnd, tier, reward_type)),
+        'eligibility_criteria': eligibility_criteria,
+    }
+    card.update(parse_eligibility_criteria(eligibility_criteria))
+    card.update({
+        'special_perks': _perks(rnd, tier),
+        'image_url': f"https://example.com/cards/{slug}.png",
+        'apply_link': f"https://www.{domain}/credit-cards/{slug}",
+        'affiliate_link': f"https://example.com/apply/{slug}",
+    })
+    return card
+
+
+def generate_cards(count, seed=0):
+    """
+    Generates a catalog of `count` cards with ids 1..count.
+    """
+    rnd = random.Random(seed)
+    return [generate_card(rnd, card_id) for card_id in range(1, count + 1)]
+
+
+# Query building blocks, all in the phrasing query_parser recognises.
+INCOME_PHRASES = ('my income is {income}', 'I earn {income}', 'I make {income}', 'my monthly income is {income}',
+                  'income is {income}', '{income} salary')
+SPENDING_PHRASES = {
+    'online_shopping': ('{amount} on online shopping', '{amount} online', 'spend {amount} for online shopping'),
+    'groceries': ('{amount} on groceries', '{amount} groceries'),
+    'fuel': ('{amount} on fuel', '{amount} for fuel'),
+    'dining': ('{amount} on dining', '{amount} dining'),
+    'travel': ('{amount} on travel', '{amount} travel'),
+}
+PREFERENCE_PHRASES = ('cashback', 'want cashback', 'reward points', 'rewards', 'travel points', 'miles')
+PERK_PHRASES = ('lounge access', 'want lounge access', 'fuel surcharge waiver', 'dining offers', 'amazon prime')
+NO_INCOME_QUERIES = ('hello', 'suggest a good credit card', 'which card is best for travel?', 'cashback card please')
+
+
+def generate_query(rnd):
+    """
+    Generates one natural-language query.
+    """
+    if rnd.random() < 0.03:
+        return rnd.choice(NO_INCOME_QUERIES)
+    income = rnd.choice((15000, 20000, 25000, 30000, 35000, 40000, 50000, 60000, 75000, 80000,
+                         100000, 120000, 150000, 200000, 300000))
+    parts = [rnd.choice(INCOME_PHRASES).format(income=income)]
+    budget = income * rnd.choice((0.2, 0.3, 0.5))
+    for category in rnd.sample(SPENDING_CATEGORIES, rnd.choice((0, 1, 2, 2, 3, 5))):
+        amount = max(500, int(budget * rnd.random() / 500) * 500)
+        parts.append(rnd.choice(SPENDING_PHRASES[category]).format(amount=amount))
+    if rnd.random() < 0.6:
+        parts.append(rnd.choice(PREFERENCE_PHRASES))
+    if rnd.random() < 0.3:
+        parts.append(rnd.choice(PERK_PHRASES))
+    return rnd.choice((', ', ' and ', ' ')).join(parts)
+
+
+def generate_queries(count, seed=0):
+    """
+    Generates `count` queries.
+    """
+    rnd = random.Random(seed)
+    return [generate_query(rnd) for _ in range(count)]
+
+
+class SyntheticCatalogSource(CatalogStore):
+    """
+    Serves generated cards to card_catalog.CardCatalog in place of a DatabaseManager.
+    Change `version` (e.g. after editing `cards`) to make the catalog reload.
+    """
+    def __init__(self, cards, version=1):
+        self.cards = cards
+        self.version = version
+
+    def fetch_all_credit_cards(self):
+        # Fresh dicts, as a cursor would return; the catalog adds keys to its rows.
+        return [dict(card) for card in self.cards]
+
+    def fetch_catalog_version(self):
+        return self.version
+
+    def fetch_credit_cards_by_criteria(self, income=None, reward_preference=None, category_preference=None, perks_preference=None):
+        return [dict(card) for card in self.cards if income is None or card['min_income'] <= income]
+
+
+def _sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def write_sql_dump(cards, out, database='credit_card_advisor_db', batch_size=500):
+    """
+    Writes a MySQL dump that recreates credit_cards with `cards`.
+
+    Args:
+        cards (list): Rows from generate_cards().
+        out (file): Text file to write to.
+        database (str, optional): Database selected with USE; omitted if None.
+        batch_size (int): Rows per INSERT statement.
+    """
+    if database:
+        out.write(f"USE {database};\n\n")
+    out.write("SET FOREIGN_KEY_CHECKS = 0;\nDROP TABLE IF EXISTS credit_cards;\nSET FOREIGN_KEY_CHECKS = 1;\n\n")
+    out.write(MYSQL_SCHEMA + "\n\n")
+    columns = ', '.join(CARD_FIELDS)
+    for start in range(0, len(cards), batch_size):
+        rows = ',\n'.join('(' + ', '.join(_sql_literal(card[field]) for field in CARD_FIELDS) + ')'
+                          for card in cards[start:start + batch_size])
+        out.write(f"INSERT INTO credit_cards ({columns}) VALUES\n{rows};\n\n")
+
+
+def write_sqlite(cards, path):
+    """
+    Writes `cards` to a SQLite catalog file at `path` (replacing any existing file), in the
+    format catalog_store.SQLiteCatalogStore serves.
+    """
+    return export_catalog(SyntheticCatalogSource(cards), path, source_name='synthetic')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=1000, help='Number of cards to generate (10 to 100000)')
+    parser.add_argument('--queries', type=int, default=1000, help='Number of queries to generate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sql', metavar='PATH', help='Write the cards as a MySQL dump')
+    parser.add_argument('--database', default='credit_card_advisor_db', help='Database named in the dump (USE ...)')
+    parser.add_argument('--sqlite', metavar='PATH', help='Write the cards to a SQLite file')
+    parser.add_argument('--json', metavar='PATH', help='Write the cards as a JSON list of rows')
+    parser.add_argument('--queries-out', metavar='PATH', help='Write the queries as a JSON list')
+    args = parser.parse_args()
+
+    if not 10 <= args.cards <= 100000:
+        parser.error("--cards must be between 10 and 100000")
+    if not (args.sql or args.sqlite or args.json or args.queries_out):
+        parser.error("Give at least one of --sql, --sqlite, --json or --queries-out")
+
+    if args.sql or args.sqlite or args.json:
+        cards = generate_cards(args.cards, args.seed)
+        if args.sql:
+            with open(args.sql, 'w') as f:
+                write_sql_dump(cards, f, database=args.database)
+        if args.sqlite:
+            write_sqlite(cards, args.sqlite)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(cards, f)
+        print(f"Generated {len(cards)} cards (seed {args.seed})")
+    if args.queries_out:
+        with open(args.queries_out, 'w') as f:
+            json.dump(generate_queries(args.queries, args.seed), f, indent=1)
+        print(f"Generated {args.queries} queries (seed {args.seed})")
+
+
+if __name__ == '__main__':
+    main()
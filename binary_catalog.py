@@ -0,0 +1,472 @@
+"""
+Compiled, memory-mapped card catalog.
+
+Loading the catalog from MySQL or SQLite parses every row, compiles every card's reward
+rules and rebuilds the scoring matrices and the candidate index in every worker. The
+binary catalog does that work once, offline:
+
+    python binary_catalog.py build catalog.ccbin
+
+reads the catalog from the configured store (main.create_catalog_store) and writes a
+single file holding
+
+- the scoring engine's matrices and the candidate index's arrays and bitsets, as
+  fixed-width little-endian numeric sections;
+- every card column as a fixed-width section: numbers as float64/int64 with a null mask,
+  repetitive strings (issuer, reward type) as ids into an interned string table, free
+  text (names, links, perks, reward rules) as offsets into one UTF-8 blob.
+
+Sections are 64-byte aligned and located by a small JSON table of contents at the end of
+the file. BinaryCatalog maps the file and serves the sections as zero-copy numpy views,
+so workers share one copy through the page cache and a reload costs a few milliseconds
+whatever the catalog size. Cards are only built (as card_model.Card, identical to what
+a normal catalog load produces) when a request actually touches them.
+
+With CATALOG_BACKEND=binary, main serves the catalog from CATALOG_BINARY_PATH through
+BinaryCatalogStore; rebuilding the file (it is replaced atomically) is picked up by the
+catalog's usual refresh check.
+"""
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+from card_catalog import CatalogSnapshot, parse_card_row
+from card_index import CardIndex
+from card_model import DERIVED_CARD_FIELDS, Card, CardSchema
+from catalog_store import CatalogStore, _sqlite_value, catalog_checksum
+from reward_rules import compile_reward_plan
+from scoring_engine import ScoringEngine
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CCBCAT\r\n'
+FORMAT_VERSION = 1
+# magic, format version, table of contents offset, table of contents length
+HEADER = struct.Struct('<8sIQQ')
+SECTION_ALIGNMENT = 64
+# A string column is interned when it has at most one distinct value per this many cards.
+INTERN_RATIO = 4
+NO_STRING = 0xFFFFFFFF # interned id of a NULL
+
+ENGINE_SECTIONS = ('rates', 'coverage', 'other_rates', 'caps', 'valid', 'joining_fees', 'annual_fees', 'welcome_bonuses')
+BITSET_GROUPS = ('reward_type_bits', 'category_bits', 'merchant_bits', 'perk_bits')
+
+
+class BinaryCatalogError(ValueError):
+    """
+    Raised for files that are not binary catalogs, or were written by another format version.
+    """
+
+
+# --- Writing ---
+
+def _column_kind(values, card_count):
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds or kinds == {str}:
+        distinct = {value for value in values if value is not None}
+        return 'interned' if len(distinct) * INTERN_RATIO <= card_count else 'text'
+    if kinds == {float}:
+        return 'float'
+    if kinds == {int}:
+        return 'int'
+    if kinds == {bool}:
+        return 'bool'
+    if kinds == {bytes}:
+        return 'bytes'
+    return 'json'
+
+
+class _FileBuilder:
+    """
+    Collects sections, then writes them aligned, followed by the table of contents.
+    """
+    def __init__(self):
+        self.sections = []
+
+    def add(self, name, array):
+        self.sections.append((name, np.ascontiguousarray(array)))
+
+    def write(self, f, meta):
+        offset = HEADER.size
+        contents = {}
+        f.write(b'\0' * HEADER.size)
+        for name, array in self.sections:
+            padding = -offset % SECTION_ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            contents[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            data = array.tobytes()
+            f.write(data)
+            offset += len(data)
+        toc = json.dumps({'meta': meta, 'sections': contents}, separators=(',', ':')).encode('utf-8')
+        f.write(toc)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, offset, len(toc)))
+
+
+def _text_section(builder, name, encoded):
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    builder.add(f'{name}.offsets', offsets)
+    builder.add(f'{name}.data', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+def write_binary_catalog(rows, path, version=None):
+    """
+    Compiles catalog rows into a binary catalog file at `path`.
+
+    The rows go through the same parsing, engine and index building as a normal catalog
+    load, so the mapped catalog answers exactly like the dict one. The file is written
+    next to `path` and renamed over it, so readers never see a half-written catalog.
+
+    Args:
+        rows (list of dict): `credit_cards` rows, e.g. from fetch_all_credit_cards().
+        path (str): The file to create or replace.
+        version (optional): The catalog version to record, e.g. the store's
+                            fetch_catalog_version(). Defaults to a checksum of the rows.
+
+    Returns:
+        dict: The metadata written (version, card_count, columns, ...).
+    """
+    rows = [{column: _sqlite_value(value) for column, value in row.items()} for row in rows]
+    plans = {}
+    snapshot = CatalogSnapshot([parse_card_row(row, plans) for row in rows], None)
+    cards = snapshot.cards
+    columns = []
+    for card in cards:
+        columns.extend(column for column in card if column not in columns and column not in DERIVED_CARD_FIELDS)
+    if version is None:
+        version = catalog_checksum(columns, [[row.get(column) for column in columns] for row in rows])
+
+    builder = _FileBuilder()
+    engine = snapshot.scoring_engine.arrays()
+    for name in ENGINE_SECTIONS:
+        builder.add(f'engine.{name}', engine[name].astype(np.uint8 if name == 'valid' else '<f8'))
+
+    index = snapshot.card_index.state()
+    builder.add('index.sorted_min_incomes', np.array(index['sorted_min_incomes'], dtype='<f8'))
+    builder.add('index.catalog_index_by_bit', index['catalog_index_by_bit'].astype('<i8'))
+    builder.add('index.bit_by_catalog_index', index['bit_by_catalog_index'].astype('<i8'))
+    byte_length = (len(cards) + 7) // 8
+    bitset_keys = [[group, key] for group in BITSET_GROUPS for key in sorted(index[group])]
+    bitsets = [index[group][key] for group, key in bitset_keys] + [index['unplanned_bits']]
+    builder.add('index.bitsets', np.frombuffer(b''.join(bits.to_bytes(byte_length, 'little') for bits in bitsets),
+                                               dtype=np.uint8).reshape(len(bitsets), byte_length))
+
+    strings = {}
+    column_kinds = {}
+    for column in columns:
+        values = [card.get(column) for card in cards]
+        kind = column_kinds[column] = _column_kind(values, len(cards))
+        nulls = np.array([value is None for value in values], dtype=np.uint8)
+        if nulls.any():
+            builder.add(f'column.{column}.nulls', nulls)
+        if kind == 'float':
+            builder.add(f'column.{column}', np.array([math.nan if value is None else value for value in values], dtype='<f8'))
+        elif kind in ('int', 'bool'):
+            builder.add(f'column.{column}', np.array([value or 0 for value in values], dtype='<i8' if kind == 'int' else np.uint8))
+        elif kind == 'interned':
+            builder.add(f'column.{column}', np.array([NO_STRING if value is None else strings.setdefault(value, len(strings))
+                                                      for value in values], dtype='<u4'))
+        else:
+            if kind == 'text':
+                encoded = [(value or '').encode('utf-8') for value in values]
+            elif kind == 'bytes':
+                encoded = [value or b'' for value in values]
+            else:
+                encoded = [json.dumps(value).encode('utf-8') for value in values]
+            _text_section(builder, f'column.{column}', encoded)
+    _text_section(builder, 'strings', [value.encode('utf-8') for value in strings])
+
+    meta = {
+        'version': version,
+        'card_count': len(cards),
+        'categories': list(snapshot.scoring_engine.categories),
+        'columns': [[column, column_kinds[column]] for column in columns],
+        'bitset_keys': bitset_keys,
+    }
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, 'wb') as f:
+            builder.write(f, meta)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    os.replace(temporary_path, path)
+    logger.info("Wrote binary catalog %s with %d cards (version %s)", path, len(cards), version)
+    return meta
+
+
+# --- Reading ---
+
+class _TextColumn:
+    """
+    Strings stored as offsets into a UTF-8 blob, decoded on access.
+    """
+    def __init__(self, offsets, data, decode):
+        self.offsets = offsets
+        self.data = data
+        self.decode = decode
+
+    def __getitem__(self, index):
+        return self.decode(self.data[int(self.offsets[index]):int(self.offsets[index + 1])].tobytes())
+
+
+class _PerksByBit(Sequence):
+    """
+    The lowercased perk text of each card in index bit order (CardIndex._perks_lower),
+    read from the mapped text only when an unindexed perk is searched for.
+    """
+    def __init__(self, read_perks, catalog_index_by_bit):
+        self.read_perks = read_perks
+        self.catalog_index_by_bit = catalog_index_by_bit
+
+    def __len__(self):
+        return len(self.catalog_index_by_bit)
+
+    def __getitem__(self, bit):
+        return self.read_perks(int(self.catalog_index_by_bit[bit])).lower()
+
+
+class MappedCards(Sequence):
+    """
+    The catalog's cards, read from the mapped columns into card_model.Card objects on
+    first access. Each equals the Card a normal catalog load builds for the same row.
+    """
+    def __init__(self, card_count, readers):
+        """
+        Args:
+            card_count (int): Number of cards.
+            readers (list): (column, read(index) -> value) pairs, in column order.
+        """
+        self.readers = readers
+        self._schema = CardSchema(column for column, _ in readers)
+        self._plans = {} # reward_rate text -> compiled plan, shared like on a normal load
+        self._cards = [None] * card_count
+
+    def __len__(self):
+        return len(self._cards)
+
+    def _materialize(self, index):
+        values = tuple(read(index) for _, read in self.readers)
+        reward_rate = values[self._schema.positions['reward_rate']]
+        reward_plan = self._plans.get(reward_rate)
+        if reward_plan is None:
+            try:
+                reward_plan = self._plans[reward_rate] = compile_reward_plan(reward_rate)
+            except (ValueError, TypeError, AttributeError):
+                # Logged when the file was built; get_reward_plan() re-raises at request time.
+                reward_plan = None
+        card = Card(self._schema, values, reward_plan, index)
+        # Racing threads may both build a card; either copy is equally good.
+        self._cards[index] = card
+        return card
+
+    def take(self, indices):
+        """
+        Returns the cards at `indices` (a list of ints), like [self[i] for i in indices]
+        but without a method call per already materialized card.
+        """
+        cards = self._cards
+        taken = [cards[index] for index in indices]
+        # Identity checks only: `None in taken` would compare every Card by value.
+        for position in [position for position, card in enumerate(taken) if card is None]:
+            taken[position] = self._materialize(indices[position])
+        return taken
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        card = self._cards[index]
+        if card is None:
+            card = self._materialize(range(len(self._cards))[index])
+        return card
+
+
+class BinaryCatalog:
+    """
+    A binary catalog file, memory-mapped read-only.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): A file written by write_binary_catalog().
+
+        Raises:
+            BinaryCatalogError: If the file is not a binary catalog of this format version,
+                                or is truncated.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.file_size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.file_size else b''
+        if len(self._map) < HEADER.size:
+            raise BinaryCatalogError(f"{path} is not a binary catalog")
+        magic, format_version, toc_offset, toc_length = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise BinaryCatalogError(f"{path} is not a binary catalog")
+        if format_version != FORMAT_VERSION:
+            raise BinaryCatalogError(f"{path} has format version {format_version}, expected {FORMAT_VERSION}")
+        # The table of contents is written last, so a file cut short loses it first.
+        if toc_offset + toc_length > len(self._map):
+            raise BinaryCatalogError(f"{path} is truncated ({len(self._map)} bytes, expected {toc_offset + toc_length})")
+        toc = json.loads(self._map[toc_offset:toc_offset + toc_length])
+        self.meta = toc['meta']
+        self._sections = toc['sections']
+        self.version = self.meta['version']
+        self.card_count = self.meta['card_count']
+
+    def section(self, name, dtype=None):
+        """
+        Returns a section as a read-only numpy view of the mapped file (no copy), or None
+        if the file has no such section.
+        """
+        entry = self._sections.get(name)
+        if entry is None:
+            return None
+        shape = tuple(entry['shape'])
+        array = np.frombuffer(self._map, dtype=entry['dtype'], count=math.prod(shape), offset=entry['offset'])
+        return array.reshape(shape).view(dtype) if dtype is not None else array.reshape(shape)
+
+    def _text(self, name, decode):
+        return _TextColumn(self.section(f'{name}.offsets'), self.section(f'{name}.data'), decode)
+
+    def _column_reader(self, column, kind, strings):
+        nulls = self.section(f'column.{column}.nulls')
+        name = f'column.{column}'
+        if kind == 'float':
+            values = self.section(name)
+            read = lambda index: float(values[index])
+        elif kind == 'int':
+            values = self.section(name)
+            read = lambda index: int(values[index])
+        elif kind == 'bool':
+            values = self.section(name)
+            read = lambda index: bool(values[index])
+        elif kind == 'interned':
+            values = self.section(name)
+            read = lambda index: strings[values[index]] if values[index] != NO_STRING else None
+        else:
+            decode = {'text': lambda data: data.decode('utf-8'), 'bytes': bytes, 'json': json.loads}[kind]
+            read = self._text(name, decode).__getitem__
+        if nulls is None:
+            return read
+        return lambda index: None if nulls[index] else read(index)
+
+    def cards(self):
+        """
+        Returns the cards as a lazily materialized sequence (see MappedCards).
+        """
+        strings_column = self._text('strings', lambda data: data.decode('utf-8'))
+        strings = [strings_column[i] for i in range(len(strings_column.offsets) - 1)]
+        readers = [(column, self._column_reader(column, kind, strings)) for column, kind in self.meta['columns']]
+        return MappedCards(self.card_count, readers)
+
+    def snapshot(self):
+        """
+        Builds a CatalogSnapshot over the mapped sections. Only the index bitsets (a bit per
+        card per key) are copied out of the file.
+        """
+        cards = self.cards()
+        engine = ScoringEngine.from_arrays(self.meta['categories'],
+                                           **{name: self.section(f'engine.{name}', bool if name == 'valid' else None)
+                                              for name in ENGINE_SECTIONS})
+        bitsets = self.section('index.bitsets')
+        groups = {group: {} for group in BITSET_GROUPS}
+        for row, (group, key) in enumerate(self.meta['bitset_keys']):
+            groups[group][key] = int.from_bytes(bitsets[row].tobytes(), 'little')
+        catalog_index_by_bit = self.section('index.catalog_index_by_bit')
+        read_perks = dict(cards.readers)['special_perks']
+        card_index = CardIndex.from_state(
+            cards,
+            sorted_min_incomes=self.section('index.sorted_min_incomes'),
+            catalog_index_by_bit=catalog_index_by_bit,
+            bit_by_catalog_index=self.section('index.bit_by_catalog_index'),
+            unplanned_bits=int.from_bytes(bitsets[-1].tobytes(), 'little'),
+            perks_lower=_PerksByBit(read_perks, catalog_index_by_bit),
+            **groups)
+        return CatalogSnapshot.from_parts(cards, engine, card_index, self.version)
+
+
+class BinaryCatalogStore(CatalogStore):
+    """
+    Serves the catalog from a binary catalog file. CardCatalog asks it for whole
+    snapshots (load_snapshot) instead of rows, so loading skips all per-card work.
+    Rebuilding the file changes its version, which the catalog's refresh check notices.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): A file written by write_binary_catalog().
+        """
+        self.path = path
+        self._catalog = None
+        self._file_id = None
+        self._counters = {
+            'maps': 0,
+        }
+
+    def _current_file_id(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def catalog(self):
+        """
+        The mapped file, remapped if it was replaced since the last call.
+        """
+        file_id = self._current_file_id()
+        catalog = self._catalog
+        if catalog is None or file_id != self._file_id:
+            catalog = BinaryCatalog(self.path)
+            self._catalog, self._file_id = catalog, file_id
+            self._counters['maps'] += 1
+        return catalog
+
+    def load_snapshot(self, version=None):
+        """
+        Returns a snapshot of the current file. Its version is the file's own, even if
+        the file was replaced after `version` was read.
+        """
+        return self.catalog().snapshot()
+
+    def fetch_catalog_version(self):
+        return self.catalog().version
+
+    def fetch_all_credit_cards(self):
+        return [card.columns() for card in self.catalog().cards()]
+
+    def fetch_credit_cards_by_criteria(self, income=None, reward_preference=None, category_preference=None, perks_preference=None):
+        cards = self.fetch_all_credit_cards()
+        if income is None:
+            return cards
+        return [card for card in cards if card['min_income'] <= income]
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats['path'] = self.path
+        return stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the card catalog into a memory-mapped binary file.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    build_parser = subcommands.add_parser('build', help=write_binary_catalog.__doc__.strip().splitlines()[0])
+    build_parser.add_argument('path', help='Binary catalog file to write')
+    args = parser.parse_args()
+
+    from main import CATALOG_BACKEND, create_catalog_store
+    if CATALOG_BACKEND == 'binary':
+        parser.error("CATALOG_BACKEND=binary would read the file being built; use mysql or sqlite")
+    store = create_catalog_store()
+    version = store.fetch_catalog_version()
+    meta = write_binary_catalog(store.fetch_all_credit_cards(), args.path, version)
+    print(f"Wrote {meta['card_count']} cards to {args.path} ({os.path.getsize(args.path)} bytes, version {meta['version']})")
@@ -0,0 +1,283 @@
+import logging
+import os
+import threading
+import time
+
+from card_index import CardIndex
+from card_model import CardBuilder
+from reward_rules import compile_reward_plan
+from scoring_engine import ScoringEngine
+
+logger = logging.getLogger(__name__)
+
+# Card columns that are numeric in the schema but may come back from the driver as
+# Decimal, str or None. They are converted once here instead of on every request.
+NUMERIC_CARD_FIELDS = ('min_income', 'joining_fee', 'annual_fee', 'welcome_bonus_value')
+
+# Held while a background refresher checks and reloads the catalog, and across every
+# fork(). A pre-forked worker is therefore never forked while the refresher holds a lock
+# it would inherit forever (pool, cache, metrics), or half way through a reload.
+REFRESH_FORK_LOCK = threading.Lock()
+os.register_at_fork(before=REFRESH_FORK_LOCK.acquire,
+                    after_in_parent=REFRESH_FORK_LOCK.release,
+                    after_in_child=REFRESH_FORK_LOCK.release)
+
+
+def _to_float(value, default=0.0):
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_card_row(row, plans=None):
+    """
+    Converts one raw `credit_cards` row into the typed form used on the hot path.
+
+    Args:
+        row (dict): A row as returned by a dictionary cursor.
+        plans (dict, optional): reward_rate text -> compiled plan, shared across the rows
+                                of one load so identical rules are compiled and kept once.
+
+    Returns:
+        dict: A copy of the row with numeric fields as floats, text fields never None
+              and the reward rules compiled into 'reward_plan'.
+    """
+    card = dict(row)
+    for field in NUMERIC_CARD_FIELDS:
+        card[field] = _to_float(card.get(field))
+    for field in ('reward_type', 'special_perks'):
+        if card.get(field) is None:
+            card[field] = ''
+    if not card.get('reward_rate'):
+        card['reward_rate'] = '{}'
+    reward_rate = card['reward_rate']
+    if plans is not None and isinstance(reward_rate, str) and reward_rate in plans:
+        card['reward_plan'] = plans[reward_rate]
+        return card
+    try:
+        card['reward_plan'] = compile_reward_plan(reward_rate)
+        if plans is not None and isinstance(reward_rate, str):
+            plans[reward_rate] = card['reward_plan']
+    except (ValueError, TypeError, AttributeError) as e:
+        # Left uncompiled; get_reward_plan() re-raises for this card at request time,
+        # which drops it from the results just like a bad row always has.
+        logger.error("Error compiling reward rules for card %s: %s", card.get('name'), e)
+        card['reward_plan'] = None
+    return card
+
+
+class CatalogSnapshot:
+    """
+    An immutable, fully parsed view of the card catalog at one version.
+    """
+    def __init__(self, cards, version):
+        """
+        Args:
+            cards (list of dict): Parsed rows (see parse_card_row), in catalog order.
+            version: The catalog version the rows belong to.
+        """
+        builder = CardBuilder()
+        self.cards = tuple(builder.build(card, index) for index, card in enumerate(cards))
+        self.scoring_engine = ScoringEngine(self.cards)
+        self.card_index = CardIndex(self.cards)
+        self.version = version
+        self.loaded_at = time.time()
+        self._loaded_monotonic = time.monotonic()
+
+    @classmethod
+    def from_parts(cls, cards, scoring_engine, card_index, version):
+        """
+        Wraps an already built engine and index (e.g. from binary_catalog.BinaryCatalog),
+        skipping the per-card parsing. `cards` is a sequence of card_model.Card.
+        """
+        snapshot = cls.__new__(cls)
+        snapshot.cards = cards
+        snapshot.scoring_engine = scoring_engine
+        snapshot.card_index = card_index
+        snapshot.version = version
+        snapshot.loaded_at = time.time()
+        snapshot._loaded_monotonic = time.monotonic()
+        return snapshot
+
+    def age_seconds(self):
+        return time.monotonic() - self._loaded_monotonic
+
+    def cards_for_income(self, income):
+        """
+        Returns the cards whose minimum income requirement is met by `income`.
+        """
+        return self.card_index.cards_for_bits(self.card_index.income_bits(income))
+
+
+class CardCatalog:
+    """
+    Keeps the card catalog in memory and refreshes it in the background.
+
+    The catalog is loaded once, then a daemon thread polls a cheap change marker
+    (see DatabaseManager.fetch_catalog_version) and only reloads the full table when
+    the marker moves. New snapshots are swapped in with a single reference assignment,
+    so request threads always see either the old or the new catalog, never a mix.
+    """
+    def __init__(self, db_manager, refresh_interval=60):
+        """
+        Args:
+            db_manager: Provides fetch_all_credit_cards() and fetch_catalog_version().
+            refresh_interval (float): Seconds between change-marker checks.
+        """
+        self.db_manager = db_manager
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        # Serializes start()/stop(), so concurrent first requests load once and start one refresher.
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+        self._listeners = []
+        self._counters = {
+            'reloads': 0,
+            'refresh_checks': 0,
+            'refresh_errors': 0,
+        }
+
+    def load(self, version=None):
+        """
+        Loads the full catalog from the database and swaps it in.
+
+        Stores that can build a snapshot themselves (load_snapshot(version), e.g.
+        binary_catalog.BinaryCatalogStore) are asked for one instead of rows.
+
+        Args:
+            version (optional): The change marker the rows belong to, if already known.
+
+        Returns:
+            CatalogSnapshot: The newly installed snapshot.
+        """
+        with self._load_lock:
+            if version is None:
+                version = self.db_manager.fetch_catalog_version()
+            load_snapshot = getattr(self.db_manager, 'load_snapshot', None)
+            if load_snapshot is not None:
+                return self.install_snapshot(load_snapshot(version))
+            rows = self.db_manager.fetch_all_credit_cards()
+            return self.install(rows, version)
+
+    def install(self, rows, version):
+        """
+        Parses already-fetched rows into a snapshot and swaps it in. Used by load(), and
+        by callers that fetch rows themselves (e.g. the async server's MySQL driver).
+
+        Returns:
+            CatalogSnapshot: The newly installed snapshot.
+        """
+        plans = {}
+        return self.install_snapshot(CatalogSnapshot([parse_card_row(row, plans) for row in rows], version))
+
+    def install_snapshot(self, snapshot):
+        """
+        Swaps in an already built snapshot and notifies the listeners.
+
+        Returns:
+            CatalogSnapshot: `snapshot`.
+        """
+        version = snapshot.version
+        self._snapshot = snapshot
+        self._counters['reloads'] += 1
+        logger.info("Loaded card catalog version %s with %d cards", version, len(snapshot.cards))
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.exception("Error in card catalog listener")
+        return snapshot
+
+    def add_listener(self, listener):
+        """
+        Registers `listener(snapshot)` to be called after every new snapshot is installed,
+        e.g. to invalidate caches derived from the previous catalog.
+        """
+        self._listeners.append(listener)
+
+    def refresh_if_changed(self):
+        """
+        Reloads the catalog only if the database change marker differs from the
+        loaded snapshot's version.
+
+        Returns:
+            bool: True if a new snapshot was installed.
+        """
+        self._counters['refresh_checks'] += 1
+        version = self.db_manager.fetch_catalog_version()
+        current = self._snapshot
+        if current is not None and version is not None and version == current.version:
+            return False
+        self.load(version)
+        return True
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                with REFRESH_FORK_LOCK:
+                    self.refresh_if_changed()
+            except Exception as e:
+                self._counters['refresh_errors'] += 1
+                logger.error("Error refreshing card catalog: %s", e)
+
+    def start(self):
+        """
+        Loads the catalog (if not loaded yet) and starts the background refresher.
+        A failed initial load is retried by the refresher instead of raising.
+        Safe to call from several threads at once; callers that find the catalog
+        loaded and the refresher running return without doing anything.
+        """
+        with self._start_lock:
+            if self._snapshot is None:
+                try:
+                    self.load()
+                except Exception as e:
+                    self._counters['refresh_errors'] += 1
+                    logger.error("Error loading card catalog: %s", e)
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._stop_event.clear()
+                self._refresh_thread = threading.Thread(target=self._refresh_loop, name='card-catalog-refresh', daemon=True)
+                self._refresh_thread.start()
+
+    def stop(self):
+        with self._start_lock:
+            self._stop_event.set()
+            if self._refresh_thread is not None:
+                self._refresh_thread.join(timeout=5)
+                self._refresh_thread = None
+
+    @property
+    def snapshot(self):
+        """
+        The current snapshot. Loads synchronously on first access if start() was
+        never called (e.g. when the app is imported by a WSGI server).
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.start()
+            snapshot = self._snapshot
+            if snapshot is None:
+                raise RuntimeError("Card catalog is not available.")
+        return snapshot
+
+    def age_seconds(self):
+        snapshot = self._snapshot
+        return snapshot.age_seconds() if snapshot is not None else None
+
+    def stats(self):
+        """
+        Returns catalog metrics, including how old the served snapshot is.
+        """
+        snapshot = self._snapshot
+        stats = dict(self._counters)
+        stats['loaded'] = snapshot is not None
+        stats['version'] = str(snapshot.version) if snapshot is not None else None
+        stats['card_count'] = len(snapshot.cards) if snapshot is not None else 0
+        stats['snapshot_age_seconds'] = round(snapshot.age_seconds(), 3) if snapshot is not None else None
+        stats['loaded_at'] = snapshot.loaded_at if snapshot is not None else None
+        return stats
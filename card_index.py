@@ -0,0 +1,202 @@
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+from query_parser import PERK_KEYWORDS
+from reward_rules import get_reward_plan
+
+# Reward preferences and the card reward types that satisfy them (see main.filter_cards).
+POINTS_REWARD_TYPES = ('reward points', 'travel points', 'air miles')
+REWARD_TYPE_GROUPS = {
+    'cashback': ('cashback',),
+    **{reward_type: POINTS_REWARD_TYPES for reward_type in POINTS_REWARD_TYPES}
+}
+
+
+class CardIndex:
+    """
+    Inverted index over a catalog snapshot, so candidate selection is a few bitset
+    intersections instead of a per-card loop.
+
+    Bitsets are Python ints. Bit i stands for the card with the i-th lowest min_income
+    (ties in catalog order), which makes "min_income <= income" the low k bits, with k
+    found by binary search over the sorted min_income values. Every other constraint
+    (reward type, category, perk, merchant) maps to a precomputed bitset over the same
+    positions.
+
+    Results match main.filter_cards exactly, including catalog order.
+    """
+    def __init__(self, cards):
+        """
+        Args:
+            cards (sequence of Card): Catalog cards, with catalog_index equal to their position.
+        """
+        # NaN never satisfies "min_income <= income", so it sorts after every real value.
+        income_keys = [card.min_income if not math.isnan(card.min_income) else math.inf for card in cards]
+        order = sorted(range(len(cards)), key=lambda index: (income_keys[index], index))
+
+        reward_type_bits = {}
+        category_bits = {}
+        merchant_bits = {}
+        unplanned_bits = 0 # cards whose reward rules failed to compile
+        perks_lower = [None] * len(cards)
+
+        for bit, index in enumerate(order):
+            card = cards[index]
+            mask = 1 << bit
+            reward_type = card.reward_type_lower
+            reward_type_bits[reward_type] = reward_type_bits.get(reward_type, 0) | mask
+            plan = card.reward_plan
+            if plan is None:
+                unplanned_bits |= mask
+            else:
+                for category in plan.filter_categories:
+                    category_bits[category] = category_bits.get(category, 0) | mask
+                for merchant in plan.merchants:
+                    merchant_bits[merchant] = merchant_bits.get(merchant, 0) | mask
+            perks_lower[bit] = card.special_perks_lower
+
+        self._set_state(cards, [income_keys[index] for index in order], np.array(order, dtype=np.int64),
+                        reward_type_bits, category_bits, merchant_bits, unplanned_bits, perks_lower)
+        # Perks are matched as substrings of the perk text, so the parser's vocabulary is
+        # indexed up front; any other wording is scanned on demand (see perk_bits).
+        for perk in {perk for _, perk in PERK_KEYWORDS} | {keyword for keyword, _ in PERK_KEYWORDS}:
+            self._perk_bits[perk] = self._scan_perks(perk)
+
+    @classmethod
+    def from_state(cls, cards, sorted_min_incomes, catalog_index_by_bit, reward_type_bits, category_bits,
+                   merchant_bits, perk_bits, unplanned_bits, perks_lower, bit_by_catalog_index=None):
+        """
+        Rebuilds an index from its state (see state()), e.g. memory-mapped from a binary
+        catalog file, without looking at any card.
+
+        Args:
+            perks_lower (sequence of str): Lowercased perk text by bit, only read when a
+                                           perk outside the indexed vocabulary is asked for.
+        """
+        index = cls.__new__(cls)
+        index._set_state(cards, sorted_min_incomes, catalog_index_by_bit, reward_type_bits, category_bits,
+                         merchant_bits, unplanned_bits, perks_lower, bit_by_catalog_index)
+        index._perk_bits.update(perk_bits)
+        return index
+
+    def _set_state(self, cards, sorted_min_incomes, catalog_index_by_bit, reward_type_bits, category_bits,
+                   merchant_bits, unplanned_bits, perks_lower, bit_by_catalog_index=None):
+        self.cards = cards
+        self._sorted_min_incomes = sorted_min_incomes
+        self._catalog_index_by_bit = catalog_index_by_bit
+        self._bit_by_catalog_index = (np.argsort(catalog_index_by_bit) if bit_by_catalog_index is None
+                                      else bit_by_catalog_index)
+        self._byte_length = (len(cards) + 7) // 8
+        self.all_bits = (1 << len(cards)) - 1
+        self._reward_type_bits = reward_type_bits
+        self._category_bits = category_bits
+        self._merchant_bits = merchant_bits
+        self._perk_bits = {}
+        self._unplanned_bits = unplanned_bits
+        self._perks_lower = perks_lower
+
+    def state(self):
+        """
+        The index's contents except the cards, as accepted by from_state().
+        """
+        return {
+            'sorted_min_incomes': self._sorted_min_incomes,
+            'catalog_index_by_bit': self._catalog_index_by_bit,
+            'bit_by_catalog_index': self._bit_by_catalog_index,
+            'reward_type_bits': self._reward_type_bits,
+            'category_bits': self._category_bits,
+            'merchant_bits': self._merchant_bits,
+            'perk_bits': self._perk_bits,
+            'unplanned_bits': self._unplanned_bits,
+            'perks_lower': self._perks_lower,
+        }
+
+    def _scan_perks(self, perk_lower):
+        bits = 0
+        for bit, perks in enumerate(self._perks_lower):
+            if perk_lower in perks:
+                bits |= 1 << bit
+        return bits
+
+    def income_bits(self, income):
+        """
+        Cards whose minimum income is at most `income` (all cards if it is None).
+        """
+        if income is None:
+            return self.all_bits
+        if income != income: # NaN
+            return 0
+        return (1 << bisect_right(self._sorted_min_incomes, income)) - 1
+
+    def reward_type_bits(self, reward_preference):
+        reward_types = REWARD_TYPE_GROUPS.get(reward_preference.lower(), ())
+        bits = 0
+        for reward_type in reward_types:
+            bits |= self._reward_type_bits.get(reward_type, 0)
+        return bits
+
+    def category_bits(self, category_preference, candidates):
+        """
+        Cards with a reward rule for `category_preference`. Cards with merchant-specific
+        rules count as online shopping cards (see RewardPlan.matches_category).
+
+        Candidates whose rules failed to compile are checked one by one, which raises
+        the compile error exactly as the per-card filter does.
+        """
+        bits = self._category_bits.get(category_preference.lower(), 0)
+        if category_preference == 'online_shopping':
+            bits |= self._category_bits.get('specific_merchants', 0)
+        unplanned = candidates & self._unplanned_bits
+        for card in self.cards_for_bits(unplanned):
+            if get_reward_plan(card).matches_category(category_preference):
+                bits |= 1 << int(self._bit_by_catalog_index[card.catalog_index])
+        return bits
+
+    def perk_bits(self, perk_preference):
+        perk_lower = perk_preference.lower()
+        bits = self._perk_bits.get(perk_lower)
+        if bits is None:
+            bits = self._scan_perks(perk_lower)
+        return bits
+
+    def merchant_bits(self, merchant):
+        return self._merchant_bits.get(merchant.lower(), 0)
+
+    def cards_for_bits(self, bits):
+        """
+        Decodes a bitset into its cards, in catalog order.
+        """
+        if not bits:
+            return []
+        packed = np.frombuffer(bits.to_bytes(self._byte_length, 'little'), dtype=np.uint8)
+        positions = np.flatnonzero(np.unpackbits(packed, bitorder='little'))
+        indices = np.sort(self._catalog_index_by_bit[positions]).tolist()
+        take = getattr(self.cards, 'take', None) # lazily materialized cards (binary_catalog.MappedCards)
+        if take is not None:
+            return take(indices)
+        cards = self.cards
+        return [cards[index] for index in indices]
+
+    def select(self, parsed_query):
+        """
+        Returns the cards that pass the income, reward type, category and perk filters
+        for a parsed query, in catalog order.
+        """
+        eligible = self.income_bits(parsed_query.get('income'))
+        if not eligible:
+            return []
+        candidates = eligible
+        reward_preference = parsed_query.get('reward_preference')
+        category_preference = parsed_query.get('category_preference')
+        perks_preference = parsed_query.get('perks_preference')
+
+        if reward_preference:
+            candidates &= self.reward_type_bits(reward_preference)
+        if category_preference:
+            # Checked against every income-eligible card, as the per-card filter does.
+            candidates &= self.category_bits(category_preference, eligible)
+        if perks_preference:
+            candidates &= self.perk_bits(perks_preference)
+        return self.cards_for_bits(candidates)
@@ -0,0 +1,182 @@
+"""
+The card type the catalog serves from.
+"""
+from collections.abc import Mapping
+from operator import itemgetter
+
+# Keys every catalog card has besides its table columns (see card_catalog.parse_card_row).
+DERIVED_CARD_FIELDS = ('reward_plan', 'catalog_index')
+# Columns kept as typed Card attributes, and their values when a row has no such column
+# (the defaults the row-dict code used with card.get()).
+TYPED_CARD_FIELDS = (
+    ('id', None), ('name', None), ('issuer', None), ('min_income', 0.0), ('joining_fee', 0.0),
+    ('annual_fee', 0.0), ('welcome_bonus_value', 0.0), ('reward_type', ''), ('reward_rate', '{}'),
+    ('special_perks', ''), ('affiliate_link', None),
+)
+# Text columns whose values repeat across cards; CardBuilder keeps one copy of each value.
+SHARED_TEXT_COLUMNS = ('issuer', 'reward_type', 'reward_rate', 'eligibility_criteria', 'special_perks')
+
+
+def _immutable(self, *args):
+    raise AttributeError(f"{type(self).__name__} objects are immutable")
+
+
+class CardSchema:
+    """
+    The columns of a catalog's rows, shared by all of its cards.
+    """
+    __slots__ = ('columns', 'positions', 'shared_positions', '_typed_getter', '_typed_defaults')
+
+    def __init__(self, columns):
+        """
+        Args:
+            columns (sequence of str): Column names, in row order.
+        """
+        self.columns = tuple(columns)
+        self.positions = {column: position for position, column in enumerate(self.columns)}
+        self.shared_positions = tuple(self.positions[column] for column in SHARED_TEXT_COLUMNS if column in self.positions)
+        # Missing typed columns read their default from a tuple appended to the values.
+        defaults = tuple(default for field, default in TYPED_CARD_FIELDS if field not in self.positions)
+        missing = iter(range(len(self.columns), len(self.columns) + len(defaults)))
+        self._typed_getter = itemgetter(*(self.positions[field] if field in self.positions else next(missing)
+                                          for field, _ in TYPED_CARD_FIELDS))
+        self._typed_defaults = defaults
+
+    def typed_values(self, values):
+        """
+        The TYPED_CARD_FIELDS values of one row, in that order.
+        """
+        return self._typed_getter(values + self._typed_defaults if self._typed_defaults else values)
+
+
+class Card(Mapping):
+    """
+    One catalog card, built once by the catalog loader.
+
+    The fields the hot loops read are slotted attributes, typed at load time: fees, welcome
+    bonus and minimum income as floats, text never None, and the reward type and perks
+    also kept lowercased. Requests therefore never call float() or lower() per card.
+
+    A Card also reads as a read-only mapping of its columns plus 'reward_plan' and
+    'catalog_index': card['name'], card.get('issuer'), dict(card) give the same keys and
+    values as the parse_card_row dict it replaces. The column values live in one tuple
+    per card, and the column names (a CardSchema) are shared by every card of a snapshot.
+    """
+    __slots__ = tuple(field for field, _ in TYPED_CARD_FIELDS) + (
+        'reward_type_lower', 'special_perks_lower', 'reward_plan', 'catalog_index', '_schema', '_values')
+
+    def __init__(self, schema, values, reward_plan, catalog_index, strings=None):
+        """
+        Args:
+            schema (CardSchema): The row's columns, shared between cards.
+            values (tuple): The parsed column values (see card_catalog.parse_card_row).
+            reward_plan (RewardPlan or None): The compiled reward rules, None if they failed
+                                              to compile.
+            catalog_index (int): Position of the card in its snapshot, and its row in the
+                                 scoring engine's matrices.
+            strings (dict, optional): Pool the lowercased texts are shared through (see
+                                      CardBuilder).
+        """
+        set_field = object.__setattr__
+        (card_id, name, issuer, min_income, joining_fee, annual_fee, welcome_bonus_value,
+         reward_type, reward_rate, special_perks, affiliate_link) = schema.typed_values(values)
+        set_field(self, 'id', card_id)
+        set_field(self, 'name', name)
+        set_field(self, 'issuer', issuer)
+        set_field(self, 'min_income', min_income)
+        set_field(self, 'joining_fee', joining_fee)
+        set_field(self, 'annual_fee', annual_fee)
+        set_field(self, 'welcome_bonus_value', welcome_bonus_value)
+        set_field(self, 'reward_type', reward_type)
+        reward_type_lower = (reward_type or '').lower()
+        special_perks_lower = (special_perks or '').lower()
+        if strings is not None:
+            reward_type_lower = strings.setdefault(reward_type_lower, reward_type_lower)
+            special_perks_lower = strings.setdefault(special_perks_lower, special_perks_lower)
+        set_field(self, 'reward_type_lower', reward_type_lower)
+        set_field(self, 'reward_rate', reward_rate)
+        set_field(self, 'special_perks', special_perks)
+        set_field(self, 'special_perks_lower', special_perks_lower)
+        set_field(self, 'affiliate_link', affiliate_link)
+        set_field(self, 'reward_plan', reward_plan)
+        set_field(self, 'catalog_index', catalog_index)
+        set_field(self, '_schema', schema)
+        set_field(self, '_values', values)
+
+    __setattr__ = _immutable
+    __delattr__ = _immutable
+
+    def __reduce__(self):
+        return type(self), (self._schema, self._values, self.reward_plan, self.catalog_index)
+
+    def __getitem__(self, key):
+        position = self._schema.positions.get(key)
+        if position is not None:
+            return self._values[position]
+        if key in DERIVED_CARD_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        position = self._schema.positions.get(key)
+        if position is not None:
+            return self._values[position]
+        if key in DERIVED_CARD_FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __iter__(self):
+        yield from self._schema.columns
+        yield from DERIVED_CARD_FIELDS
+
+    def __len__(self):
+        return len(self._schema.columns) + len(DERIVED_CARD_FIELDS)
+
+    def __contains__(self, key):
+        return key in self._schema.positions or key in DERIVED_CARD_FIELDS
+
+    def columns(self):
+        """
+        The card's table columns (without the derived fields) as a new dict, i.e. the row.
+        """
+        return dict(zip(self._schema.columns, self._values))
+
+    def __repr__(self):
+        return f"Card(catalog_index={self.catalog_index!r}, name={self.name!r})"
+
+
+class CardBuilder:
+    """
+    Builds the Cards of one catalog load.
+
+    The cards share one CardSchema per column layout and one object per distinct value of
+    the SHARED_TEXT_COLUMNS: driver rows carry their own copy of every issuer, reward type,
+    perk list and so on.
+    """
+    def __init__(self):
+        self._layouts = {} # row keys -> (CardSchema, row values getter)
+        self._strings = {}
+
+    def build(self, card, catalog_index):
+        """
+        Builds a Card from a parse_card_row dict.
+
+        Args:
+            card (dict): A parsed row, with its compiled 'reward_plan'.
+            catalog_index (int): Position of the card in its snapshot.
+        """
+        keys = tuple(card)
+        layout = self._layouts.get(keys)
+        if layout is None:
+            columns = [key for key in keys if key not in DERIVED_CARD_FIELDS]
+            getter = itemgetter(*columns) if len(columns) > 1 else lambda row: tuple(row[key] for key in columns)
+            layout = self._layouts[keys] = (CardSchema(columns), getter)
+        schema, row_values = layout
+        strings = self._strings
+        values = list(row_values(card))
+        for position in schema.shared_positions:
+            value = values[position]
+            if type(value) is str:
+                values[position] = strings.setdefault(value, value)
+        values = tuple(values)
+        return Card(schema, values, card.get('reward_plan'), catalog_index, strings)
@@ -0,0 +1,193 @@
+import json
+import re
+
+from reward_rules import SPENDING_CATEGORIES
+
+# Canonical reward categories stored in card_reward_rules.category.
+ALL_OTHER_CATEGORY = 'all_other'
+
+# Words in reward_rate text (and in a requested spending category) that mean each category.
+# Merchant names also become card_reward_rules.merchant.
+CATEGORY_KEYWORDS = {
+    'online_shopping': ('online', 'e-commerce', 'digital', 'app'),
+    'fuel': ('fuel', 'petrol'),
+    'groceries': ('groceries', 'supermarket', 'daily needs', 'departmental stores'),
+    'dining': ('dining', 'restaurant', 'food'),
+    'travel': ('travel', 'flights', 'hotels', 'trains', 'tourism', 'airport')
+}
+MERCHANT_CATEGORIES = {
+    'amazon': 'online_shopping',
+    'flipkart': 'online_shopping',
+    'myntra': 'online_shopping',
+    'tata cliq': 'online_shopping',
+    'bookmyshow': 'online_shopping',
+    'cult.fit': 'online_shopping',
+    'swiggy': 'online_shopping',
+    'zomato': 'online_shopping',
+    'ola': 'online_shopping',
+    'uber': 'online_shopping'
+}
+
+# card_perks.perk_code values and the special_perks wording that implies them.
+PERK_KEYWORDS = {
+    'lounge_access': ('lounge',),
+    'fuel_surcharge_waiver': ('fuel surcharge',),
+    'dining_offers': ('dining',),
+    'amazon_prime': ('amazon prime',),
+    'vouchers': ('voucher',),
+    'welcome_benefit': ('welcome',),
+    'fee_waiver': ('fee waiver', 'no joining', 'no annual', 'lifetime free')
+}
+# Whole perk requests that mean exactly one code: the code's own name and its keywords.
+# Anything more specific ("Amazon vouchers") is narrower than the code and is not here.
+PERK_PHRASES = {phrase: code for code, keywords in PERK_KEYWORDS.items()
+                for phrase in (code.replace('_', ' '),) + keywords}
+# Perks that count towards a spending category filter (a travel card is one with lounge access, ...).
+CATEGORY_PERKS = {
+    'fuel': ('fuel_surcharge_waiver',),
+    'travel': ('lounge_access',),
+    'dining': ('dining_offers',)
+}
+
+# "5%", "2.5 %", "10 reward points per Rs 100", "5X points". Anything up to the next rate
+# is what that rate applies to.
+RATE_PATTERN = re.compile(
+    r"(?P<rate>\d+(?:\.\d+)?)\s*(?:%|x?\s*(?:reward\s+)?points?(?:\s+per\s+rs\.?\s*100)?)", re.IGNORECASE)
+CAP_PATTERN = re.compile(r"max(?:imum)?\.?\s*(?:of\s*)?rs\.?\s*(?P<cap>\d[\d,]*)", re.IGNORECASE)
+ALL_OTHER_PATTERN = re.compile(r"all other|other spends|everything else", re.IGNORECASE)
+
+
+def _keyword_pattern(keywords):
+    return re.compile(r"(?<![a-z])(?:" + '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)) + r")(?![a-z])")
+
+
+_CATEGORY_PATTERNS = {category: _keyword_pattern(words) for category, words in CATEGORY_KEYWORDS.items()}
+_MERCHANT_PATTERN = _keyword_pattern(MERCHANT_CATEGORIES)
+
+
+class _RuleRows:
+    """
+    card_reward_rules rows of one card, in order and without duplicates.
+    """
+    def __init__(self, cap):
+        self.cap = cap
+        self.rows = []
+        self._seen = set()
+
+    def add(self, category, rate, merchant=None):
+        key = (category, rate, merchant)
+        if key not in self._seen:
+            self._seen.add(key)
+            self.rows.append({'category': category, 'rate': rate, 'cap': self.cap, 'merchant': merchant})
+
+
+def parse_reward_rules(reward_rate):
+    """
+    Converts a card's reward_rate into card_reward_rules rows.
+
+    reward_rate is either the JSON rules calculate_estimated_rewards reads (see
+    _parse_json_reward_rules) or legacy free text. In free text, every rate ("5%",
+    "10 reward points per Rs 100") applies to the text up to the next rate. That text
+    yields one row per merchant named in it, one per category keyword in it, or a single
+    'all_other' row for "all other spends". A "Max Rs. N" anywhere is the card's monthly
+    cap and is set on every row.
+
+    Args:
+        reward_rate (str or dict): The reward_rate column value.
+
+    Returns:
+        list of dict: Rows with 'category', 'rate', 'cap' and 'merchant' (None unless
+                      the rule names a merchant), in rule order without duplicates.
+
+    Raises:
+        ValueError, TypeError: If JSON rules are malformed (as compile_reward_plan).
+    """
+    if not reward_rate:
+        return []
+    if isinstance(reward_rate, dict) or reward_rate.lstrip().startswith('{'):
+        return _parse_json_reward_rules(reward_rate)
+    cap_match = CAP_PATTERN.search(reward_rate)
+    cap = int(cap_match.group('cap').replace(',', '')) if cap_match else None
+    # The cap clause is not a rate of its own.
+    text = CAP_PATTERN.sub('', reward_rate)
+
+    rules = _RuleRows(cap)
+    add = rules.add
+    matches = list(RATE_PATTERN.finditer(text))
+    for position, match in enumerate(matches):
+        scope_end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+        scope = text[match.end():scope_end].lower()
+        rate = float(match.group('rate'))
+
+        if ALL_OTHER_PATTERN.search(scope):
+            add(ALL_OTHER_CATEGORY, rate)
+            continue
+        for merchant_match in _MERCHANT_PATTERN.finditer(scope):
+            merchant = merchant_match.group(0)
+            add(MERCHANT_CATEGORIES[merchant], rate, merchant)
+        for category, pattern in _CATEGORY_PATTERNS.items():
+            if pattern.search(scope):
+                add(category, rate)
+    return rules.rows
+
+
+def _parse_json_reward_rules(reward_rate):
+    """
+    Rows for JSON rules, read like reward_rules.compile_reward_plan: spending category
+    rules keep their category, 'specific_merchants' rules give one online_shopping row per
+    merchant (lowercased), and 'all_other_spends' gives an 'all_other' row. Rule types no
+    category filter asks for are skipped. The cap is 'max_cashback_per_month'.
+    """
+    rules_json = json.loads(reward_rate) if isinstance(reward_rate, str) else reward_rate
+    cap = rules_json.get('max_cashback_per_month')
+    rules = _RuleRows(round(float(cap)) if cap is not None else None)
+    for rule in rules_json.get('rewards', []):
+        category_type = rule.get('category_type')
+        rate = float(rule.get('rate_percent', 0.0))
+        if category_type in SPENDING_CATEGORIES:
+            rules.add(category_type, rate)
+        elif category_type == 'specific_merchants':
+            merchants = [merchant.lower() for merchant in rule.get('merchants', [])]
+            for merchant in merchants or [None]:
+                rules.add('online_shopping', rate, merchant)
+        elif category_type == 'all_other_spends':
+            rules.add(ALL_OTHER_CATEGORY, rate)
+    return rules.rows
+
+
+def parse_perk_codes(special_perks):
+    """
+    Converts a card's comma-separated special_perks text into card_perks codes.
+
+    Returns:
+        list of str: Perk codes in PERK_KEYWORDS order, without duplicates.
+    """
+    text = (special_perks or '').lower()
+    return [code for code, keywords in PERK_KEYWORDS.items() if any(keyword in text for keyword in keywords)]
+
+
+def categories_for(spending_category):
+    """
+    Maps a user's spending category ("online shopping", "food", "fuel", ...) to the
+    card_reward_rules categories it covers.
+    """
+    text = spending_category.lower()
+    categories = [category for category, pattern in _CATEGORY_PATTERNS.items()
+                  if category.replace('_', ' ') in text or pattern.search(text)]
+    if 'online_shopping' not in categories and _MERCHANT_PATTERN.search(text):
+        categories.append('online_shopping')
+    return categories
+
+
+def perk_codes_for(special_perk):
+    """
+    Maps a requested perk ("lounge access", "fuel surcharge waiver", ...) to card_perks
+    codes. Only a request that is, as a whole, one of PERK_PHRASES (or its plural) maps to
+    a code; anything else ("Amazon vouchers") returns an empty list, so the caller keeps
+    its substring search rather than widening the filter to every card with the code.
+    """
+    text = ' '.join((special_perk or '').lower().split())
+    code = PERK_PHRASES.get(text)
+    if code is None and text.endswith('s'):
+        code = PERK_PHRASES.get(text[:-1])
+    return [code] if code else []
@@ -0,0 +1,275 @@
+"""
+Storage backends the card catalog is read from.
+
+CatalogStore is the read interface CardCatalog and /recommend need. main.DatabaseManager
+implements it over MySQL; SQLiteCatalogStore implements it over a local SQLite file, so
+read-only recommendation nodes (and tests and benchmarks) serve from disk without a
+network round trip or a MySQL server. export_catalog() writes that file from any store:
+
+    python catalog_store.py export catalog.sqlite3
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Connection settings for read-only catalog nodes: no writes, the file mapped into memory
+# instead of copied through read(), and a page cache big enough for the whole catalog.
+SQLITE_READ_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456", # 256 MB
+    "PRAGMA cache_size = -65536", # 64 MB
+    "PRAGMA temp_store = MEMORY",
+)
+# Columns indexed in exported files, when the table has them.
+SQLITE_INDEXED_COLUMNS = ('min_income', 'reward_type')
+
+
+class CatalogStore:
+    """
+    Read interface for the card catalog.
+    """
+    def fetch_all_credit_cards(self):
+        """
+        Returns every card as a dict of column -> value. Errors propagate, so a failed
+        catalog reload keeps serving the previous snapshot.
+        """
+        raise NotImplementedError
+
+    def fetch_catalog_version(self):
+        """
+        Returns a value that changes whenever any card changes.
+        """
+        raise NotImplementedError
+
+    def fetch_credit_cards_by_criteria(self, income=None, reward_preference=None, category_preference=None, perks_preference=None):
+        """
+        Returns the cards whose minimum income is met by `income` (all cards if None).
+        """
+        raise NotImplementedError
+
+    def pool_stats(self):
+        return {'idle': 0, 'in_use': 0, 'acquire_timeouts': 0}
+
+    def close_idle(self):
+        """
+        Closes connections not currently in use (e.g. before forking workers).
+        """
+
+
+class SQLiteCatalogStore(CatalogStore):
+    """
+    Serves the catalog from a SQLite file written by export_catalog().
+
+    The file is opened read-only, one connection per thread (and per process, so forked
+    workers never share one). Exports replace the file atomically; the next
+    fetch_catalog_version() notices the new file and later reads reopen it.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The exported catalog file.
+        """
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._generation = 0
+        self._counters = {
+            'connections_opened': 0,
+            'reopens': 0,
+        }
+
+    def _current_file_id(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _connect(self):
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        for pragma in SQLITE_READ_PRAGMAS:
+            connection.execute(pragma)
+        with self._lock:
+            self._counters['connections_opened'] += 1
+        return connection
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation or local.pid != os.getpid():
+            if getattr(local, 'connection', None) is not None and local.pid == os.getpid():
+                local.connection.close()
+            local.connection = self._connect()
+            local.generation = self._generation
+            local.pid = os.getpid()
+        return local.connection
+
+    def _check_file(self):
+        file_id = self._current_file_id()
+        with self._lock:
+            if file_id != self._file_id:
+                if self._file_id is not None:
+                    self._counters['reopens'] += 1
+                    logger.info("Catalog file %s was replaced; reopening", self.path)
+                self._file_id = file_id
+                self._generation += 1
+
+    def _fetch_all(self, query, params=()):
+        cursor = self._connection().execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def fetch_all_credit_cards(self):
+        if self._file_id is None:
+            self._check_file()
+        return self._fetch_all("SELECT * FROM credit_cards")
+
+    def fetch_catalog_version(self):
+        self._check_file()
+        rows = self._fetch_all("SELECT value FROM catalog_meta WHERE key = 'version'")
+        return rows[0]['value'] if rows else None
+
+    def fetch_credit_cards_by_criteria(self, income=None, reward_preference=None, category_preference=None, perks_preference=None):
+        if self._file_id is None:
+            self._check_file()
+        if income is None:
+            return self._fetch_all("SELECT * FROM credit_cards")
+        return self._fetch_all("SELECT * FROM credit_cards WHERE min_income <= ?", (income,))
+
+    def close_idle(self):
+        # Connections belong to their thread; bumping the generation makes every thread
+        # open a fresh one on its next read.
+        with self._lock:
+            self._generation += 1
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['path'] = self.path
+        return stats
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sqlite_value(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _sqlite_type(values):
+    kinds = {type(value) for value in values if value is not None}
+    if kinds and kinds <= {int}:
+        return 'INTEGER'
+    if kinds and kinds <= {int, float}:
+        return 'REAL'
+    if kinds and kinds <= {bytes}:
+        return 'BLOB'
+    return 'TEXT'
+
+
+def catalog_checksum(columns, rows):
+    """
+    A version for exported rows: changes whenever any value changes, like MySQL's
+    CHECKSUM TABLE.
+    """
+    digest = hashlib.sha256(json.dumps(columns).encode('utf-8'))
+    for row in rows:
+        digest.update(json.dumps(row, default=repr).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def export_catalog(source, path, source_name=None):
+    """
+    Writes every card from `source` to a new SQLite catalog file at `path`.
+
+    The file is written next to `path` and then renamed over it, so readers
+    (SQLiteCatalogStore) never see a half-written catalog. It uses the rollback journal,
+    not WAL: a WAL file is paired with its -wal/-shm files by name, so after the rename
+    those left by the old file could be read as part of the new one. Any such leftovers
+    are removed.
+
+    Args:
+        source (CatalogStore): Where the cards are read from, e.g. main.DatabaseManager.
+        path (str): The catalog file to create or replace.
+        source_name (str, optional): Recorded in the file's catalog_meta table.
+
+    Returns:
+        dict: The catalog_meta written (version, card_count, exported_at, source).
+    """
+    cards = source.fetch_all_credit_cards()
+    columns = []
+    for card in cards:
+        columns.extend(column for column in card if column not in columns)
+    rows = [[_sqlite_value(card.get(column)) for column in columns] for card in cards]
+
+    meta = {
+        'version': catalog_checksum(columns, rows),
+        'card_count': str(len(rows)),
+        'exported_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'source': source_name or type(source).__name__,
+    }
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    connection = sqlite3.connect(temporary_path)
+    try:
+        connection.execute("PRAGMA journal_mode = DELETE")
+        column_types = [_sqlite_type(row[position] for row in rows) for position in range(len(columns))]
+        definitions = [f"{_quote(column)} {column_type}" + (' PRIMARY KEY' if column == 'id' and column_type == 'INTEGER' else '')
+                       for column, column_type in zip(columns, column_types)]
+        connection.execute(f"CREATE TABLE credit_cards ({', '.join(definitions) or 'id INTEGER PRIMARY KEY'})")
+        for column in SQLITE_INDEXED_COLUMNS:
+            if column in columns:
+                connection.execute(f"CREATE INDEX idx_credit_cards_{column} ON credit_cards ({_quote(column)})")
+        if columns:
+            connection.executemany(
+                f"INSERT INTO credit_cards ({', '.join(_quote(column) for column in columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})", rows)
+        connection.execute("CREATE TABLE catalog_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        connection.executemany("INSERT INTO catalog_meta (key, value) VALUES (?, ?)", meta.items())
+        connection.commit()
+        # Everything is in the main file before it is renamed: nothing left in a WAL, and
+        # the header names the rollback journal so readers never look for one.
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("PRAGMA journal_mode = DELETE")
+    except Exception:
+        connection.close()
+        os.remove(temporary_path)
+        raise
+    connection.close()
+    os.replace(temporary_path, path)
+    for suffix in ('-wal', '-shm'):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+    logger.info("Exported %d cards to %s (version %s)", len(rows), path, meta['version'])
+    return meta
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the MySQL credit_cards table to a SQLite catalog file.")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    export_parser = subcommands.add_parser('export', help=export_catalog.__doc__.strip().splitlines()[0])
+    export_parser.add_argument('path', help='SQLite file to write')
+    args = parser.parse_args()
+
+    from main import DB_CONFIG, DatabaseManager
+    meta = export_catalog(DatabaseManager(DB_CONFIG), args.path, source_name=f"mysql://{DB_CONFIG['host']}/{DB_CONFIG['database']}")
+    print(f"Exported {meta['card_count']} cards to {args.path} (version {meta['version']})")
@@ -1,47 +1,189 @@
+import logging
 import mysql.connector
-import os
-import json
+
+from db_pool import POOL_CONFIG, PoolTimeoutError, get_shared_pool
+from card_rules import CATEGORY_PERKS, categories_for, parse_perk_codes, parse_reward_rules, perk_codes_for
+from eligibility import ELIGIBILITY_COLUMNS, parse_eligibility_criteria
+
+logger = logging.getLogger(__name__)
+
+CARD_COLUMNS = "id, name, issuer, joining_fee, annual_fee, reward_type, reward_rate, eligibility_criteria, " \
+               "salaried_min_monthly_income, salaried_min_annual_income, self_employed_min_monthly_income, " \
+               "self_employed_min_annual_income, special_perks, image_url, apply_link"
 
 class DatabaseManager:
     """
     Manages connections and queries to the MySQL database for credit card data.
     """
-    def __init__(self, host, user, password, database):
+    def __init__(self, host, user, password, database, pool=None):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        # Shares the process-wide pool (and its POOL_CONFIG settings) with main.DatabaseManager
+        # when the configs match.
+        self.pool = pool or get_shared_pool({
+            'host': host,
+            'user': user,
+            'password': password,
+            'database': database
+        }, **POOL_CONFIG)
         self.connection = None
         self.cursor = None
 
     def connect(self):
         """
-        Establishes a connection to the MySQL database.
+        Borrows a connection from the shared pool.
         Sets cursor to return rows as dictionaries for easier access.
         """
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
+            self.connection = self.pool.acquire()
             # IMPORTANT: Set dictionary=True to get results as dictionaries (column_name: value)
             self.cursor = self.connection.cursor(dictionary=True)
-            # print("Successfully connected to MySQL database!") # Uncomment for debugging connection
-        except mysql.connector.Error as err:
-            print(f"Error connecting to MySQL: {err}")
+        except (mysql.connector.Error, PoolTimeoutError) as err:
+            logger.error("Error connecting to MySQL: %s", err)
             self.connection = None
             self.cursor = None
 
     def disconnect(self):
         """
-        Closes the database connection.
+        Returns the borrowed connection to the pool. The underlying connection stays open.
+        """
+        if self.connection:
+            if self.cursor:
+                self.cursor.close()
+            self.pool.release(self.connection)
+            self.connection = None
+            self.cursor = None
+
+    def _fetch_all(self, query, params=()):
+        """
+        Runs a read query on a pooled connection.
+
+        Each call uses its own connection and cursor, so one DatabaseManager can be
+        shared safely between Flask worker threads.
+        """
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def _execute_many(self, query, rows):
+        """
+        Runs a write statement once per parameter tuple on a pooled (autocommit) connection.
+        """
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(query, rows)
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+    def backfill_eligibility_columns(self, only_missing=True):
+        """
+        Parses eligibility_criteria into the typed minimum-income columns added by
+        migrations/001_eligibility_income_columns.sql. Run after inserting new cards.
+
+        Args:
+            only_missing (bool): Only touch rows whose income columns are all NULL.
+                                 Pass False to re-parse every row (e.g. after a parser fix).
+
+        Criteria text in which no income amount is found is logged and left alone rather
+        than written as NULL: the income filters treat NULL as "no minimum", so a wording
+        the parser misses would otherwise show the card to every applicant.
+
+        Returns:
+            int: Number of rows updated.
+        """
+        query = "SELECT id, eligibility_criteria FROM credit_cards"
+        if only_missing:
+            query += " WHERE " + " AND ".join(f"{column} IS NULL" for column in ELIGIBILITY_COLUMNS)
+        rows = []
+        unparsed = []
+        for card in self._fetch_all(query):
+            parsed = parse_eligibility_criteria(card['eligibility_criteria'])
+            if all(value is None for value in parsed.values()):
+                if card['eligibility_criteria']:
+                    logger.warning("No income found in eligibility criteria of card %s: %r",
+                                   card['id'], card['eligibility_criteria'])
+                    unparsed.append(card['id'])
+                continue
+            rows.append(tuple(parsed[column] for column in ELIGIBILITY_COLUMNS) + (card['id'],))
+        if unparsed:
+            logger.warning("Left eligibility income columns unchanged for %d cards with unparsed criteria: %s",
+                           len(unparsed), unparsed)
+        if not rows:
+            return 0
+        update = "UPDATE credit_cards SET " + ", ".join(f"{column} = %s" for column in ELIGIBILITY_COLUMNS) + " WHERE id = %s"
+        self._execute_many(update, rows)
+        logger.info("Backfilled eligibility income columns for %d cards", len(rows))
+        return len(rows)
+
+    def load_card_rules(self, card_ids=None):
         """
-        if self.connection and self.connection.is_connected():
-            self.cursor.close()
-            self.connection.close()
-            # print("MySQL connection closed.") # Uncomment for debugging disconnection
+        Rebuilds card_reward_rules and card_perks (migrations/002_card_reward_rules_and_perks.sql)
+        from the reward_rate (JSON rules or legacy text) and special_perks of each card.
+        Run after inserting or editing cards.
+
+        Each card's old rows are replaced in a single transaction, so readers never see a
+        card with its rules half loaded.
+
+        Args:
+            card_ids (list of int, optional): Only reload these cards. Defaults to all cards.
+
+        Returns:
+            tuple: (number of reward rule rows, number of perk rows) written.
+        """
+        query = "SELECT id, reward_rate, special_perks FROM credit_cards"
+        params = ()
+        if card_ids is not None:
+            if not card_ids:
+                return 0, 0
+            query += " WHERE id IN (" + ", ".join(["%s"] * len(card_ids)) + ")"
+            params = tuple(card_ids)
+        cards = self._fetch_all(query, params)
+
+        rule_rows = []
+        perk_rows = []
+        for card in cards:
+            try:
+                rules = parse_reward_rules(card['reward_rate'])
+            except (ValueError, TypeError, AttributeError) as e:
+                # Like the catalog, which never recommends a card whose rules fail to compile:
+                # the card keeps no rule rows, so category filters leave it out.
+                logger.error("Error parsing reward rules for card %s: %s", card['id'], e)
+                rules = []
+            for rule in rules:
+                rule_rows.append((card['id'], rule['category'], rule['rate'], rule['cap'], rule['merchant']))
+            perk_rows.extend((card['id'], perk_code) for perk_code in parse_perk_codes(card['special_perks']))
+
+        id_rows = [(card['id'],) for card in cards]
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                connection.start_transaction()
+                cursor.executemany("DELETE FROM card_reward_rules WHERE card_id = %s", id_rows)
+                cursor.executemany("DELETE FROM card_perks WHERE card_id = %s", id_rows)
+                if rule_rows:
+                    cursor.executemany(
+                        "INSERT INTO card_reward_rules (card_id, category, rate, cap, merchant) VALUES (%s, %s, %s, %s, %s)",
+                        rule_rows)
+                if perk_rows:
+                    cursor.executemany("INSERT INTO card_perks (card_id, perk_code) VALUES (%s, %s)", perk_rows)
+                connection.commit()
+            except BaseException:
+                # Any failure (not just a driver error) must not leave the deletes pending
+                # on a connection that goes back to the pool.
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+        logger.info("Loaded %d reward rules and %d perks for %d cards", len(rule_rows), len(perk_rows), len(cards))
+        return len(rule_rows), len(perk_rows)
 
     def fetch_all_credit_cards(self):
         """
@@ -50,46 +192,50 @@ class DatabaseManager:
         Returns:
             list of dict: A list of all credit card dictionaries.
         """
-        self.connect()
-        query = "SELECT id, name, issuer, joining_fee, annual_fee, reward_type, reward_rate, eligibility_criteria, special_perks, image_url, apply_link FROM credit_cards"
-        self.cursor.execute(query)
-        cards = self.cursor.fetchall()
-        self.disconnect()
-        return cards
+        return self._fetch_all(f"SELECT {CARD_COLUMNS} FROM credit_cards")
 
-    def fetch_credit_cards_by_criteria(self, min_income: int = None, reward_type: str = None, special_perk: str = None, spending_category: str = None):
+    def fetch_credit_cards_by_criteria(self, min_income: int = None, reward_type: str = None, special_perk: str = None, spending_category: str = None,
+                                       employment_type: str = 'salaried'):
         """
         Fetches credit cards from the database based on specified criteria.
 
         Args:
-            min_income (int, optional): The user's desired monthly income (e.g., 35000).
-                                        Filters cards whose 'eligibility_criteria' specify a minimum income
-                                        LESS THAN OR EQUAL TO the user's income.
-                                        Assumes 'eligibility_criteria' stores text like "min. income: 35000/month"
-                                        or "min. income: 6 Lakhs/year". This parsing logic is sensitive to the exact format.
+            min_income (int, optional): The user's monthly income (e.g., 35000).
+                                        Filters cards whose minimum income for `employment_type` is
+                                        LESS THAN OR EQUAL TO the user's income, using the typed columns
+                                        parsed from 'eligibility_criteria' at ingest (see backfill_eligibility_columns).
+                                        Cards whose criteria state no income are kept.
             reward_type (str, optional): Keyword for preferred reward type (e.g., "cashback", "travel points", "miles").
-                                         Searches for this keyword in the 'reward_type' column using LIKE.
+                                         Searches for this keyword anywhere in the 'reward_type' column using
+                                         LIKE, so "miles" matches "Air Miles". The leading wildcard means the
+                                         reward_type index does not help here; this filter is applied to the
+                                         rows the income range scan returns.
             special_perk (str, optional): Keyword for a specific perk (e.g., "lounge access", "Amazon vouchers", "fuel surcharge waiver").
-                                          Searches for this keyword in the 'special_perks' column using LIKE.
+                                          Matched against the indexed card_perks codes; wording that maps to no
+                                          perk code falls back to a LIKE search of the 'special_perks' column.
             spending_category (str, optional): Primary spending area (e.g., "fuel", "travel", "groceries", "dining", "online shopping").
-                                             Searches for cards that explicitly mention benefits for this category
-                                             within 'reward_type' or 'special_perks' columns, using keyword mapping.
+                                             Matches cards with a card_reward_rules row for the category, or a
+                                             perk that goes with it (lounge access for travel, ...).
+            employment_type (str, optional): "salaried" (default) or "self_employed". Self-employed
+                                             income is compared against the annual (ITR) minimum.
 
         Returns:
             list of dict: A list of credit card dictionaries matching the criteria.
                           Returns an empty list if no cards match or an error occurs.
         """
-        self.connect()
-        query = "SELECT id, name, issuer, joining_fee, annual_fee, reward_type, reward_rate, eligibility_criteria, special_perks, image_url, apply_link FROM credit_cards WHERE 1=1"
+        query = f"SELECT {CARD_COLUMNS} FROM credit_cards WHERE 1=1"
         params = [] # This list will hold the parameters for the SQL query
 
         # --- Filter by Monthly Income ---
         if min_income is not None:
-            # Modified parsing to handle "Rs 35,000" or "Rs 6 Lakhs" more robustly by stripping non-digits
-            # and converting Lakhs to numeric value
-            # This logic assumes income criteria is within 'eligibility_criteria' column
-            query += " AND CAST(REPLACE(REPLACE(REPLACE(REPLACE(LOWER(eligibility_criteria), 'gross monthly income > rs ', ''), 'net monthly income rs. ', ''), 'lakhs p.a.', '00000'), ',', '') AS SIGNED) <= %s"
-            params.append(min_income)
+            # Compares a bare indexed column with a constant, so MySQL can range-scan the index.
+            # "IS NULL OR <=" is still a single range: NULLs sort first in the index.
+            if employment_type == 'self_employed':
+                query += " AND (self_employed_min_annual_income IS NULL OR self_employed_min_annual_income <= %s)"
+                params.append(min_income * 12)
+            else:
+                query += " AND (salaried_min_monthly_income IS NULL OR salaried_min_monthly_income <= %s)"
+                params.append(min_income)
 
         # --- Filter by Reward Type (e.g., cashback, travel points) ---
         if reward_type:
@@ -98,46 +244,36 @@ class DatabaseManager:
 
         # --- Filter by Special Perk (e.g., lounge access, fuel waiver) ---
         if special_perk:
-            query += " AND special_perks LIKE %s"
-            params.append(f"%{special_perk}%")
+            perk_codes = perk_codes_for(special_perk)
+            if perk_codes:
+                query += (" AND EXISTS (SELECT 1 FROM card_perks p WHERE p.card_id = credit_cards.id"
+                          " AND p.perk_code IN (" + ", ".join(["%s"] * len(perk_codes)) + "))")
+                params.extend(perk_codes)
+            else:
+                query += " AND special_perks LIKE %s"
+                params.append(f"%{special_perk}%")
 
         # --- Filter by Spending Category (NEW, Smarter Logic) ---
         if spending_category:
-            category_keywords = []
-            lower_spending_category = spending_category.lower()
-
-            # Map user categories to actual keywords in your database's reward_rate/special_perks
-            if "online shopping" in lower_spending_category or "online" in lower_spending_category or "amazon" in lower_spending_category or "flipkart" in lower_spending_category:
-                category_keywords.extend(['amazon', 'flipkart', 'online', 'e-commerce', 'digital', 'app', 'swiggy', 'zomato', 'myntra', 'bookmyshow', 'cult.fit', 'ola', 'tata cliq', 'uber'])
-            if "fuel" in lower_spending_category:
-                category_keywords.extend(['fuel', 'petrol', 'fuel surcharge'])
-            if "groceries" in lower_spending_category:
-                category_keywords.extend(['groceries', 'supermarket', 'daily needs', 'departmental stores'])
-            if "dining" in lower_spending_category or "food" in lower_spending_category:
-                category_keywords.extend(['dining', 'restaurant', 'food'])
-            if "travel" in lower_spending_category:
-                category_keywords.extend(['travel', 'flights', 'hotels', 'trains', 'tourism', 'airport', 'lounge']) # Added airport/lounge as often travel related perks
-
-            if category_keywords:
-                category_conditions = []
-                # Search for keywords in both reward_rate and special_perks
-                for keyword in category_keywords:
-                    # Use LOWER() on column to ensure case-insensitive matching in MySQL
-                    category_conditions.append(f"(LOWER(reward_rate) LIKE %s OR LOWER(special_perks) LIKE %s)")
-                    params.append(f"%{keyword}%")
-                    params.append(f"%{keyword}%")
-                query += " AND (" + " OR ".join(category_conditions) + ")"
-            # If spending_category is provided but no keywords match (e.g., very niche category),
+            categories = categories_for(spending_category)
+            if categories:
+                # Semi-joins served by the (category, card_id) and (perk_code, card_id) indexes.
+                condition = ("EXISTS (SELECT 1 FROM card_reward_rules r WHERE r.card_id = credit_cards.id"
+                             " AND r.category IN (" + ", ".join(["%s"] * len(categories)) + "))")
+                params.extend(categories)
+                perk_codes = [code for category in categories for code in CATEGORY_PERKS.get(category, ())]
+                if perk_codes:
+                    condition += (" OR EXISTS (SELECT 1 FROM card_perks p WHERE p.card_id = credit_cards.id"
+                                  " AND p.perk_code IN (" + ", ".join(["%s"] * len(perk_codes)) + "))")
+                    params.extend(perk_codes)
+                query += " AND (" + condition + ")"
+            # If spending_category maps to no known category (e.g., very niche category),
             # the query won't add category filters, which is fine.
 
         try:
-            # print(f"DEBUG SQL Query: {query}") # Uncomment for debugging
-            # print(f"DEBUG SQL Params: {params}") # Uncomment for debugging
-            self.cursor.execute(query, tuple(params))
-            result = self.cursor.fetchall()
-        except mysql.connector.Error as err:
-            print(f"Error executing query in fetch_credit_cards_by_criteria: {err}")
+            logger.debug("SQL query: %s params: %s", query, params)
+            result = self._fetch_all(query, tuple(params))
+        except (mysql.connector.Error, PoolTimeoutError) as err:
+            logger.error("Error executing query in fetch_credit_cards_by_criteria: %s", err)
             result = []
-        finally:
-            self.disconnect()
-        return result
\ No newline at end of file
+        return result
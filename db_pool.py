@@ -0,0 +1,297 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# --- Connection Pool Configuration ---
+# Shared by every DatabaseManager in the process (see get_shared_pool).
+POOL_CONFIG = {
+    'pool_size': 10,  # Upper bound on connections this process holds open
+    'acquire_timeout': 5.0,  # Seconds a request waits for a free connection
+    'max_lifetime_seconds': 3600,  # Recycle connections older than this
+    'health_check_interval': 30  # Ping connections idle for longer than this
+}
+
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no pooled connection becomes available within the acquire timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of long-lived MySQL connections.
+
+    Connections are opened lazily up to `pool_size` and handed back to the pool
+    after use instead of being closed, so a request only pays the TCP + auth
+    handshake when the pool has to grow or replace a dead connection.
+    """
+    def __init__(self, db_config, pool_size=5, acquire_timeout=5.0,
+                 max_lifetime_seconds=3600, health_check_interval=30):
+        """
+        Args:
+            db_config (dict): Keyword arguments for mysql.connector.connect().
+            pool_size (int): Maximum number of open connections (idle + in use).
+            acquire_timeout (float): Seconds to wait for a free connection before
+                                     raising PoolTimeoutError.
+            max_lifetime_seconds (float): Connections older than this are closed and
+                                          replaced when they are next handed out.
+            health_check_interval (float): Connections idle for longer than this are
+                                           pinged before being handed out.
+        """
+        self.db_config = dict(db_config)
+        # Long-lived connections must not hold a REPEATABLE READ snapshot between
+        # requests, otherwise they would keep serving stale rows.
+        self.db_config.setdefault('autocommit', True)
+        self.pool_size = pool_size
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = deque()  # (connection, created_at, last_used_at), most recently used on the right
+        self._created_at = {}  # id(connection) -> creation time, for connections currently checked out
+        self._open_count = 0
+        self._closed = False
+
+        self._counters = {
+            'connections_created': 0,
+            'connections_reused': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'acquire_waits': 0,
+            'acquire_timeouts': 0,
+        }
+
+    def _open_connection(self):
+        connection = mysql.connector.connect(**self.db_config)
+        with self._lock:
+            self._counters['connections_created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, connection, created_at, last_used_at, now):
+        if now - created_at > self.max_lifetime_seconds:
+            with self._lock:
+                self._counters['connections_recycled'] += 1
+            return False
+        if now - last_used_at > self.health_check_interval:
+            try:
+                healthy = connection.is_connected()
+            except Exception:
+                healthy = False
+            if not healthy:
+                with self._lock:
+                    self._counters['health_check_failures'] += 1
+            return healthy
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool, opening a new one if the pool has room.
+
+        Args:
+            timeout (float, optional): Overrides the pool's acquire_timeout for this call.
+
+        Returns:
+            A live mysql.connector connection. It must be given back with release().
+
+        Raises:
+            PoolTimeoutError: If the pool is exhausted for longer than the timeout.
+            mysql.connector.Error: If a new connection cannot be opened.
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed.")
+                waited = False
+                while not self._idle and self._open_count >= self.pool_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['acquire_timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout:.2f}s waiting for a database connection "
+                            f"(pool size {self.pool_size})."
+                        )
+                    if not waited:
+                        self._counters['acquire_waits'] += 1
+                        waited = True
+                    self._lock.wait(remaining)
+
+                if self._idle:
+                    connection, created_at, last_used_at = self._idle.pop()
+                else:
+                    # Reserve a slot before connecting so concurrent callers cannot overshoot pool_size.
+                    self._open_count += 1
+                    connection = None
+
+            if connection is None:
+                try:
+                    connection = self._open_connection()
+                except Exception:
+                    with self._lock:
+                        self._open_count -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._created_at[id(connection)] = time.monotonic()
+                return connection
+
+            # Health checks run outside the lock so a slow ping does not stall other threads.
+            if self._is_healthy(connection, created_at, last_used_at, time.monotonic()):
+                with self._lock:
+                    self._counters['connections_reused'] += 1
+                    self._created_at[id(connection)] = created_at
+                return connection
+
+            self._discard(connection)
+            with self._lock:
+                self._open_count -= 1
+                self._lock.notify()
+
+    def release(self, connection, discard=False):
+        """
+        Returns a connection to the pool.
+
+        Args:
+            connection: A connection previously returned by acquire().
+            discard (bool): Close the connection instead of keeping it, e.g. after an error
+                            that may have left it in a broken state.
+        """
+        with self._lock:
+            created_at = self._created_at.pop(id(connection), time.monotonic())
+            if discard or self._closed:
+                self._open_count -= 1
+                self._lock.notify()
+            else:
+                self._idle.append((connection, created_at, time.monotonic()))
+                self._lock.notify()
+                return
+        self._discard(connection)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager around acquire()/release(). Connections that raised a
+        mysql.connector.Error while checked out are discarded rather than reused.
+        """
+        connection = self.acquire(timeout)
+        discard = False
+        try:
+            yield connection
+        except mysql.connector.Error:
+            discard = True
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def options(self):
+        """
+        Returns the settings the pool was created with, under the POOL_CONFIG keys.
+        """
+        return {option: getattr(self, option) for option in POOL_CONFIG}
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool usage counters.
+
+        Returns:
+            dict: Counters plus the current number of idle and in-use connections.
+        """
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot['pool_size'] = self.pool_size
+            snapshot['idle'] = len(self._idle)
+            snapshot['in_use'] = self._open_count - len(self._idle)
+        return snapshot
+
+    def close_all(self):
+        """
+        Closes every idle connection and stops handing out new ones. Connections
+        still checked out are closed when they are released.
+        """
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open_count -= len(idle)
+            self._lock.notify_all()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def close_idle(self):
+        """
+        Closes every idle connection but keeps the pool usable. A process about to fork
+        calls this so children do not inherit its open sockets.
+        """
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open_count -= len(idle)
+            self._lock.notify_all()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def _reset_after_fork(self):
+        # The child shares the parent's sockets, so it must never use (or close, which
+        # would send COM_QUIT on the parent's session) the inherited connections. They
+        # are parked in _inherited_connections so garbage collection cannot close them.
+        _inherited_connections.extend(connection for connection, _, _ in self._idle)
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._created_at = {}
+        self._open_count = 0
+
+
+# --- Shared pools ---
+# Both DatabaseManager classes talk to the same database, so they share one pool
+# per distinct connection config instead of each opening their own.
+_shared_pools = {}
+_shared_pools_lock = threading.Lock()
+_inherited_connections = []
+
+
+def _reset_shared_pools_after_fork():
+    global _shared_pools_lock
+    _shared_pools_lock = threading.Lock()
+    for pool in _shared_pools.values():
+        pool._reset_after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_shared_pools_after_fork)
+
+
+def get_shared_pool(db_config, **pool_options):
+    """
+    Returns the process-wide pool for `db_config`, creating it on first use.
+
+    `pool_options` (ConnectionPool keyword arguments, POOL_CONFIG by default) are only
+    applied when the pool is created. Every caller should pass the same options; a
+    caller asking for different ones gets the existing pool and a warning.
+    """
+    pool_options = pool_options or POOL_CONFIG
+    key = tuple(sorted((k, str(v)) for k, v in db_config.items()))
+    with _shared_pools_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_config, **pool_options)
+            _shared_pools[key] = pool
+        elif any(pool.options().get(option) != value for option, value in pool_options.items()):
+            logger.warning("Shared connection pool already created with %s; ignoring %s",
+                           pool.options(), pool_options)
+        return pool
@@ -0,0 +1,116 @@
+import math
+import re
+
+# Typed columns parsed out of credit_cards.eligibility_criteria (see
+# migrations/001_eligibility_income_columns.sql). All amounts are whole rupees.
+ELIGIBILITY_COLUMNS = (
+    'salaried_min_monthly_income',
+    'salaried_min_annual_income',
+    'self_employed_min_monthly_income',
+    'self_employed_min_annual_income'
+)
+
+UNIT_MULTIPLIERS = {
+    'k': 1000,
+    'l': 100000,
+    'lpa': 100000,
+    'lakh': 100000,
+    'lakhs': 100000,
+    'lac': 100000,
+    'lacs': 100000,
+    'crore': 10000000,
+    'crores': 10000000,
+    'cr': 10000000
+}
+
+# "35,000", "3L p.a.", "6 Lakhs p.a.", "35k/month", "3,00,000 annual".
+AMOUNT_PATTERN = re.compile(
+    r"(?P<amount>\d+(?:,\d+)*(?:\.\d+)?)\s*"
+    r"(?P<unit>lakhs?|lacs?|lpa|l|crores?|cr|k)?\b\s*"
+    r"(?P<period>p\.?\s?a\.?|per annum|annual(?:ly)?|/\s*(?:year|yr|annum)|per year"
+    r"|/\s*month|per month|monthly|p\.?\s?m\.?)?"
+)
+# A number is only read as income when something marks it as money, so ages
+# ("Age 21-60") never are: a currency sign before it, a lakh/k unit, an income/ITR
+# keyword before it with no other number in between, or the keyword right after it.
+CURRENCY_BEFORE = re.compile(r"(?:rs\.?|inr|₹)\s*$")
+INCOME_KEYWORD = re.compile(r"income|itr|salary")
+INCOME_AFTER = re.compile(r"\s*(?:(?:gross|net|min(?:imum)?\.?|monthly|annual|yearly)\s+)*(?:income|itr|salary)")
+MONTHLY_HINT = re.compile(r"monthly|per month|/\s*month|\bp\.?\s?m\b")
+ANNUAL_HINT = re.compile(r"annual|per annum|/\s*(?:year|yr)|\bp\.?\s?a\b|\blpa\b|\bitr\b")
+SALARIED_PATTERN = re.compile(r"\bsalaried\b")
+SELF_EMPLOYED_PATTERN = re.compile(r"\bself[-\s]?employed\b")
+
+
+def _is_income_amount(clause, match):
+    before = clause[:match.start()]
+    if match.group('unit') or CURRENCY_BEFORE.search(before):
+        return True
+    keywords = list(INCOME_KEYWORD.finditer(before))
+    if keywords and not any(char.isdigit() for char in before[keywords[-1].end():]):
+        return True
+    return INCOME_AFTER.match(clause, match.end()) is not None
+
+
+def _clause_income(clause):
+    """
+    Returns (monthly, annual) minimum income stated in one clause, or None if it has none.
+    """
+    match = next((match for match in AMOUNT_PATTERN.finditer(clause) if _is_income_amount(clause, match)), None)
+    if match is None:
+        return None
+    amount = float(match.group('amount').replace(',', ''))
+    unit = match.group('unit')
+    if unit:
+        amount *= UNIT_MULTIPLIERS[unit]
+
+    period = match.group('period') or ''
+    if MONTHLY_HINT.search(period) or (not period and MONTHLY_HINT.search(clause)):
+        is_monthly = True
+    elif period or ANNUAL_HINT.search(clause):
+        is_monthly = False
+    else:
+        # With no period stated, lakh/crore amounts are quoted per year.
+        is_monthly = unit in (None, 'k')
+
+    if is_monthly:
+        return int(amount), int(amount) * 12
+    # Round the monthly equivalent up so it never admits anyone the annual figure would not.
+    return math.ceil(amount / 12), int(amount)
+
+
+def parse_eligibility_criteria(text):
+    """
+    Parses free-text eligibility into minimum monthly and annual income for salaried and
+    self-employed applicants.
+
+    Clauses are split on ';'. A clause starting with "Salaried" or "Self-Employed" sets that
+    applicant type; a clause naming neither applies to both. Amounts understand "Rs",
+    thousands separators, "k", "L"/"Lakhs"/"Lacs" and "Crore", and "p.a."/"per month"
+    periods, before or after the word "income".
+
+    Args:
+        text (str): The eligibility_criteria column value.
+
+    Returns:
+        dict: One entry per ELIGIBILITY_COLUMNS name; None where the text states no income.
+    """
+    parsed = dict.fromkeys(ELIGIBILITY_COLUMNS)
+    if not text:
+        return parsed
+
+    for clause in text.lower().split(';'):
+        income = _clause_income(clause)
+        if income is None:
+            continue
+        salaried = SALARIED_PATTERN.search(clause) is not None
+        self_employed = SELF_EMPLOYED_PATTERN.search(clause) is not None
+        targets = []
+        if salaried or not self_employed:
+            targets.append('salaried')
+        if self_employed or not salaried:
+            targets.append('self_employed')
+        for target in targets:
+            if parsed[f'{target}_min_monthly_income'] is None:
+                parsed[f'{target}_min_monthly_income'], parsed[f'{target}_min_annual_income'] = income
+    return parsed
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+def build_explanation_prompt(recommendation, parsed_query):
+    """
+    Builds the LLM prompt explaining why one recommended card suits the user.
+    """
+    spending = ", ".join(f"{category.replace('_', ' ')}: Rs {amount:,.0f}"
+                         for category, amount in parsed_query.get('spending', {}).items()) or "not given"
+    preferences = ", ".join(str(value) for value in (parsed_query.get('reward_preference'),
+                                                     parsed_query.get('category_preference'),
+                                                     parsed_query.get('perks_preference')) if value) or "none"
+    lines = [
+        "You are a credit card advisor. In 2-3 friendly sentences, explain why this card suits the user.",
+        "Only use the facts below; do not invent fees, rates or perks.",
+        f"User monthly income: Rs {parsed_query.get('income') or 0:,.0f}",
+        f"User monthly spending: {spending}",
+        f"User preferences: {preferences}",
+        f"Card: {recommendation.get('name')} by {recommendation.get('issuer')} ({recommendation.get('reward_type')})",
+    ]
+    if 'net_rewards_first_year' in recommendation:
+        lines.append(f"Estimated monthly rewards: Rs {recommendation['estimated_cashback_monthly_from_spending']:,.2f}")
+        lines.append(f"Net rewards in the first year: Rs {recommendation['net_rewards_first_year']:,.2f}")
+    lines.append(f"Calculation: {recommendation.get('reasoning')}")
+    return "\n".join(lines)
+
+
+class ExplanationService:
+    """
+    Generates LLM explanations for the top recommendations concurrently.
+
+    All requests share one pool of `max_concurrency` workers, which caps LLM calls in
+    flight across the whole process. Callers wait at most `budget_seconds` for
+    explanations to attach to the response; anything still running can be streamed
+    afterwards with iter_late() or simply dropped, leaving the card's `reasoning` text.
+    """
+    def __init__(self, generate, max_concurrency=8, budget_seconds=2.0, top_n=3):
+        """
+        Args:
+            generate (callable): prompt -> explanation text, or None if unavailable.
+                                 Expected to bound its own call time (see CachedLLMClient).
+            max_concurrency (int): LLM calls running at once, across all requests.
+            budget_seconds (float): How long a response waits for explanations.
+            top_n (int): Recommendations explained per response.
+        """
+        self.generate = generate
+        self.budget_seconds = budget_seconds
+        self.top_n = top_n
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='explanation')
+        self._lock = threading.Lock()
+        self._counters = {
+            'requested': 0,
+            'attached': 0,
+            'streamed': 0,
+            'dropped': 0,
+        }
+
+    def _count(self, outcome, amount=1):
+        if amount:
+            with self._lock:
+                self._counters[outcome] += amount
+
+    def _explain(self, recommendation, parsed_query):
+        return self.generate(build_explanation_prompt(recommendation, parsed_query))
+
+    def start(self, recommendations, parsed_query):
+        """
+        Starts explaining the first `top_n` recommendations.
+
+        Returns:
+            dict: Future -> index of the recommendation it explains.
+        """
+        futures = {self._executor.submit(self._explain, recommendation, parsed_query): index
+                   for index, recommendation in enumerate(recommendations[:self.top_n])}
+        self._count('requested', len(futures))
+        return futures
+
+    def collect(self, futures, budget_seconds=None):
+        """
+        Waits up to the budget for `futures` (from start()).
+
+        Returns:
+            tuple: (index -> explanation for the ones that finished, futures still pending)
+        """
+        done, _ = wait(futures, timeout=self.budget_seconds if budget_seconds is None else budget_seconds)
+        explanations = {}
+        for future in done:
+            text = self._result(future)
+            if text:
+                explanations[futures[future]] = text
+        pending = {future: index for future, index in futures.items() if future not in done}
+        self._count('attached', len(explanations))
+        self._count('dropped', len(done) - len(explanations))
+        return explanations, pending
+
+    def drop(self, pending):
+        """
+        Gives up on pending futures; ones that have not started yet never call the LLM.
+        """
+        for future in pending:
+            future.cancel()
+        self._count('dropped', len(pending))
+
+    def iter_late(self, pending, timeout):
+        """
+        Yields (index, explanation) for pending futures as they finish, for up to
+        `timeout` seconds. Failed or unfinished explanations are skipped.
+        """
+        deadline = time.monotonic() + timeout
+        pending = dict(pending)
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    text = self._result(future)
+                    if text:
+                        self._count('streamed')
+                        yield index, text
+                    else:
+                        self._count('dropped')
+        finally:
+            # Out of time, or the client went away.
+            self.drop(pending)
+
+    def _result(self, future):
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning("Explanation failed: %s", e)
+            return None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,71 @@
+"""
+Production server configuration:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The master imports the app and loads and compiles the card catalog once, then forks the
+workers, which share the parsed cards, reward plans, scoring matrices and index
+copy-on-write. The master polls the catalog change marker; when it moves, the master
+loads the new catalog and gracefully replaces the workers (SIGHUP), so new workers
+start from the new snapshot and old ones finish their in-flight requests first.
+
+Environment:
+    WEB_BIND      Address to listen on (default 127.0.0.1:5000).
+    WEB_WORKERS   Worker processes (default: one per CPU core).
+    WEB_THREADS   Threads per worker (default 4).
+    WEB_TIMEOUT   Seconds before a silent worker is killed and replaced (default 30).
+"""
+import gc
+import os
+import signal
+import threading
+import time
+
+bind = os.getenv('WEB_BIND', '127.0.0.1:5000')
+workers = int(os.getenv('WEB_WORKERS', os.cpu_count() or 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = timeout
+preload_app = True
+
+
+def _close_master_connections(main):
+    # Workers must not inherit the master's database connections.
+    main.db_manager.close_idle()
+
+
+def on_starting(server):
+    import main
+    try:
+        main.card_catalog.load()
+    except Exception as e:
+        # Workers fall back to loading the catalog themselves on first request.
+        server.log.error("Could not preload the card catalog: %s", e)
+    _close_master_connections(main)
+
+
+def when_ready(server):
+    import main
+    from card_catalog import REFRESH_FORK_LOCK
+
+    def refresh_loop():
+        while True:
+            time.sleep(main.CATALOG_REFRESH_INTERVAL)
+            try:
+                with REFRESH_FORK_LOCK:
+                    changed = main.card_catalog.refresh_if_changed()
+                    _close_master_connections(main)
+                if changed:
+                    server.log.info("Card catalog changed; reloading workers")
+                    os.kill(server.pid, signal.SIGHUP) # Graceful worker replacement
+            except Exception as e:
+                server.log.error("Error refreshing card catalog: %s", e)
+
+    threading.Thread(target=refresh_loop, name='card-catalog-refresh', daemon=True).start()
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach: a GC pass in a worker
+    # would otherwise write to every object header and un-share the catalog pages.
+    gc.freeze()
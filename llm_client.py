@@ -0,0 +1,308 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Returned when the LLM fails or times out and no fallback is given. Same text
+# agent.get_llm_response has always returned on errors.
+DEFAULT_FALLBACK_RESPONSE = "Error: Could not get response from LLM."
+
+
+def prompt_key(model_name, prompt):
+    """
+    Cache key for a prompt: a hash of the model name and the exact prompt text.
+    """
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode('utf-8')).hexdigest()
+
+
+class LLMBackend:
+    """
+    Interface for LLM backends: call with a prompt to get the response text.
+
+    A backend returns None when it has no answer by design (see NoOpBackend); callers then
+    get their fallback and nothing is cached. Errors are raised. `model_name` is part of
+    the response cache key.
+    """
+    model_name = None
+
+    def __call__(self, prompt):
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini. The SDK is imported and configured on the first call, so creating the
+    backend is free and processes that never call it never load the SDK.
+    """
+    def __init__(self, api_key, model_name, timeout=15.0):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _sdk(self):
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai
+
+    def get_model(self):
+        """
+        Returns the Gemini model client, created once and reused for every call.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._sdk().GenerativeModel(self.model_name)
+        return self._model
+
+    def list_models(self):
+        """
+        Returns the models that support generateContent.
+        """
+        return [m for m in self._sdk().list_models() if 'generateContent' in m.supported_generation_methods]
+
+    def __call__(self, prompt):
+        response = self.get_model().generate_content(prompt, request_options={'timeout': self.timeout})
+        return response.text
+
+
+class HTTPBackend(LLMBackend):
+    """
+    An LLM backend behind a plain HTTP endpoint: POSTs {"prompt": ...} as JSON and reads
+    the "text" field of the JSON reply. Used for self-hosted model gateways and for
+    testing against a fake local LLM server.
+    """
+    def __init__(self, url, timeout=15.0):
+        self.url = url
+        self.model_name = url
+        self.timeout = timeout
+
+    def __call__(self, prompt):
+        request = urllib.request.Request(self.url, data=json.dumps({'prompt': prompt}).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())['text']
+
+
+class NoOpBackend(LLMBackend):
+    """
+    Offline backend: never calls a model and always answers None, so callers get their
+    fallback. Used when no LLM is configured, e.g. in tests and benchmarks.
+    """
+    model_name = 'noop'
+
+    def __call__(self, prompt):
+        return None
+
+
+class PromptCache:
+    """
+    A persistent prompt-hash -> response cache in a SQLite file, shared by every
+    process (e.g. server workers) that points at the same path.
+
+    Entries older than `ttl_seconds` are treated as missing; once more than
+    `max_entries` are stored, the least recently used are deleted.
+    """
+    def __init__(self, path, max_entries=10000, ttl_seconds=7 * 24 * 3600):
+        """
+        Args:
+            path (str): SQLite database file (created if missing), or ':memory:'.
+            max_entries (int): Maximum number of responses kept.
+            ttl_seconds (float): Seconds a response stays valid after it is stored.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'expirations': 0,
+            'evictions': 0,
+        }
+
+    def _db(self):
+        # SQLite connections must not cross fork(); each process opens its own.
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used_at)")
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key):
+        """
+        Returns the cached response for `key`, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters['misses'] += 1
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                db.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                db.commit()
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            db.execute("UPDATE llm_responses SET last_used_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            self._counters['hits'] += 1
+            return response
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO llm_responses (key, response, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                       (key, response, now, now))
+            excess = db.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute("DELETE FROM llm_responses WHERE key IN "
+                           "(SELECT key FROM llm_responses ORDER BY last_used_at LIMIT ?)", (excess,))
+                self._counters['evictions'] += excess
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM llm_responses")
+            db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = self._db().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class CachedLLMClient:
+    """
+    Wraps an LLM backend with a response cache, in-flight deduplication and per-call
+    timeouts.
+
+    - Identical prompts are answered from `cache` without calling the backend.
+    - Identical prompts arriving while a call for them is in flight wait for that call
+      instead of starting their own.
+    - A call that raises or takes longer than `timeout` seconds returns the fallback
+      instead (never cached), so callers always get an answer in bounded time. So does
+      a backend that answers None.
+
+    The backend is an LLMBackend or any callable prompt -> text, so tests can use a
+    local stub.
+    """
+    def __init__(self, backend, model_name=None, cache=None, timeout=15.0, fallback=None, max_concurrent_calls=8):
+        """
+        Args:
+            backend (callable): generate(prompt) -> response text.
+            model_name (str, optional): Part of the cache key, so switching models never
+                                        serves another model's answers. Defaults to the
+                                        backend's model_name.
+            cache (PromptCache, optional): Response cache. No caching if omitted.
+            timeout (float): Seconds to wait for the backend before falling back.
+            fallback (callable, optional): fallback(prompt) -> text used on errors and
+                                           timeouts. Defaults to DEFAULT_FALLBACK_RESPONSE.
+            max_concurrent_calls (int): Backend calls running at once; more wait their turn
+                                        (within their timeout).
+        """
+        self.backend = backend
+        self.model_name = model_name or getattr(backend, 'model_name', None)
+        self.cache = cache
+        self.timeout = timeout
+        self.fallback = fallback or (lambda prompt: DEFAULT_FALLBACK_RESPONSE)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_calls, thread_name_prefix='llm-call')
+        self._in_flight = {} # prompt key -> Future of the backend call
+        # Reentrant: a call that has already finished runs its done callback (_finish,
+        # which takes this lock) inside add_done_callback, while generate() holds it.
+        self._lock = threading.RLock()
+        self._counters = {
+            'calls': 0,
+            'coalesced': 0,
+            'cache_hits': 0,
+            'timeouts': 0,
+            'errors': 0,
+        }
+
+    def _call_backend(self, key, prompt):
+        response = self.backend(prompt)
+        if self.cache is not None and response is not None:
+            try:
+                self.cache.put(key, response)
+            except sqlite3.Error as e:
+                logger.error("Could not cache LLM response: %s", e)
+        return response
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def generate(self, prompt, timeout=None):
+        """
+        Returns the LLM response for `prompt`, or the fallback if the call fails or
+        takes longer than `timeout` (defaults to the client's timeout).
+        """
+        key = prompt_key(self.model_name, prompt)
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(key)
+            except sqlite3.Error as e:
+                logger.error("Could not read LLM response cache: %s", e)
+                cached = None
+            if cached is not None:
+                with self._lock:
+                    self._counters['cache_hits'] += 1
+                return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                self._counters['calls'] += 1
+                future = self._executor.submit(self._call_backend, key, prompt)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda done, key=key: self._finish(key, done))
+            else:
+                self._counters['coalesced'] += 1
+
+        try:
+            response = future.result(timeout=self.timeout if timeout is None else timeout)
+            if response is not None:
+                return response
+        except FutureTimeoutError:
+            with self._lock:
+                self._counters['timeouts'] += 1
+            logger.warning("LLM call timed out after %.1fs", self.timeout if timeout is None else timeout)
+        except Exception as e:
+            with self._lock:
+                self._counters['errors'] += 1
+            logger.error("An error occurred with the LLM: %s", e)
+        return self.fallback(prompt)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._in_flight)
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
@@ -1,44 +1,138 @@
+import hmac
 import json
+import logging
+import math
+import os
+import threading
+import time
 import mysql.connector
-import re # Make sure to import re for regex
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS # Needed to allow your frontend to talk to your backend
 
+from app_logging import TRACE_LOGGER_NAME, card_trace, card_trace_enabled, configure_logging, should_trace
+from binary_catalog import BinaryCatalogStore
+from card_catalog import CardCatalog
+from card_model import Card
+from catalog_store import CatalogStore, SQLiteCatalogStore
+from db_pool import POOL_CONFIG, PoolTimeoutError, get_shared_pool
+import agent
+from explanations import ExplanationService
+from llm_client import CachedLLMClient, NoOpBackend, PromptCache
+from metrics import MetricsRegistry
+from portfolio import PORTFOLIO_OBJECTIVES, PortfolioOptimizer
+from query_parser import parse_user_query
+from reward_rules import CATEGORY_STEP, MERCHANT_STEP, get_reward_plan
+from ttl_cache import TTLCache
+
+configure_logging()
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger(TRACE_LOGGER_NAME)
+
 # --- Database Configuration ---
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '-Z0]({779hNZZ2iNpx<b-1h!=', # Your MySQL password here
-    'database': 'credit_card_advisor_db'
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''), # Your MySQL password, from the environment
+    'database': os.getenv('DB_NAME', 'credit_card_advisor_db')
 }
 
-# --- Database Manager Class ---
-class DatabaseManager:
-    def __init__(self, db_config):
-        self.db_config = db_config
-        self.connection = None
+# Where the card catalog is read from: 'mysql' (DB_CONFIG), 'sqlite' for a local file
+# exported with `python catalog_store.py export <path>` (read-only nodes, tests, benchmarks),
+# or 'binary' for a memory-mapped file compiled with `python binary_catalog.py build <path>`.
+CATALOG_BACKEND = os.getenv('CATALOG_BACKEND', 'mysql')
+CATALOG_SQLITE_PATH = os.getenv('CATALOG_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.sqlite3'))
+CATALOG_BINARY_PATH = os.getenv('CATALOG_BINARY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.ccbin'))
+
+# Connection pool settings are db_pool.POOL_CONFIG, shared with database_manager.DatabaseManager.
+
+# Number of cards returned by /recommend
+TOP_K_RECOMMENDATIONS = 3
+MAX_TOP_K = 50 # Largest "top_k" a /recommend request may ask for
+
+# Cards combined by /recommend/portfolio, by default and at most
+DEFAULT_PORTFOLIO_CARDS = 3
+MAX_PORTFOLIO_CARDS = 4
+
+# Largest number of items accepted by /recommend/batch
+MAX_BATCH_ITEMS = 5000
+
+# Batch items parsed, filtered and scored together; bounds memory while streaming
+BATCH_CHUNK_SIZE = 256
+
+# Bounded caches in front of parse_user_query and the ranked top-k recommendations
+QUERY_CACHE_CONFIG = {'max_size': 10000, 'ttl_seconds': 3600}
+RECOMMENDATION_CACHE_CONFIG = {'max_size': 10000, 'ttl_seconds': 600}
+
+# Fraction of /recommend requests that log per-card filter traces. A request can also
+# ask for a trace by sending TRACE_HEADER_SECRET in the TRACE_HEADER header; without a
+# secret configured the header is ignored, so clients cannot flood the logs.
+TRACE_SAMPLE_RATE = 0.0
+TRACE_HEADER = 'X-Debug-Trace'
+TRACE_HEADER_SECRET = os.getenv('TRACE_HEADER_SECRET')
+
+# Seconds between checks for card catalog changes in the database
+CATALOG_REFRESH_INTERVAL = 60
+
+# --- LLM Explanations ---
+# Natural-language explanations of the top cards, requested with "explain": true.
+# The LLM backend is configured in agent.py; without one, explanations are skipped.
+EXPLANATION_CONFIG = {
+    'top_n': 3,  # Recommendations explained per response
+    'max_concurrency': 8,  # LLM calls in flight across all requests
+    'budget_seconds': 2.0,  # How long a JSON response waits for explanations
+    'timeout_seconds': 10.0  # Per LLM call; also how long an NDJSON stream waits for them
+}
 
-    def connect(self):
-        try:
-            self.connection = mysql.connector.connect(**self.db_config)
-            if self.connection.is_connected():
-                print("DEBUG: Database connection successful.")
-        except mysql.connector.Error as e:
-            print(f"Error: Could not connect to database: {e}")
-            self.connection = None
+# --- Metrics ---
+# Exposed in Prometheus text format at /metrics. Histograms cost one bisect and a few
+# additions per observation, so they stay on in production.
+metrics_registry = MetricsRegistry()
+stage_latency = metrics_registry.histogram(
+    'recommend_stage_seconds', 'Time spent in each stage of the recommendation pipeline.', labelnames=('stage',))
+request_latency = metrics_registry.histogram(
+    'http_request_seconds', 'Time to produce a response (streamed bodies excluded), by endpoint.', labelnames=('endpoint',))
+requests_total = metrics_registry.counter(
+    'http_requests_total', 'Requests served, by endpoint and status code.', labelnames=('endpoint', 'status'))
+filtered_cards_count = metrics_registry.histogram(
+    'recommend_filtered_cards', 'Cards left after eligibility and preference filters, per query.',
+    buckets=(0, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000))
 
-    def close(self):
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("DEBUG: Database connection closed.")
+# --- Database Manager Class ---
+class DatabaseManager(CatalogStore):
+    def __init__(self, db_config, pool=None):
+        self.db_config = db_config
+        # Connections are borrowed from a shared, long-lived pool instead of being
+        # opened and closed on every request.
+        self.pool = pool or get_shared_pool(db_config, **POOL_CONFIG)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def close_idle(self):
+        self.pool.close_idle()
+
+    def _fetch_all(self, query, params=()):
+        with stage_latency.time(stage='db_fetch'), self.pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def fetch_all_credit_cards(self):
+        # Unlike fetch_credit_cards_by_criteria, errors propagate here so a failed
+        # catalog reload keeps serving the previous snapshot instead of an empty one.
+        return self._fetch_all("SELECT * FROM credit_cards")
+
+    def fetch_catalog_version(self):
+        # CHECKSUM TABLE changes whenever any row changes, without needing an
+        # updated_at column or a separate version table.
+        rows = self._fetch_all("CHECKSUM TABLE credit_cards")
+        return rows[0].get('Checksum') if rows else None
 
     def fetch_credit_cards_by_criteria(self, income=None, reward_preference=None, category_preference=None, perks_preference=None):
-        self.connect()
         cards = []
-        if not self.connection:
-            return cards
-
-        cursor = self.connection.cursor(dictionary=True)
         query = "SELECT * FROM credit_cards WHERE 1=1"
         params = []
 
@@ -47,200 +141,44 @@ class DatabaseManager:
             params.append(income)
 
         try:
-            cursor.execute(query, params)
-            cards = cursor.fetchall()
-            print(f"DEBUG: Fetched {len(cards)} cards from DB (before ALL Python-side filters) for income: {income}.")
+            cards = self._fetch_all(query, params)
+            logger.debug("Fetched %d cards from DB for income: %s", len(cards), income)
+        except PoolTimeoutError as e:
+            logger.error("Could not get a database connection: %s", e)
         except mysql.connector.Error as e:
-            print(f"Error fetching cards from DB: {e}")
-        finally:
-            cursor.close()
-            self.close()
+            logger.error("Error fetching cards from DB: %s", e)
         return cards
 
 # --- Utility Functions ---
-def parse_user_query(query):
-    query_lower = query.lower()
-    parsed_data = {
-        'income': None,
-        'spending': {},
-        'reward_preference': None,
-        'category_preference': None,
-        'perks_preference': None
-    }
-
-    # Parse income more specifically
-    # Look for phrases like "my income is X", "I earn X", "I make X"
-    income_patterns = [
-        r"(?:my monthly income is|i earn|i make|my income is)\s*(\d+)",
-        r"income\s*is\s*(\d+)"
-    ]
-    for pattern in income_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            income_val = int(match.group(1))
-            if 10000 <= income_val <= 500000: # Ensure income is within a reasonable range
-                parsed_data['income'] = float(income_val)
-                break
-    # Fallback: if no specific income phrase found, try to find a standalone large number within range
-    if parsed_data['income'] is None:
-        all_numbers = [int(s) for s in query_lower.split() if s.isdigit()]
-        for num in all_numbers:
-            if 10000 <= num <= 500000: # Assuming income is a larger number in this range
-                parsed_data['income'] = float(num)
-                break
-
-
-    # Parse spending
-    # Using more flexible patterns to capture numbers before keywords
-    spending_keywords = {
-        'online shopping': 'online_shopping',
-        'online': 'online_shopping', # 'online' alone should also map to online_shopping
-        'groceries': 'groceries',
-        'fuel': 'fuel',
-        'travel': 'travel',
-        'dining': 'dining'
-    }
-    for keyword, category in spending_keywords.items():
-        # Pattern to capture a number possibly followed by "on" or "for", then the keyword
-        pattern = rf"(\d+)\s*(?:on|for)?\s*{re.escape(keyword)}"
-        match = re.search(pattern, query_lower)
-        if match:
-            parsed_data['spending'][category] = float(match.group(1))
-        else:
-            # Also try matching cases like "20000 online shopping" without "on/for"
-            pattern_direct = rf"(\d+)\s*{re.escape(keyword.replace(' ', '_'))}" # Use category name for single word match
-            match_direct = re.search(pattern_direct, query_lower)
-            if match_direct and match_direct.start(1) < query_lower.find(keyword): # Ensure number comes before keyword
-                parsed_data['spending'][category] = float(match_direct.group(1))
-
-
-    # Parse reward preference
-    if 'cashback' in query_lower:
-        parsed_data['reward_preference'] = 'cashback'
-    elif 'reward points' in query_lower or 'rewards' in query_lower:
-        parsed_data['reward_preference'] = 'reward points'
-    elif 'travel points' in query_lower or 'miles' in query_lower:
-        parsed_data['reward_preference'] = 'travel points'
-
-    # Parse category preference (from spending if available, otherwise direct keyword)
-    if parsed_data['spending']:
-        largest_category = None
-        max_spend = -1
-        for cat, amount in parsed_data['spending'].items():
-            if amount > max_spend:
-                max_spend = amount
-                largest_category = cat
-        parsed_data['category_preference'] = largest_category
-    else:
-        # Fallback if no specific spending provided but category mentioned directly
-        category_keywords = {
-            'online shopping': 'online_shopping',
-            'groceries': 'groceries',
-            'fuel': 'fuel',
-            'travel': 'travel',
-            'dining': 'dining'
-        }
-        for keyword, category in category_keywords.items():
-            if keyword in query_lower:
-                parsed_data['category_preference'] = category
-                break
-
-    # Parse perks preference (simple keyword match)
-    perk_keywords = {
-        'lounge access': 'lounge access',
-        'lounge': 'lounge access',
-        'fuel surcharge waiver': 'fuel surcharge waiver',
-        'dining offers': 'dining offers',
-        'amazon prime': 'amazon prime'
-    }
-    for keyword, perk_type in perk_keywords.items():
-        if keyword in query_lower:
-            parsed_data['perks_preference'] = perk_type
-            break
-
-    print(f"DEBUG: Parsed spending: {parsed_data['spending']}")
-    print(f"DEBUG: Parsed income: {parsed_data['income']}")
-    print(f"DEBUG: Reward preference: {parsed_data['reward_preference']}")
-    print(f"DEBUG: Category preference: {parsed_data['category_preference']}")
-    return parsed_data
-
 def calculate_estimated_rewards(card_data, user_spending):
     """
-    Calculates estimated rewards for a given card based on user's spending.
+    Calculates estimated rewards for a given card (a catalog Card, or a row dict) based on user's spending.
     Returns a dictionary with 'estimated_cashback_monthly_from_spending', 'net_rewards_first_year',
     'net_rewards_subsequent_years', and 'reasoning'.
     """
     monthly_cashback_from_spending = 0.0
     reasoning_parts = []
-    card_reward_rules = json.loads(card_data.get('reward_rate', '{}'))
-
-    # Calculate rewards from spending categories
-    for category_rule in card_reward_rules.get('rewards', []):
-        category_type = category_rule.get('category_type')
-
-        # Ensure rate is float before calculation
-        rate = float(category_rule.get('rate_percent', 0.0))
-
-        if category_type == 'online_shopping' and user_spending.get('online_shopping', 0) > 0:
-            monthly_spend = user_spending['online_shopping']
-            cashback_from_category = (monthly_spend * rate) / 100
-            monthly_cashback_from_spending += cashback_from_category
-            reasoning_parts.append(f"{cashback_from_category:.2f} cashback from online_shopping ({monthly_spend:.2f} spent at {rate}%)")
-
-        elif category_type == 'groceries' and user_spending.get('groceries', 0) > 0:
-            monthly_spend = user_spending['groceries']
-            cashback_from_category = (monthly_spend * rate) / 100
-            monthly_cashback_from_spending += cashback_from_category
-            reasoning_parts.append(f"{cashback_from_category:.2f} cashback from groceries ({monthly_spend:.2f} spent at {rate}%)")
-
-        elif category_type == 'fuel' and user_spending.get('fuel', 0) > 0:
-            monthly_spend = user_spending['fuel']
-            cashback_from_category = (monthly_spend * rate) / 100
-            monthly_cashback_from_spending += cashback_from_category
-            reasoning_parts.append(f"{cashback_from_category:.2f} cashback from fuel ({monthly_spend:.2f} spent at {rate}%)")
-
-        elif category_type == 'dining' and user_spending.get('dining', 0) > 0:
-            monthly_spend = user_spending['dining']
-            cashback_from_category = (monthly_spend * rate) / 100
-            monthly_cashback_from_spending += cashback_from_category
-            reasoning_parts.append(f"{cashback_from_category:.2f} cashback from dining ({monthly_spend:.2f} spent at {rate}%)")
-        
-        elif category_type == 'travel' and user_spending.get('travel', 0) > 0:
-            monthly_spend = user_spending['travel']
-            cashback_from_category = (monthly_spend * rate) / 100
-            monthly_cashback_from_spending += cashback_from_category
-            reasoning_parts.append(f"{cashback_from_category:.2f} cashback from travel ({monthly_spend:.2f} spent at {rate}%)")
-
-        elif category_type == 'specific_merchants' and user_spending.get('online_shopping', 0) > 0:
-            merchants = category_rule.get('merchants', [])
-            if "amazon.in" in [m.lower() for m in merchants]:
-                monthly_spend = user_spending['online_shopping']
-                condition = category_rule.get('condition', '')
+    reward_plan = get_reward_plan(card_data)
+
+    # Calculate rewards from spending categories in a single pass over the compiled rules
+    for step_kind, category_type, rate, condition in reward_plan.steps:
+        if step_kind == CATEGORY_STEP:
+            monthly_spend = user_spending.get(category_type, 0)
+            if monthly_spend > 0:
+                cashback_from_category = (monthly_spend * rate) / 100
+                monthly_cashback_from_spending += cashback_from_category
+                reasoning_parts.append(f"{cashback_from_category:.2f} cashback from {category_type} ({monthly_spend:.2f} spent at {rate}%)")
+
+        elif step_kind == MERCHANT_STEP:
+            monthly_spend = user_spending.get('online_shopping', 0)
+            if monthly_spend > 0:
                 cashback_from_category = (monthly_spend * rate) / 100
                 monthly_cashback_from_spending += cashback_from_category
                 reasoning_parts.append(f"{cashback_from_category:.2f} cashback from specific merchants (e.g., Amazon) ({monthly_spend:.2f} spent at {rate}% {condition})")
-        
-        elif category_type == 'all_other_spends':
-            # Sum up all spending not explicitly covered by other rules
-            total_user_spending = sum(user_spending.values())
-            covered_spending = 0
-            for r in card_reward_rules.get('rewards', []):
-                if r.get('category_type') != 'all_other_spends':
-                    # Need to check if a specific spending category from user_spending matches a rule's category
-                    # This logic needs to be robust to prevent double counting
-                    # A simpler approach for now is to subtract known spending
-                    for k, v in user_spending.items():
-                        if k == r.get('category_type') or \
-                           (k == 'online_shopping' and r.get('category_type') == 'specific_merchants'):
-                            covered_spending += v # This might overcount if multiple specific_merchants rules
-            
-            # This 'all_other_spends' calculation needs careful consideration to not double-count
-            # For simplicity, let's assume `uncovered_spend` is total - sum of explicitly covered.
-            # A more robust solution would be to track remaining spend.
-            
-            # Let's simplify and make sure all_other_spends calculation is correct
-            # For this example, let's just make sure the rate is float
-            uncovered_spend = total_user_spending - covered_spending # This logic might need refinement for complex rules
+
+        else:
+            # 'all_other_spends' pays on whatever the card's other rules don't already cover
+            uncovered_spend = sum(user_spending.values()) - reward_plan.covered_spend(user_spending)
             if uncovered_spend > 0:
                 cashback_from_category = (uncovered_spend * rate) / 100
                 monthly_cashback_from_spending += cashback_from_category
@@ -248,17 +186,22 @@ def calculate_estimated_rewards(card_data, user_spending):
 
 
     # Apply monthly cap if specified in card rules
-    max_cashback_per_month = card_reward_rules.get('max_cashback_per_month')
-    if max_cashback_per_month is not None and monthly_cashback_from_spending > float(max_cashback_per_month):
-        monthly_cashback_from_spending = float(max_cashback_per_month)
+    max_cashback_per_month = reward_plan.cap_raw
+    if reward_plan.cap is not None and monthly_cashback_from_spending > reward_plan.cap:
+        monthly_cashback_from_spending = reward_plan.cap
         reasoning_parts.append(f"Monthly spending rewards capped at card's monthly limit of {max_cashback_per_month:.2f}.")
 
     annual_cashback_from_spending = monthly_cashback_from_spending * 12
 
-    # Ensure fees and bonus values are floats
-    joining_fee = float(card_data.get('joining_fee', 0.0))
-    annual_fee = float(card_data.get('annual_fee', 0.0))
-    welcome_bonus = float(card_data.get('welcome_bonus_value', 0.0))
+    if isinstance(card_data, Card): # Typed once by the catalog loader
+        joining_fee = card_data.joining_fee
+        annual_fee = card_data.annual_fee
+        welcome_bonus = card_data.welcome_bonus_value
+    else:
+        # Ensure fees and bonus values are floats
+        joining_fee = float(card_data.get('joining_fee', 0.0))
+        annual_fee = float(card_data.get('annual_fee', 0.0))
+        welcome_bonus = float(card_data.get('welcome_bonus_value', 0.0))
 
     # First year calculation
     net_rewards_first_year = (annual_cashback_from_spending + welcome_bonus) - joining_fee - annual_fee
@@ -283,142 +226,797 @@ def calculate_estimated_rewards(card_data, user_spending):
         'reasoning': reasoning
     }
 
+# --- Recommendation Pipeline ---
+def parse_user_profile(profile):
+    """
+    Validates a pre-parsed user profile and normalizes it to the shape returned by
+    parse_user_query, so it can go through the same recommendation pipeline.
+
+    Raises:
+        ValueError: If the profile is not an object, has income or spending amounts that
+                    are not finite numbers, or has preferences that are not strings.
+    """
+    if not isinstance(profile, dict):
+        raise ValueError("Profile must be a JSON object.")
+
+    spending = profile.get('spending') or {}
+    if not isinstance(spending, dict):
+        raise ValueError("Profile 'spending' must be an object of category: amount.")
+    amounts = list(spending.values())
+    if profile.get('income') is not None:
+        amounts.append(profile['income'])
+    if any(isinstance(amount, bool) for amount in amounts):
+        raise ValueError("Profile income and spending amounts must be numbers.")
+    try:
+        income = float(profile['income']) if profile.get('income') is not None else None
+        spending = {str(category): float(amount) for category, amount in spending.items()}
+    except (TypeError, ValueError):
+        raise ValueError("Profile income and spending amounts must be numbers.")
+    if not all(math.isfinite(amount) for amount in spending.values()) or (income is not None and not math.isfinite(income)):
+        raise ValueError("Profile income and spending amounts must be finite numbers.")
+
+    for field in ('reward_preference', 'category_preference', 'perks_preference'):
+        if profile.get(field) is not None and not isinstance(profile[field], str):
+            raise ValueError(f"Profile '{field}' must be a string.")
+
+    category_preference = profile.get('category_preference')
+    if not category_preference and spending:
+        # Same rule as parse_user_query: the largest spending category wins
+        category_preference = max(spending, key=spending.get)
+
+    return {
+        'income': income,
+        'spending': spending,
+        'reward_preference': profile.get('reward_preference'),
+        'category_preference': category_preference,
+        'perks_preference': profile.get('perks_preference')
+    }
+
+def filter_cards(available_cards, parsed_query):
+    """
+    Applies the reward type, category and perk preferences to the income-eligible
+    catalog cards (card_model.Card).
+
+    Per-card check results are only logged for requests sampled for tracing
+    (see app_logging.card_trace); otherwise no trace message is ever built.
+    """
+    trace = card_trace_enabled()
+    income = parsed_query.get('income')
+    user_reward_pref = parsed_query.get('reward_preference')
+    user_category_pref = parsed_query.get('category_preference')
+    user_perks_pref = parsed_query.get('perks_preference')
+    user_perks_pref_lower = user_perks_pref.lower() if user_perks_pref else None
+
+    filtered_cards = []
+    for card in available_cards:
+        income_check = income >= card.min_income
+
+        reward_type_match = True
+        if user_reward_pref:
+            user_pref_lower = user_reward_pref.lower()
+            card_reward_type_lower = card.reward_type_lower
+            
+            if user_pref_lower == 'cashback':
+                reward_type_match = (card_reward_type_lower == 'cashback')
+            elif user_pref_lower in ['reward points', 'travel points', 'air miles']: # Group similar point types
+                reward_type_match = (card_reward_type_lower in ['reward points', 'travel points', 'air miles'])
+            else:
+                reward_type_match = False # If user asks for something else not explicitly matched
+
+        if user_category_pref:
+            category_match = get_reward_plan(card).matches_category(user_category_pref)
+        else:
+            # If user didn't specify a category preference, any card is fine
+            category_match = True
+
+        perk_match = True # Assume true if no perk preference is given
+        if user_perks_pref_lower:
+            # Check if the card's special perks contain the user's preferred perk keyword
+            if user_perks_pref_lower not in card.special_perks_lower:
+                perk_match = False
+
+        passed = income_check and reward_type_match and category_match and perk_match
+        if passed:
+            filtered_cards.append(card)
+        if trace:
+            trace_logger.debug("Card filter checks", extra={
+                'card': card.name,
+                'income_check': income_check,
+                'card_min_income': card.min_income,
+                'reward_type_match': reward_type_match,
+                'card_reward_type': card.reward_type,
+                'category_match': category_match,
+                'perk_match': perk_match,
+                'passed': passed
+            })
+
+    filtered_cards_count.observe(len(filtered_cards))
+    logger.debug("Filtered %d of %d cards", len(filtered_cards), len(available_cards))
+    return filtered_cards
+
+def select_candidates(snapshot, parsed_query):
+    """
+    Returns the cards that pass filter_cards for `parsed_query`, using the snapshot's
+    inverted index. Requests sampled for tracing go through filter_cards itself so the
+    per-card checks are logged.
+    """
+    if card_trace_enabled():
+        available_cards = snapshot.cards_for_income(parsed_query['income'])
+        logger.debug("%d catalog cards eligible for income: %s", len(available_cards), parsed_query['income'])
+        return filter_cards(available_cards, parsed_query)
+    filtered_cards = snapshot.card_index.select(parsed_query)
+    filtered_cards_count.observe(len(filtered_cards))
+    return filtered_cards
+
+def format_recommendation(card, user_spending):
+    """
+    Builds the display dict for one recommended card, including its reward estimate.
+    """
+    estimated_rewards_info = calculate_estimated_rewards(card, user_spending)
+    return {
+        'name': card.name,
+        'issuer': card.issuer,
+        'estimated_cashback_monthly_from_spending': estimated_rewards_info['estimated_cashback_monthly_from_spending'],
+        'net_rewards_first_year': estimated_rewards_info['net_rewards_first_year'],
+        'net_rewards_subsequent_years': estimated_rewards_info['net_rewards_subsequent_years'],
+        'reasoning': estimated_rewards_info['reasoning'],
+        'reward_type': card.reward_type,
+        'affiliate_link': card.affiliate_link
+    }
+
+def iter_recommendations(snapshot, parsed_query, filtered_cards, top_indices=None, limit=TOP_K_RECOMMENDATIONS):
+    """
+    Yields display dicts for the recommended cards, best first.
+
+    Args:
+        snapshot (CatalogSnapshot): The catalog the cards came from.
+        parsed_query (dict): Output of parse_user_query or parse_user_profile.
+        filtered_cards (list): Cards that passed filter_cards.
+        top_indices (optional): Pre-ranked catalog rows (e.g. from a batch scoring run).
+                                Ranked here with the scoring engine when omitted.
+        limit (int or None): Number of cards to return; None ranks every filtered card.
+    """
+    user_spending = parsed_query['spending']
+    if user_spending: # Only calculate if spending data is available
+        if top_indices is None:
+            # Rank every filtered card at once; reasoning is only built for the cards returned.
+            candidates = [card.catalog_index for card in filtered_cards]
+            with stage_latency.time(stage='score'):
+                if limit is None:
+                    top_indices = snapshot.scoring_engine.rank(user_spending, candidates)
+                else:
+                    top_indices = snapshot.scoring_engine.top_k(user_spending, limit, candidates)
+        for index in top_indices:
+            card = snapshot.cards[index]
+            try:
+                with stage_latency.time(stage='rewards'):
+                    recommendation = format_recommendation(card, user_spending)
+            except Exception as e:
+                logger.debug("Reward calculation failed for card %s: %s", card.name, e)
+                continue
+            yield recommendation
+    else: # If no spending data provided, return cards without reward estimates
+        for card in (filtered_cards if limit is None else filtered_cards[:limit]):
+            yield {
+                'name': card.name,
+                'issuer': card.issuer,
+                'reward_type': card.reward_type,
+                'special_perks': card.special_perks,
+                'affiliate_link': card.affiliate_link,
+                'reasoning': 'Please provide spending details for estimated rewards.'
+            }
+
+def build_recommendations(snapshot, parsed_query, filtered_cards, top_indices=None, limit=TOP_K_RECOMMENDATIONS):
+    """
+    Builds the /recommend response body for one parsed query. Arguments are as for
+    iter_recommendations.
+
+    Returns:
+        dict: The JSON response body.
+    """
+    cards_with_estimated_rewards = list(iter_recommendations(snapshot, parsed_query, filtered_cards, top_indices, limit))
+
+    if not cards_with_estimated_rewards:
+        return {"message": NO_MATCH_MESSAGE}
+
+    # Already ordered by first year net rewards, best first
+    return {
+        "message": RECOMMENDATIONS_MESSAGE,
+        "recommendations": cards_with_estimated_rewards
+    }
+
+def parse_user_query_cached(query):
+    """
+    parse_user_query behind query_cache. Queries are keyed by their lowercased, stripped
+    text, which never changes what the parser extracts.
+    """
+    key = query.lower().strip()
+    parsed_query = query_cache.get(key)
+    if parsed_query is None:
+        parsed_query = parse_user_query(query)
+        query_cache.put(key, parsed_query)
+    # Callers get their own copy so a cached entry can never be modified.
+    return {**parsed_query, 'spending': dict(parsed_query['spending'])}
+
+def recommendation_cache_key(snapshot, parsed_query, limit=TOP_K_RECOMMENDATIONS):
+    """
+    Canonical key for a parsed profile and result size. Spending order is kept because it
+    breaks ties for the largest category. The catalog version is part of the key so
+    entries from an old catalog can never be served, even in the moment before the cache
+    is cleared.
+    """
+    return (
+        snapshot.version,
+        limit,
+        parsed_query['income'],
+        tuple(parsed_query['spending'].items()),
+        parsed_query.get('reward_preference'),
+        parsed_query.get('category_preference'),
+        parsed_query.get('perks_preference')
+    )
+
+def parse_top_k(value):
+    """
+    Validates a requested number of recommendations.
+
+    Raises:
+        ValueError: If it is not an integer between 1 and MAX_TOP_K.
+    """
+    if value is None:
+        return TOP_K_RECOMMENDATIONS
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= MAX_TOP_K:
+        raise ValueError(f"'top_k' must be an integer between 1 and {MAX_TOP_K}.")
+    return value
+
+def parse_max_cards(value):
+    """
+    Validates the requested portfolio size.
+
+    Raises:
+        ValueError: If it is not an integer between 1 and MAX_PORTFOLIO_CARDS.
+    """
+    if value is None:
+        return DEFAULT_PORTFOLIO_CARDS
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= MAX_PORTFOLIO_CARDS:
+        raise ValueError(f"'max_cards' must be an integer between 1 and {MAX_PORTFOLIO_CARDS}.")
+    return value
+
+def invalidate_caches(snapshot=None):
+    query_cache.clear()
+    recommendation_cache.clear()
+
+def prepare_batch_item(position, item, snapshot):
+    """
+    Parses and filters one /recommend/batch item.
+
+    Returns:
+        tuple: (finished result or None, parsed_query, filtered_cards). A finished result is
+               returned for items that need no scoring: errors and missing income.
+    """
+    try:
+        if isinstance(item, ValueError): # An NDJSON line that was not valid JSON
+            raise item
+        if isinstance(item, str):
+            item = {'query': item}
+        if not isinstance(item, dict):
+            raise ValueError("Each item must be a query string or an object.")
+        if item.get('profile') is not None:
+            parsed_query = parse_user_profile(item['profile'])
+        elif item.get('query'):
+            if not isinstance(item['query'], str):
+                raise ValueError("'query' must be a string.")
+            with stage_latency.time(stage='parse'):
+                parsed_query = parse_user_query_cached(item['query'])
+        else:
+            return {"index": position, "status": 400, "error": "No query or profile provided."}, None, None
+
+        if parsed_query.get('income') is None:
+            return {"index": position, "status": 200, "message": INCOME_REQUIRED_MESSAGE}, None, None
+
+        cached_body = recommendation_cache.get(recommendation_cache_key(snapshot, parsed_query))
+        if cached_body is not None:
+            return {"index": position, "status": 200, **cached_body}, None, None
+
+        with stage_latency.time(stage='filter'):
+            filtered_cards = select_candidates(snapshot, parsed_query)
+        return None, parsed_query, filtered_cards
+    except ValueError as e:
+        return {"index": position, "status": 400, "error": str(e)}, None, None
+    except Exception as e:
+        logger.exception("Failed to prepare batch item %d", position)
+        return {"index": position, "status": 500, "error": "An internal server error occurred.", "details": str(e)}, None, None
+
+def _score_batch_chunk(snapshot, chunk):
+    prepared = [(position,) + prepare_batch_item(position, item, snapshot) for position, item in chunk]
+
+    # Score every profile with spending in the chunk as one profiles x cards matrix
+    scored = [entry for entry in prepared if entry[1] is None and entry[2]['spending']]
+    with stage_latency.time(stage='score'):
+        ranked = snapshot.scoring_engine.top_k_batch(
+        [parsed_query['spending'] for _, _, parsed_query, _ in scored],
+        TOP_K_RECOMMENDATIONS,
+        [[card.catalog_index for card in filtered_cards] for _, _, _, filtered_cards in scored]
+    ) if scored else []
+    top_indices_by_position = {entry[0]: top_indices for entry, top_indices in zip(scored, ranked)}
+
+    for position, result, parsed_query, filtered_cards in prepared:
+        if result is None:
+            try:
+                body = build_recommendations(snapshot, parsed_query, filtered_cards, top_indices_by_position.get(position))
+                recommendation_cache.put(recommendation_cache_key(snapshot, parsed_query), body)
+                result = {"index": position, "status": 200, **body}
+            except Exception as e:
+                logger.exception("Failed to build recommendations for batch item %d", position)
+                result = {"index": position, "status": 500, "error": "An internal server error occurred.", "details": str(e)}
+        yield result
+
+def iter_batch_results(snapshot, items, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Generator pipeline for /recommend/batch: parse -> filter -> score -> build, one chunk
+    of items at a time. Results are yielded in input order, and only one chunk is held in
+    memory, so `items` can be a lazily read stream of any length.
+    """
+    chunk = []
+    for position, item in enumerate(items):
+        chunk.append((position, item))
+        if len(chunk) >= chunk_size:
+            yield from _score_batch_chunk(snapshot, chunk)
+            chunk = []
+    if chunk:
+        yield from _score_batch_chunk(snapshot, chunk)
+
+def iter_ndjson_items(stream):
+    """
+    Reads batch items from a newline-delimited JSON request body, one line at a time.
+    Lines that are not valid JSON are passed on as ValueError so they fail individually.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON line: {e}")
+
+def iter_ndjson(records):
+    """
+    Serializes records as newline-delimited JSON. An error part-way through is reported
+    as a final error line, since the response status has already been sent.
+    """
+    try:
+        for record in records:
+            with stage_latency.time(stage='serialize'):
+                line = json.dumps(record) + "\n"
+            yield line
+    except Exception as e:
+        logger.exception("An error occurred while streaming the response")
+        yield json.dumps({"error": "An internal server error occurred.", "details": str(e)}) + "\n"
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def ndjson_response(records):
+    return Response(stream_with_context(iter_ndjson(records)), mimetype=NDJSON_MIMETYPE)
+
+def trace_requested(header_value):
+    """
+    True if a request's TRACE_HEADER value forces per-card tracing: it must match
+    TRACE_HEADER_SECRET, and no value does when the secret is not set.
+    """
+    if not TRACE_HEADER_SECRET or header_value is None:
+        return False
+    return hmac.compare_digest(header_value.encode('utf-8'), TRACE_HEADER_SECRET.encode('utf-8'))
+
+def serialize_response(body, status=200):
+    with stage_latency.time(stage='serialize'):
+        return jsonify(body), status
+
+INCOME_REQUIRED_MESSAGE = "Please tell me your monthly income so I can help you better."
+NO_MATCH_MESSAGE = "I couldn't find any cards matching your criteria. Try adjusting your preferences."
+RECOMMENDATIONS_MESSAGE = "Based on your preferences and spending, here are some top credit card recommendations:"
+PORTFOLIO_SPENDING_REQUIRED_MESSAGE = "Please tell me how much you spend each month per category so I can combine cards for you."
+PORTFOLIO_MESSAGE = "Based on your spending, this combination of cards earns the most, with each category paid by the card listed for it. Every card holds part of your spending; cards are not added for their welcome bonus alone:"
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 # --- Flask App Setup ---
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes
 
-db_manager = DatabaseManager(DB_CONFIG)
+def create_catalog_store():
+    """
+    Returns the CatalogStore selected by CATALOG_BACKEND.
+    """
+    if CATALOG_BACKEND == 'sqlite':
+        return SQLiteCatalogStore(CATALOG_SQLITE_PATH)
+    if CATALOG_BACKEND == 'binary':
+        return BinaryCatalogStore(CATALOG_BINARY_PATH)
+    if CATALOG_BACKEND != 'mysql':
+        raise ValueError(f"Unknown CATALOG_BACKEND: {CATALOG_BACKEND!r}")
+    return DatabaseManager(DB_CONFIG)
+
+db_manager = create_catalog_store()
+# The card catalog is served from memory; the database is only polled for changes.
+card_catalog = CardCatalog(db_manager, refresh_interval=CATALOG_REFRESH_INTERVAL)
+
+query_cache = TTLCache(**QUERY_CACHE_CONFIG)
+recommendation_cache = TTLCache(**RECOMMENDATION_CACHE_CONFIG)
+card_catalog.add_listener(invalidate_caches)
+
+metrics_registry.gauge('catalog_cards', 'Cards in the served catalog snapshot.',
+                       lambda: card_catalog.stats()['card_count'])
+metrics_registry.gauge('catalog_snapshot_age_seconds', 'Seconds since the served catalog snapshot was loaded.',
+                       card_catalog.age_seconds)
+metrics_registry.gauge('catalog_reloads_total', 'Catalog snapshots loaded.',
+                       lambda: card_catalog.stats()['reloads'], type_name='counter')
+metrics_registry.gauge('cache_hits_total', 'Cache hits, by cache.',
+                       lambda: {'query': query_cache.stats()['hits'], 'recommendation': recommendation_cache.stats()['hits']},
+                       labelnames=('cache',), type_name='counter')
+metrics_registry.gauge('cache_misses_total', 'Cache misses, by cache.',
+                       lambda: {'query': query_cache.stats()['misses'], 'recommendation': recommendation_cache.stats()['misses']},
+                       labelnames=('cache',), type_name='counter')
+metrics_registry.gauge('cache_entries', 'Entries currently cached, by cache.',
+                       lambda: {'query': len(query_cache), 'recommendation': len(recommendation_cache)},
+                       labelnames=('cache',))
+metrics_registry.gauge('db_pool_connections', 'Pooled database connections, by state.',
+                       lambda: {state: db_manager.pool_stats()[state] for state in ('idle', 'in_use')},
+                       labelnames=('state',))
+metrics_registry.gauge('llm_explanations_total', 'Card explanations requested from the LLM, by outcome.',
+                       lambda: explanation_stats(), labelnames=('outcome',), type_name='counter')
+metrics_registry.gauge('db_pool_acquire_timeouts_total', 'Requests that timed out waiting for a database connection.',
+                       lambda: db_manager.pool_stats()['acquire_timeouts'], type_name='counter')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        request_latency.observe(time.perf_counter() - started, endpoint=endpoint)
+    requests_total.inc(endpoint=endpoint, status=str(response.status_code))
+    return response
 
 @app.route('/recommend', methods=['POST'])
 def recommend_cards():
+    """
+    Recommends cards for one natural-language query.
+
+    Set "top_k" in the body to change how many cards are returned (default 3), or
+    "rank_all": true to rank every matching card. Set "explain": true to add LLM
+    explanations of the top cards (see explain_recommendations).
+    With ?format=ndjson (or Accept: application/x-ndjson) the response is streamed as a
+    message line followed by one line per recommended card.
+    """
     try:
-        user_input_data = request.json
-        user_query = user_input_data.get('query')
-
-        if not user_query:
-            return jsonify({"error": "No query provided in the request."}), 400
-
-        parsed_query = parse_user_query(user_query)
-
-        income = parsed_query.get('income')
-        if income is None:
-            # If income is not found in the query, respond as the advisor would
-            return jsonify({"message": "Please tell me your monthly income so I can help you better."}), 200
-
-        available_cards = db_manager.fetch_credit_cards_by_criteria(
-            income=income,
-            reward_preference=parsed_query.get('reward_preference'),
-            category_preference=parsed_query.get('category_preference'),
-            perks_preference=parsed_query.get('perks_preference')
-        )
-
-        filtered_cards = []
-        for card in available_cards:
-            print(f"DEBUG: --- Starting processing for card: {card.get('name')} ---")
-
-            income_check = income >= card.get('min_income', 0)
-            print(f"DEBUG:   Income Check (User: {income}, Card Min: {card.get('min_income', 0)}): {income_check}")
-
-            reward_type_match = True
-            if parsed_query.get('reward_preference'):
-                user_pref_lower = parsed_query['reward_preference'].lower()
-                card_reward_type_lower = card.get('reward_type', '').lower()
-                
-                if user_pref_lower == 'cashback':
-                    reward_type_match = (card_reward_type_lower == 'cashback')
-                elif user_pref_lower in ['reward points', 'travel points', 'air miles']: # Group similar point types
-                    reward_type_match = (card_reward_type_lower in ['reward points', 'travel points', 'air miles'])
+        payload, status, streamed = handle_recommend_request(
+            request.json, lambda: card_catalog.snapshot,
+            ndjson=wants_ndjson(), trace_forced=trace_requested(request.headers.get(TRACE_HEADER)))
+        if streamed:
+            return ndjson_response(payload)
+        return serialize_response(payload, status)
+
+    except Exception as e:
+        logger.exception("An internal server error occurred in recommend_cards endpoint")
+        return jsonify({"error": "An internal server error occurred.", "details": str(e)}), 500
+
+_explanation_service = None
+_explanation_service_lock = threading.Lock()
+
+def get_explanation_service():
+    """
+    Returns the process-wide ExplanationService, creating it (and the LLM client behind
+    it) on first use, or None if no LLM backend is available.
+    """
+    global _explanation_service
+    if _explanation_service is None:
+        with _explanation_service_lock:
+            if _explanation_service is None:
+                try:
+                    backend = agent.get_backend()
+                except ValueError as e:
+                    logger.error("LLM explanations are disabled: %s", e)
+                    backend = None
+                if backend is None or isinstance(backend, NoOpBackend):
+                    _explanation_service = False
                 else:
-                    reward_type_match = False # If user asks for something else not explicitly matched
-            print(f"DEBUG:   Reward Type Check (User: {parsed_query.get('reward_preference')}, Card: {card.get('reward_type')}): {reward_type_match}")
-
-
-            category_match = False
-            user_category_pref = parsed_query.get('category_preference')
-            if user_category_pref:
-                card_reward_rules = json.loads(card.get('reward_rate', '{}'))
-                found_category = False
-                for rule in card_reward_rules.get('rewards', []):
-                    # Check for direct category match
-                    if rule.get('category_type', '').lower() == user_category_pref.lower():
-                        found_category = True
-                        break
-                    # Special handling for online_shopping if card has 'specific_merchants'
-                    if user_category_pref == 'online_shopping' and rule.get('category_type', '').lower() == 'specific_merchants':
-                        found_category = True
-                        break
-                category_match = found_category
-            else:
-                # If user didn't specify a category preference, any card is fine
-                category_match = True
-            print(f"DEBUG:   Category Check (User: {parsed_query.get('category_preference')}, Card: {card.get('name')}): {category_match}")
+                    # Shares the response cache file with agent.get_llm_response.
+                    client = CachedLLMClient(
+                        backend, cache=PromptCache(agent.llm_settings()['cache_path'], max_entries=agent.LLM_CACHE_MAX_ENTRIES,
+                                                   ttl_seconds=agent.LLM_CACHE_TTL_SECONDS),
+                        timeout=EXPLANATION_CONFIG['timeout_seconds'], fallback=lambda prompt: None,
+                        max_concurrent_calls=EXPLANATION_CONFIG['max_concurrency'])
+                    _explanation_service = ExplanationService(
+                        client.generate, max_concurrency=EXPLANATION_CONFIG['max_concurrency'],
+                        budget_seconds=EXPLANATION_CONFIG['budget_seconds'], top_n=EXPLANATION_CONFIG['top_n'])
+    return _explanation_service or None
+
+def explanation_stats():
+    # Does not create the service: scraping /metrics must not configure the LLM.
+    service = _explanation_service
+    return service.stats() if service else dict.fromkeys(('requested', 'attached', 'streamed', 'dropped'), 0)
+
+def explain_recommendations(body, parsed_query, ndjson=False):
+    """
+    Adds LLM explanations to a /recommend body without changing the ranking.
+
+    The top recommendations are explained concurrently. A JSON response waits up to the
+    budget, attaches the explanations that finished (as "explanation") and drops the
+    rest; every card still has its "reasoning". An NDJSON response streams the cards
+    right away, then one {"index", "name", "explanation"} line per explanation as it
+    finishes.
+
+    Returns:
+        tuple: (payload, status, streamed), as handle_recommend_request.
+    """
+    service = get_explanation_service()
+    recommendations = body.get("recommendations")
+    if service is None or not recommendations:
+        return (_iter_body_lines(body), 200, True) if ndjson else (body, 200, False)
+
+    futures = service.start(recommendations, parsed_query)
+    if ndjson:
+        return _iter_explained_lines(body, service, futures), 200, True
+
+    explanations, pending = service.collect(futures)
+    service.drop(pending)
+    # The body may be shared with the recommendation cache; never modify it in place.
+    explained = [dict(recommendation, explanation=explanations[index]) if index in explanations else recommendation
+                 for index, recommendation in enumerate(recommendations)]
+    return dict(body, recommendations=explained), 200, False
+
+def _iter_explained_lines(body, service, futures):
+    yield from _iter_body_lines(body)
+    recommendations = body["recommendations"]
+    for index, text in service.iter_late(futures, EXPLANATION_CONFIG['timeout_seconds']):
+        yield {"index": index, "name": recommendations[index].get("name"), "explanation": text}
+
+def handle_recommend_request(user_input_data, get_snapshot, ndjson=False, trace_forced=False):
+    """
+    The body of /recommend, independent of the web framework so the Flask route and the
+    ASGI app (asgi_app.py) produce identical responses.
+
+    Args:
+        user_input_data (dict): The decoded JSON request body.
+        get_snapshot (callable): Returns the CatalogSnapshot to serve from.
+        ndjson (bool): Whether the client asked for an NDJSON stream.
+        trace_forced (bool): Whether the client forced per-card tracing.
+
+    Returns:
+        tuple: (payload, status, streamed). When streamed is True, payload is an iterator
+               of NDJSON records; otherwise it is the JSON body.
+    """
+    user_query = user_input_data.get('query')
 
+    if not user_query:
+        return {"error": "No query provided in the request."}, 400, False
+    try:
+        top_k = parse_top_k(user_input_data.get('top_k'))
+    except ValueError as e:
+        return {"error": str(e)}, 400, False
+
+    with stage_latency.time(stage='parse'):
+        parsed_query = parse_user_query_cached(user_query)
+
+    income = parsed_query.get('income')
+    if income is None:
+        # If income is not found in the query, respond as the advisor would
+        return {"message": INCOME_REQUIRED_MESSAGE}, 200, False
+
+    snapshot = get_snapshot()
+    rank_all = bool(user_input_data.get('rank_all'))
+    explain = bool(user_input_data.get('explain')) and not rank_all
+
+    # Repeated profiles are answered from the cache without filtering or scoring.
+    # Full rankings are not cached.
+    cache_key = None if rank_all else recommendation_cache_key(snapshot, parsed_query, top_k)
+    body = recommendation_cache.get(cache_key) if cache_key is not None else None
+    if body is not None:
+        if explain:
+            return explain_recommendations(body, parsed_query, ndjson)
+        if ndjson:
+            return _iter_body_lines(body), 200, True
+        return body, 200, False
+
+    with stage_latency.time(stage='filter'), card_trace(should_trace(TRACE_SAMPLE_RATE, forced=trace_forced)):
+        filtered_cards = select_candidates(snapshot, parsed_query)
+    limit = None if rank_all else top_k
+
+    if rank_all and ndjson:
+        return _iter_recommendation_lines(snapshot, parsed_query, filtered_cards, limit), 200, True
+
+    body = build_recommendations(snapshot, parsed_query, filtered_cards, limit=limit)
+    if cache_key is not None:
+        recommendation_cache.put(cache_key, body)
+    if explain:
+        return explain_recommendations(body, parsed_query, ndjson)
+    if ndjson:
+        return _iter_body_lines(body), 200, True
+    return body, 200, False
+
+def _iter_recommendation_lines(snapshot, parsed_query, filtered_cards, limit):
+    recommendations = iter_recommendations(snapshot, parsed_query, filtered_cards, limit=limit)
+    first = next(recommendations, None)
+    if first is None:
+        yield {"message": NO_MATCH_MESSAGE}
+        return
+    yield {"message": RECOMMENDATIONS_MESSAGE}
+    yield first
+    yield from recommendations
+
+def _iter_body_lines(body):
+    yield {"message": body["message"]}
+    yield from body.get("recommendations", [])
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_cards_batch():
+    """
+    Scores many queries in one request.
+
+    Body: {"items": [...]} where each item is a query string, {"query": "..."} or
+    {"profile": {"income": ..., "spending": {...}, "reward_preference": ..., ...}}.
+    Results come back in input order as {"results": [{"index", "status", ...body}]},
+    where body is what /recommend would return for that item on its own. A bad item
+    gets its own error entry instead of failing the whole batch.
+
+    With ?format=ndjson (or Accept: application/x-ndjson) each result is streamed as its
+    own line as soon as its chunk is scored. The items may then also be sent as an
+    application/x-ndjson body, one item per line, which is read incrementally and is not
+    subject to MAX_BATCH_ITEMS.
+    """
+    try:
+        # Take one snapshot so the whole batch is scored against the same catalog.
+        snapshot = card_catalog.snapshot
 
-            perk_match = True # Assume true if no perk preference is given
-            user_perks_pref = parsed_query.get('perks_preference')
-            if user_perks_pref:
-                card_perks = card.get('special_perks', '').lower()
-                # Check if the card's special perks contain the user's preferred perk keyword
-                if user_perks_pref.lower() not in card_perks:
-                    perk_match = False
-            print(f"DEBUG:   Perk Check (User: {parsed_query.get('perks_preference')}, Card: {card.get('name')}): {perk_match}")
+        if request.mimetype == NDJSON_MIMETYPE:
+            if not wants_ndjson():
+                return jsonify({"error": "NDJSON request bodies require an NDJSON response (?format=ndjson)."}), 400
+            return ndjson_response(iter_batch_results(snapshot, iter_ndjson_items(request.stream)))
 
+        user_input_data = request.json
+        items = user_input_data.get('items') if isinstance(user_input_data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Provide a non-empty 'items' list in the request."}), 400
 
-            if income_check and reward_type_match and category_match and perk_match:
-                print(f"DEBUG:   Card {card.get('name')} PASSED ALL FILTERS.")
-                filtered_cards.append(card)
-            else:
-                print(f"DEBUG:   Card {card.get('name')} FAILED FILTERS.")
+        if wants_ndjson():
+            return ndjson_response(iter_batch_results(snapshot, items))
 
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({"error": f"A batch may contain at most {MAX_BATCH_ITEMS} items. Use ?format=ndjson for larger batches."}), 400
+        return serialize_response({"results": list(iter_batch_results(snapshot, items))})
 
-        print(f"DEBUG: Fetched {len(filtered_cards)} cards (after ALL Python-side filters).")
+    except Exception as e:
+        logger.exception("An internal server error occurred in recommend_cards_batch endpoint")
+        return jsonify({"error": "An internal server error occurred.", "details": str(e)}), 500
 
-        # Process filtered cards to calculate rewards
-        cards_with_estimated_rewards = []
-        for card in filtered_cards:
-            if parsed_query['spending']: # Only calculate if spending data is available
-                try:
-                    estimated_rewards_info = calculate_estimated_rewards(card, parsed_query['spending'])
-                    card_info_for_display = {
-                        'name': card.get('name'),
-                        'issuer': card.get('issuer'),
-                        'estimated_cashback_monthly_from_spending': estimated_rewards_info['estimated_cashback_monthly_from_spending'],
-                        'net_rewards_first_year': estimated_rewards_info['net_rewards_first_year'],
-                        'net_rewards_subsequent_years': estimated_rewards_info['net_rewards_subsequent_years'],
-                        'reasoning': estimated_rewards_info['reasoning'],
-                        'reward_type': card.get('reward_type'),
-                        'affiliate_link': card.get('affiliate_link')
-                    }
-                    cards_with_estimated_rewards.append(card_info_for_display)
-                except Exception as e:
-                    print(f"DEBUG: An error occurred during card reward calculation for {card.get('name')}: {e}")
-                    pass
-            else: # If no spending data provided, return card without reward estimates
-                cards_with_estimated_rewards.append({
-                    'name': card.get('name'),
-                    'issuer': card.get('issuer'),
-                    'reward_type': card.get('reward_type'),
-                    'special_perks': card.get('special_perks'),
-                    'affiliate_link': card.get('affiliate_link'),
-                    'reasoning': 'Please provide spending details for estimated rewards.'
-                })
-
-
-        if not cards_with_estimated_rewards:
-            return jsonify({"message": "I couldn't find any cards matching your criteria. Try adjusting your preferences."}), 200
-
-        # Sort by first year net rewards for best recommendation
-        cards_with_estimated_rewards.sort(key=lambda x: x.get('net_rewards_first_year', -float('inf')), reverse=True)
-
-        return jsonify({
-            "message": "Based on your preferences and spending, here are some top credit card recommendations:",
-            "recommendations": cards_with_estimated_rewards[:3] # Return top 3
-        }), 200
+def build_portfolio(snapshot, user_spending, result, objective):
+    """
+    Builds the /recommend/portfolio response body from a PortfolioOptimizer result.
+
+    Each card's estimate is calculate_estimated_rewards on the spending routed to it, so
+    the portfolio totals are the sum of what /recommend would report for each card given
+    only its categories. The best single card holding all the spending is included for
+    comparison.
+    """
+    if result is None:
+        return {"message": NO_MATCH_MESSAGE}
+
+    portfolio = []
+    for index, categories in result['routing'].items():
+        routed_spending = {category: user_spending[category] for category in categories}
+        with stage_latency.time(stage='rewards'):
+            recommendation = format_recommendation(snapshot.cards[index], routed_spending)
+        recommendation['routed_spending'] = routed_spending
+        portfolio.append(recommendation)
+
+    with stage_latency.time(stage='rewards'):
+        best_single_card = format_recommendation(snapshot.cards[result['single_card']], user_spending)
+    totals = ('estimated_cashback_monthly_from_spending', 'net_rewards_first_year', 'net_rewards_subsequent_years')
+    return {
+        "message": PORTFOLIO_MESSAGE,
+        "objective": objective,
+        "portfolio": portfolio,
+        **{total: sum(recommendation[total] for recommendation in portfolio) for total in totals},
+        "best_single_card": best_single_card,
+        "optimal": result['optimal']
+    }
+
+def handle_portfolio_request(user_input_data, get_snapshot):
+    """
+    The body of /recommend/portfolio, independent of the web framework so the Flask route
+    and the ASGI app produce identical responses.
+
+    Candidates pass the same income, reward type and perk filters as /recommend. The
+    category preference is not applied: the other cards of a portfolio are there for the
+    other categories.
+
+    Returns:
+        tuple: (body, status)
+    """
+    if not isinstance(user_input_data, dict):
+        return {"error": "The request body must be a JSON object."}, 400
+    try:
+        max_cards = parse_max_cards(user_input_data.get('max_cards'))
+        objective = user_input_data.get('objective') or PORTFOLIO_OBJECTIVES[0]
+        if objective not in PORTFOLIO_OBJECTIVES:
+            raise ValueError(f"'objective' must be one of: {', '.join(PORTFOLIO_OBJECTIVES)}.")
+        if user_input_data.get('profile') is not None:
+            parsed_query = parse_user_profile(user_input_data['profile'])
+        elif user_input_data.get('query'):
+            with stage_latency.time(stage='parse'):
+                parsed_query = parse_user_query_cached(user_input_data['query'])
+        else:
+            return {"error": "No query or profile provided in the request."}, 400
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    if parsed_query.get('income') is None:
+        return {"message": INCOME_REQUIRED_MESSAGE}, 200
+    user_spending = parsed_query['spending']
+    if not any(amount > 0 for amount in user_spending.values()):
+        return {"message": PORTFOLIO_SPENDING_REQUIRED_MESSAGE}, 200
+
+    snapshot = get_snapshot()
+    eligibility_query = dict(parsed_query, category_preference=None)
+    cache_key = ('portfolio', max_cards, objective) + recommendation_cache_key(snapshot, eligibility_query, None)
+    body = recommendation_cache.get(cache_key)
+    if body is not None:
+        return body, 200
+
+    with stage_latency.time(stage='filter'):
+        candidates = select_candidates(snapshot, eligibility_query)
+    with stage_latency.time(stage='portfolio'):
+        optimizer = PortfolioOptimizer(snapshot.scoring_engine, user_spending,
+                                       [card.catalog_index for card in candidates], objective)
+        result = optimizer.optimize(max_cards)
+    if result is not None and not result['optimal']:
+        logger.warning("Portfolio search stopped after %d nodes over %d cards", result['nodes'], len(optimizer))
+
+    body = build_portfolio(snapshot, user_spending, result, objective)
+    recommendation_cache.put(cache_key, body)
+    return body, 200
+
+@app.route('/recommend/portfolio', methods=['POST'])
+def recommend_portfolio():
+    """
+    Recommends the combination of up to "max_cards" cards (default 3) that earns the most
+    when each spending category is paid with the best card of the combination.
+
+    Body: {"query": "..."} or {"profile": {...}} as for /recommend/batch items, plus
+    optional "max_cards" and "objective" ("first_year", the default, or
+    "subsequent_years"). The response lists each card with the spending routed to it
+    ("routed_spending") and its estimate on that spending, the portfolio totals, and
+    the best single card for comparison. Every card listed holds some of the spending
+    (see portfolio.py).
+    """
+    try:
+        body, status = handle_portfolio_request(request.get_json(silent=True), lambda: card_catalog.snapshot)
+        return serialize_response(body, status)
 
     except Exception as e:
-        print(f"ERROR: An internal server error occurred in recommend_cards endpoint: {e}")
+        logger.exception("An internal server error occurred in recommend_portfolio endpoint")
         return jsonify({"error": "An internal server error occurred.", "details": str(e)}), 500
 
+@app.route('/catalog/status', methods=['GET'])
+def catalog_status():
+    return jsonify(card_catalog.stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/status', methods=['GET'])
+def cache_status():
+    return jsonify({
+        'query_cache': query_cache.stats(),
+        'recommendation_cache': recommendation_cache.stats()
+    }), 200
+
 # This ensures the Flask app runs when you execute the script directly
 if __name__ == '__main__':
+    # Development server. In production: gunicorn -c gunicorn.conf.py main:app
+    card_catalog.start()
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
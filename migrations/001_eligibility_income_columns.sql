@@ -0,0 +1,34 @@
+USE credit_card_advisor_db;
+
+-- Typed minimum-income columns parsed from eligibility_criteria, so income filters are
+-- index range scans instead of a CAST/REPLACE over the free text of every row.
+-- Amounts are whole rupees; NULL means the criteria text states no income requirement.
+-- Rows inserted after this migration are filled in by
+-- database_manager.DatabaseManager.backfill_eligibility_columns(), which uses the same
+-- parser (eligibility.parse_eligibility_criteria) that produced the values below.
+
+ALTER TABLE credit_cards
+    ADD COLUMN salaried_min_monthly_income INT UNSIGNED NULL AFTER eligibility_criteria,
+    ADD COLUMN salaried_min_annual_income INT UNSIGNED NULL AFTER salaried_min_monthly_income,
+    ADD COLUMN self_employed_min_monthly_income INT UNSIGNED NULL AFTER salaried_min_annual_income,
+    ADD COLUMN self_employed_min_annual_income INT UNSIGNED NULL AFTER self_employed_min_monthly_income;
+
+CREATE INDEX idx_credit_cards_salaried_min_monthly_income ON credit_cards (salaried_min_monthly_income);
+CREATE INDEX idx_credit_cards_self_employed_min_annual_income ON credit_cards (self_employed_min_annual_income);
+CREATE INDEX idx_credit_cards_reward_type ON credit_cards (reward_type);
+
+-- Backfill the cards seeded by Credit_card_advisor_db.sql.
+UPDATE credit_cards
+SET salaried_min_monthly_income = 35000, salaried_min_annual_income = 420000,
+    self_employed_min_monthly_income = 50000, self_employed_min_annual_income = 600000
+WHERE name = 'HDFC Bank Millennia Credit Card';
+
+UPDATE credit_cards
+SET salaried_min_monthly_income = 30000, salaried_min_annual_income = 360000,
+    self_employed_min_monthly_income = 50000, self_employed_min_annual_income = 600000
+WHERE name = 'SBI Card PRIME';
+
+UPDATE credit_cards
+SET salaried_min_monthly_income = 15000, salaried_min_annual_income = 180000,
+    self_employed_min_monthly_income = 25000, self_employed_min_annual_income = 300000
+WHERE name = 'ICICI Bank Amazon Pay Credit Card';
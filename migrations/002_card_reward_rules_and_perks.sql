@@ -0,0 +1,26 @@
+USE credit_card_advisor_db;
+
+-- Normalized reward rules and perks, so category and perk filters are indexed semi-joins
+-- instead of leading-wildcard LIKE scans over the reward_rate and special_perks TEXT columns.
+-- Both tables are derived from those columns: fill (or refresh) them with
+-- database_manager.DatabaseManager.load_card_rules(), which parses the text with card_rules.py.
+
+CREATE TABLE card_reward_rules (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    card_id INT NOT NULL,
+    category VARCHAR(32) NOT NULL, -- online_shopping, groceries, fuel, dining, travel or all_other
+    rate DECIMAL(6, 2) NOT NULL, -- percent, or reward points per Rs 100
+    cap INT UNSIGNED NULL, -- monthly reward cap in rupees, NULL if uncapped
+    merchant VARCHAR(64) NULL, -- set when the rule only applies at one merchant
+    CONSTRAINT fk_card_reward_rules_card FOREIGN KEY (card_id) REFERENCES credit_cards (id) ON DELETE CASCADE,
+    INDEX idx_card_reward_rules_category_card (category, card_id),
+    INDEX idx_card_reward_rules_merchant_card (merchant, card_id)
+);
+
+CREATE TABLE card_perks (
+    card_id INT NOT NULL,
+    perk_code VARCHAR(32) NOT NULL, -- lounge_access, fuel_surcharge_waiver, dining_offers, ...
+    PRIMARY KEY (card_id, perk_code),
+    CONSTRAINT fk_card_perks_card FOREIGN KEY (card_id) REFERENCES credit_cards (id) ON DELETE CASCADE,
+    INDEX idx_card_perks_perk_card (perk_code, card_id)
+);
@@ -0,0 +1,252 @@
+"""
+Multi-card portfolios: the combination of up to N cards that earns the most when every
+spending category is paid with whichever card in the combination pays it best.
+
+A card's rewards on the categories routed to it follow calculate_estimated_rewards on
+that part of the spending: category and merchant rules pay on their categories,
+'all_other_spends' pays on the routed spend the card's other rules don't cover, and the
+monthly cap applies to the card's total. Every card in the portfolio adds its own fees
+and welcome bonus.
+
+Every card in a portfolio holds at least one spending category. A card whose welcome
+bonus exceeds its fees would raise the first-year total even with no spend routed to it,
+but such cards are never added just for the bonus: a portfolio is a way to pay for the
+user's spending, not a list of sign-up offers.
+
+The search is a depth-first branch-and-bound over routings. Categories are assigned one
+at a time, either to a card already in the portfolio or to a new card while slots are
+left. Each node has an upper bound: the capped rewards of the cards so far, plus each
+remaining category at the best rate any card could pay on it. Subtrees whose bound
+cannot beat the best portfolio found so far (seeded with the best single card) are
+skipped, so only a small part of the catalog is ever combined.
+"""
+import numpy as np
+
+# Net rewards a portfolio is ranked by: the first year (welcome bonus, joining and annual
+# fees) or any later year (annual fee only).
+PORTFOLIO_OBJECTIVES = ('first_year', 'subsequent_years')
+# Search nodes visited before the best portfolio found so far is returned as is.
+MAX_SEARCH_NODES = 200000
+# Slack on the upper bound so floating-point rounding can never prune a winner.
+UPPER_BOUND_SLACK = 1e-6
+
+
+class _SearchBudgetExceeded(Exception):
+    pass
+
+
+class PortfolioOptimizer:
+    """
+    Finds the best portfolio of up to `max_cards` cards for one spending profile.
+
+    Built per request from the snapshot's ScoringEngine, restricted to the candidate rows.
+    """
+    def __init__(self, engine, user_spending, card_indices=None, objective='first_year'):
+        """
+        Args:
+            engine (ScoringEngine): The snapshot's scoring engine.
+            user_spending (dict): Monthly spend per category. Only positive amounts are
+                                  routed; nothing is earned on the rest.
+            card_indices (array-like, optional): Rows that may be picked. Defaults to every card.
+            objective (str): One of PORTFOLIO_OBJECTIVES.
+        """
+        if objective not in PORTFOLIO_OBJECTIVES:
+            raise ValueError(f"Unknown portfolio objective: {objective!r}")
+        self.indices = engine._valid_indices(card_indices)
+        self.categories = [category for category, amount in user_spending.items() if amount > 0]
+        self.spending = {category: user_spending[category] for category in self.categories}
+
+        n_cards, n_categories = len(self.indices), len(self.categories)
+        rates = np.zeros((n_cards, n_categories))
+        covered = np.zeros((n_cards, n_categories))
+        for position, category in enumerate(self.categories):
+            column = engine.category_index.get(category)
+            if column is not None:
+                rates[:, position] = engine.rates[self.indices, column]
+                covered[:, position] = engine.coverage[self.indices, column]
+        spend = np.array([self.spending[category] for category in self.categories], dtype=float)
+
+        # Per card and category, the monthly rewards its category rules pay on that spend,
+        # and what its 'all_other_spends' rate adds (negative when the rules cover the
+        # spend more than once, which lowers the card's uncovered total).
+        self._category_rewards = spend * rates / 100
+        self._other_rewards = spend * (1 - covered) * engine.other_rates[self.indices][:, None] / 100
+        # No card can earn more on a category than both parts, with the second floored at 0.
+        self._category_bounds = self._category_rewards + np.maximum(self._other_rewards, 0.0)
+        self._caps = engine.caps[self.indices]
+        if objective == 'first_year':
+            self._offsets = engine.first_year_offsets[self.indices]
+        else:
+            self._offsets = -engine.annual_fees[self.indices]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def standalone_values(self):
+        """
+        Net rewards per year of each candidate holding all the spending on its own, i.e.
+        the objective of every one-card portfolio.
+        """
+        monthly = self._category_rewards.sum(axis=1) + np.maximum(self._other_rewards.sum(axis=1), 0.0)
+        return np.minimum(monthly, self._caps) * 12 + self._offsets
+
+    def optimize(self, max_cards, max_nodes=MAX_SEARCH_NODES):
+        """
+        Returns the best portfolio of at most `max_cards` cards, each holding at least
+        one category (see the module docstring).
+
+        Ties keep the portfolio found first, and the best single card over any
+        combination that only matches it.
+
+        Returns:
+            dict or None (no candidates, or no positive spending):
+                'routing' (dict of catalog row -> categories routed to it, in spending
+                order; the most valuable card first),
+                'value' (the objective, summed over the portfolio),
+                'single_card' (catalog row of the best one-card portfolio) and
+                'single_card_value', 'nodes' (search nodes visited), and 'optimal'
+                (False when max_nodes ran out before the search finished).
+        """
+        if not len(self.indices) or not self.categories:
+            return None
+        standalone = self.standalone_values()
+        single = int(np.argmax(standalone))
+        search = _Search(self, max_cards, float(standalone[single]), single)
+        optimal = True
+        try:
+            search.visit(0, max_nodes)
+        except _SearchBudgetExceeded:
+            optimal = False
+
+        assigned = dict(zip(search.order, search.best_assignment))
+        routing = {}
+        for position, category in enumerate(self.categories):
+            routing.setdefault(assigned[position], []).append(category)
+        cards = sorted(routing, key=lambda card: -self._card_value(card, routing[card]))
+        return {
+            'routing': {int(self.indices[card]): routing[card] for card in cards},
+            'value': search.best_value,
+            'single_card': int(self.indices[single]),
+            'single_card_value': float(standalone[single]),
+            'nodes': search.nodes,
+            'optimal': optimal,
+        }
+
+    def _card_value(self, card, categories):
+        positions = [self.categories.index(category) for category in categories]
+        monthly = self._category_rewards[card, positions].sum() + max(self._other_rewards[card, positions].sum(), 0.0)
+        return min(monthly, self._caps[card]) * 12 + self._offsets[card]
+
+
+class _Search:
+    """
+    State of one branch-and-bound run. Candidates are local rows of the optimizer's arrays,
+    read as Python lists: the search visits too few nodes per call for NumPy to pay off.
+    """
+    def __init__(self, optimizer, max_cards, single_value, single_card):
+        bounds = optimizer._category_bounds
+        # Most valuable categories first, so the portfolio is mostly decided near the root.
+        self.order = [int(position) for position in np.argsort(-bounds.max(axis=0), kind='stable')]
+        self.category_rewards = optimizer._category_rewards[:, self.order].tolist()
+        self.other_rewards = optimizer._other_rewards[:, self.order].tolist()
+        self.bounds = bounds[:, self.order].tolist()
+        self.caps = optimizer._caps.tolist()
+        self.offsets = optimizer._offsets.tolist()
+        self.max_cards = max_cards
+        n_categories = len(self.order)
+
+        best_bounds = [max(column) for column in zip(*self.bounds)]
+        # Annual bound on categories k.. with at least one slot left for a new card.
+        self.open_bounds = [12 * sum(best_bounds[k:]) for k in range(n_categories + 1)]
+        self.best_new_offset = max(0.0, max(self.offsets))
+        # New-card choices per category, best first by what opening the card with that
+        # category alone can add: its capped rewards on it plus its offset.
+        self.new_cards = []
+        for k in range(n_categories):
+            gains = 12 * np.minimum(bounds[:, self.order[k]], optimizer._caps) + optimizer._offsets
+            ranked = np.argsort(-gains, kind='stable')
+            self.new_cards.append(list(zip(gains[ranked].tolist(), ranked.tolist())))
+
+        self.best_value = single_value
+        self.best_assignment = [single_card] * n_categories
+        self.nodes = 0
+        self.assignment = [None] * n_categories
+        self.used = [] # cards in the portfolio, in the order they were added
+        self.totals = {} # card -> [category rewards, other rewards, bound] over its categories
+
+    def _used_bound(self):
+        bound = 0.0
+        for card in self.used:
+            bound += 12 * min(self.caps[card], self.totals[card][2]) + self.offsets[card]
+        return bound
+
+    def _rest_bound(self, k, slots):
+        """
+        Upper bound on what categories k.. can add, with `slots` new cards still allowed.
+        """
+        if slots:
+            return self.open_bounds[k] + slots * self.best_new_offset
+        bound = 0.0
+        for position in range(k, len(self.assignment)):
+            bound += max(self.bounds[card][position] for card in self.used)
+        return 12 * bound
+
+    def _exact_value(self):
+        value = 0.0
+        for card in self.used:
+            category_rewards, other_rewards, _ = self.totals[card]
+            value += 12 * min(self.caps[card], category_rewards + max(other_rewards, 0.0)) + self.offsets[card]
+        return value
+
+    def _assign(self, k, card):
+        totals = self.totals[card]
+        totals[0] += self.category_rewards[card][k]
+        totals[1] += self.other_rewards[card][k]
+        totals[2] += self.bounds[card][k]
+        self.assignment[k] = card
+
+    def _unassign(self, k, card):
+        totals = self.totals[card]
+        totals[0] -= self.category_rewards[card][k]
+        totals[1] -= self.other_rewards[card][k]
+        totals[2] -= self.bounds[card][k]
+        self.assignment[k] = None
+
+    def visit(self, k, max_nodes):
+        self.nodes += 1
+        if self.nodes > max_nodes:
+            raise _SearchBudgetExceeded()
+        if k == len(self.assignment):
+            value = self._exact_value()
+            if value > self.best_value + UPPER_BOUND_SLACK:
+                self.best_value = value
+                self.best_assignment = list(self.assignment)
+            return
+
+        slots = self.max_cards - len(self.used)
+        # Cards already in the portfolio, best on this category first.
+        for card in sorted(self.used, key=lambda card: -self.bounds[card][k]):
+            self._assign(k, card)
+            if self._used_bound() + self._rest_bound(k + 1, slots) > self.best_value + UPPER_BOUND_SLACK:
+                self.visit(k + 1, max_nodes)
+            self._unassign(k, card)
+
+        if not slots:
+            return
+        # Bounded by the best rates of any card, a new card's bound is this constant plus
+        # its gain. Gains are sorted, so the first card that cannot win ends the loop; the
+        # others are checked again with the tighter bound of the cards actually held.
+        base = self._used_bound() + self.open_bounds[k + 1] + (slots - 1) * self.best_new_offset
+        for gain, card in self.new_cards[k]:
+            if base + gain <= self.best_value + UPPER_BOUND_SLACK:
+                break
+            if card in self.totals:
+                continue
+            self.used.append(card)
+            self.totals[card] = [0.0, 0.0, 0.0]
+            self._assign(k, card)
+            if self._used_bound() + self._rest_bound(k + 1, slots - 1) > self.best_value + UPPER_BOUND_SLACK:
+                self.visit(k + 1, max_nodes)
+            self._unassign(k, card)
+            del self.totals[card]
+            self.used.pop()
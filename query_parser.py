@@ -0,0 +1,189 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Income is only accepted within this range (monthly, in rupees).
+MIN_INCOME = 10000
+MAX_INCOME = 500000
+
+# Spending keywords and the category they map to. A number followed (optionally via
+# "on"/"for") by one of these is read as monthly spend. "online" covers "online shopping".
+SPENDING_KEYWORDS = {
+    'online': 'online_shopping',
+    'groceries': 'groceries',
+    'fuel': 'fuel',
+    'travel': 'travel',
+    'dining': 'dining'
+}
+# Order in which spending categories are reported (and tie-broken for category_preference).
+SPENDING_CATEGORY_ORDER = ('online_shopping', 'groceries', 'fuel', 'travel', 'dining')
+
+# Keywords matched anywhere in the text, mapped to everything their presence implies
+# (e.g. "travel points" also contains "travel").
+KEYWORD_IMPLIES = {
+    'cashback': ('cashback',),
+    'reward points': ('reward points',),
+    'rewards': ('rewards',),
+    'travel points': ('travel points', 'travel'),
+    'miles': ('miles',),
+    'lounge access': ('lounge access', 'lounge'),
+    'lounge': ('lounge',),
+    'fuel surcharge waiver': ('fuel surcharge waiver', 'fuel'),
+    'dining offers': ('dining offers', 'dining'),
+    'amazon prime': ('amazon prime',),
+    'online shopping': ('online shopping',),
+    'groceries': ('groceries',),
+    'fuel': ('fuel',),
+    'travel': ('travel',),
+    'dining': ('dining',)
+}
+
+REWARD_PREFERENCE_KEYWORDS = (
+    (('cashback',), 'cashback'),
+    (('reward points', 'rewards'), 'reward points'),
+    (('travel points', 'miles'), 'travel points')
+)
+CATEGORY_KEYWORDS = (
+    ('online shopping', 'online_shopping'),
+    ('groceries', 'groceries'),
+    ('fuel', 'fuel'),
+    ('travel', 'travel'),
+    ('dining', 'dining')
+)
+PERK_KEYWORDS = (
+    ('lounge', 'lounge access'), # "lounge access" always contains "lounge"
+    ('fuel surcharge waiver', 'fuel surcharge waiver'),
+    ('dining offers', 'dining offers'),
+    ('amazon prime', 'amazon prime')
+)
+
+
+def _alternation(words):
+    # Longest first, so a keyword wins over its own prefix at the same position.
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+# One pattern, scanned once with finditer, that recognises every token the parser needs:
+#   num      - a run of digits, plus the spending keyword it is followed by (if any)
+#   income1  - "my income is 50000" style phrases (value captured by lookahead)
+#   income2  - "income is 50000"
+#   keyword  - any reward/category/perk keyword
+# Everything except the digit run is zero-width, so overlapping tokens (e.g. the
+# "income is" inside "my income is", or "dining" running into "groceries") are all seen.
+TOKEN_PATTERN = re.compile(
+    r"(?P<num>\d+)(?:\s*(?:(?:on|for)\s*)?(?=(?P<spend>" + _alternation(SPENDING_KEYWORDS) + r")))?"
+    r"|(?=(?:my monthly income is|i earn|i make|my income is)\s*(?P<income1>\d+))"
+    r"|(?=income\s*is\s*(?P<income2>\d+))"
+    r"|(?=(?P<keyword>" + _alternation(KEYWORD_IMPLIES) + r"))"
+)
+
+
+def _in_income_range(value):
+    return MIN_INCOME <= value <= MAX_INCOME
+
+
+def tokenize_query(query_lower):
+    """
+    Scans a lowercased query once and collects everything parse_user_query needs.
+
+    Returns:
+        dict: 'income_phrase' / 'income_is' (first value after an income phrase),
+              'standalone_numbers' (whitespace-delimited numbers, in order),
+              'spending' (category -> first amount) and 'keywords' (set of keywords present).
+    """
+    income_phrase = None
+    income_is = None
+    standalone_numbers = []
+    spending = {}
+    keywords = set()
+    text_length = len(query_lower)
+
+    for match in TOKEN_PATTERN.finditer(query_lower):
+        number = match.group('num')
+        if number is not None:
+            start, end = match.span('num')
+            if (start == 0 or query_lower[start - 1].isspace()) and (end == text_length or query_lower[end].isspace()):
+                standalone_numbers.append(number)
+            spend_keyword = match.group('spend')
+            if spend_keyword is not None:
+                spending.setdefault(SPENDING_KEYWORDS[spend_keyword], number)
+        elif match.group('keyword') is not None:
+            keywords.update(KEYWORD_IMPLIES[match.group('keyword')])
+        elif match.group('income1') is not None:
+            if income_phrase is None:
+                income_phrase = match.group('income1')
+        elif income_is is None:
+            income_is = match.group('income2')
+
+    return {
+        'income_phrase': income_phrase,
+        'income_is': income_is,
+        'standalone_numbers': standalone_numbers,
+        'spending': spending,
+        'keywords': keywords
+    }
+
+
+def parse_user_query(query):
+    """
+    Extracts income, spending, reward preference, category preference and perk preference
+    from a natural-language query in a single pass over the text.
+    """
+    tokens = tokenize_query(query.lower())
+    parsed_data = {
+        'income': None,
+        'spending': {},
+        'reward_preference': None,
+        'category_preference': None,
+        'perks_preference': None
+    }
+
+    # Parse income: an explicit income phrase first ("my income is X", "I earn X", ...),
+    # then "income is X", then the first standalone number within range.
+    for phrase_value in (tokens['income_phrase'], tokens['income_is']):
+        if phrase_value is not None and _in_income_range(int(phrase_value)):
+            parsed_data['income'] = float(int(phrase_value))
+            break
+    if parsed_data['income'] is None:
+        for number in tokens['standalone_numbers']:
+            if _in_income_range(int(number)):
+                parsed_data['income'] = float(int(number))
+                break
+
+    # Parse spending
+    for category in SPENDING_CATEGORY_ORDER:
+        if category in tokens['spending']:
+            parsed_data['spending'][category] = float(tokens['spending'][category])
+
+    keywords = tokens['keywords']
+
+    # Parse reward preference
+    for reward_keywords, reward_preference in REWARD_PREFERENCE_KEYWORDS:
+        if any(keyword in keywords for keyword in reward_keywords):
+            parsed_data['reward_preference'] = reward_preference
+            break
+
+    # Parse category preference (from spending if available, otherwise direct keyword)
+    if parsed_data['spending']:
+        largest_category = None
+        max_spend = -1
+        for cat, amount in parsed_data['spending'].items():
+            if amount > max_spend:
+                max_spend = amount
+                largest_category = cat
+        parsed_data['category_preference'] = largest_category
+    else:
+        for keyword, category in CATEGORY_KEYWORDS:
+            if keyword in keywords:
+                parsed_data['category_preference'] = category
+                break
+
+    # Parse perks preference
+    for keyword, perk_type in PERK_KEYWORDS:
+        if keyword in keywords:
+            parsed_data['perks_preference'] = perk_type
+            break
+
+    logger.debug("Parsed query", extra={'parsed': parsed_data})
+    return parsed_data
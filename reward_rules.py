@@ -0,0 +1,121 @@
+import json
+
+from card_model import Card
+
+# Spending categories that earn at a card's category rate when the user spends on them.
+SPENDING_CATEGORIES = ('online_shopping', 'groceries', 'fuel', 'dining', 'travel')
+
+# Kinds of compiled reward steps, evaluated in the card's original rule order.
+CATEGORY_STEP = 'category'
+MERCHANT_STEP = 'merchant'
+ALL_OTHER_STEP = 'all_other'
+
+
+class RewardPlan:
+    """
+    A card's `reward_rate` JSON compiled once into the lookups the recommender needs.
+
+    Attributes:
+        steps (tuple): (kind, category_type, rate, condition) for every rule that can earn
+                       rewards, in the same order as the card's rule list.
+        category_rates (dict): category -> summed rate percent for the plain spending categories.
+        merchants (frozenset): Lowercased merchants named by any 'specific_merchants' rule.
+        cap (float or None): Monthly cap on spending rewards.
+        cap_raw: The cap exactly as stored, used when formatting the reasoning text.
+        coverage (dict): user spending category -> number of non-'all_other_spends' rules that
+                         cover it. 'all_other_spends' pays on total spend minus covered spend.
+        covered_categories (frozenset): The keys of `coverage`.
+        filter_categories (frozenset): Lowercased category types, for category preference checks.
+    """
+    __slots__ = ('steps', 'category_rates', 'merchants', 'cap', 'cap_raw', 'coverage',
+                 'covered_categories', 'filter_categories', 'all_other_rate')
+
+    def __init__(self, steps, category_rates, merchants, cap_raw, coverage, filter_categories, all_other_rate):
+        self.steps = tuple(steps)
+        self.category_rates = category_rates
+        self.merchants = frozenset(merchants)
+        self.cap_raw = cap_raw
+        self.cap = float(cap_raw) if cap_raw is not None else None
+        self.coverage = coverage
+        self.covered_categories = frozenset(coverage)
+        self.filter_categories = frozenset(filter_categories)
+        self.all_other_rate = all_other_rate
+
+    def matches_category(self, category_preference):
+        """
+        True if the card has a rule for `category_preference`. Cards with merchant-specific
+        rules count as online shopping cards.
+        """
+        category_lower = category_preference.lower()
+        if category_lower in self.filter_categories:
+            return True
+        return category_preference == 'online_shopping' and 'specific_merchants' in self.filter_categories
+
+    def covered_spend(self, user_spending):
+        """
+        Spending already counted by category or merchant rules, as subtracted by 'all_other_spends'.
+        """
+        coverage = self.coverage
+        return sum(amount * coverage[category] for category, amount in user_spending.items() if category in coverage)
+
+
+def compile_reward_plan(reward_rate):
+    """
+    Compiles a card's reward rules into a RewardPlan.
+
+    Args:
+        reward_rate (str or dict): The card's `reward_rate` column (JSON text) or the
+                                   already-decoded rules.
+
+    Returns:
+        RewardPlan: The compiled plan.
+
+    Raises:
+        ValueError, TypeError: If the JSON or a rule's rate is malformed.
+    """
+    rules = json.loads(reward_rate) if isinstance(reward_rate, str) else reward_rate
+
+    steps = []
+    category_rates = {}
+    merchants = set()
+    coverage = {}
+    filter_categories = set()
+    all_other_rate = 0.0
+
+    for rule in rules.get('rewards', []):
+        category_type = rule.get('category_type')
+        rate = float(rule.get('rate_percent', 0.0))
+        filter_categories.add((category_type or '').lower())
+
+        if category_type in SPENDING_CATEGORIES:
+            steps.append((CATEGORY_STEP, category_type, rate, ''))
+            category_rates[category_type] = category_rates.get(category_type, 0.0) + rate
+        elif category_type == 'specific_merchants':
+            rule_merchants = {m.lower() for m in rule.get('merchants', [])}
+            merchants.update(rule_merchants)
+            # Only Amazon merchant rules are applied to online shopping spend.
+            if 'amazon.in' in rule_merchants:
+                steps.append((MERCHANT_STEP, 'online_shopping', rate, rule.get('condition', '')))
+        elif category_type == 'all_other_spends':
+            steps.append((ALL_OTHER_STEP, category_type, rate, ''))
+            all_other_rate += rate
+
+        if category_type != 'all_other_spends':
+            coverage[category_type] = coverage.get(category_type, 0) + 1
+            if category_type == 'specific_merchants':
+                coverage['online_shopping'] = coverage.get('online_shopping', 0) + 1
+
+    return RewardPlan(steps, category_rates, merchants, rules.get('max_cashback_per_month'),
+                      coverage, filter_categories, all_other_rate)
+
+
+def get_reward_plan(card):
+    """
+    Returns the card's precompiled plan, compiling it on the spot for cards that did not
+    come from the catalog (or whose rules failed to compile at load time, in which case
+    the original error is raised again).
+    """
+    plan = card.reward_plan if isinstance(card, Card) else card.get('reward_plan')
+    if plan is None:
+        plan = compile_reward_plan(card.get('reward_rate', '{}'))
+    return plan
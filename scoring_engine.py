@@ -0,0 +1,264 @@
+import numpy as np
+
+from reward_rules import ALL_OTHER_STEP, SPENDING_CATEGORIES
+
+# top_k() only prunes with reward upper bounds once there are this many candidates per
+# requested card; below that, scoring everything exactly is cheaper.
+PRUNE_MIN_CANDIDATES_PER_K = 64
+# Slack on the upper bound so floating-point rounding can never prune a winner.
+UPPER_BOUND_SLACK = 1e-9
+# Largest profiles x cards matrix top_k_batch() scores at once. Scoring makes a few
+# temporaries of this size (float64, 8 MB each), so this bounds its memory.
+BATCH_MAX_MATRIX_ELEMENTS = 1_000_000
+
+
+class ScoringEngine:
+    """
+    Scores every card in a catalog snapshot at once with NumPy.
+
+    The compiled reward plans are laid out as a cards x categories rate matrix (plus a
+    matching coverage matrix for 'all_other_spends') and per-card vectors for the monthly
+    cap, fees and welcome bonus. Scoring a spending profile is then a couple of
+    matrix-vector products instead of a Python loop over cards and rules.
+
+    Cards whose rules failed to compile are marked invalid and never returned, matching
+    the per-card loop that skipped cards whose reward calculation raised.
+    """
+    def __init__(self, cards):
+        """
+        Args:
+            cards (sequence of Card): Catalog cards; reward_plan is None for rules that failed to compile.
+        """
+        plans = [card.reward_plan for card in cards]
+
+        categories = list(SPENDING_CATEGORIES)
+        for plan in plans:
+            if plan is None:
+                continue
+            for category in plan.covered_categories:
+                if category not in categories and isinstance(category, str):
+                    categories.append(category)
+        category_index = {category: i for i, category in enumerate(categories)}
+
+        n_cards, n_categories = len(plans), len(categories)
+        rates = np.zeros((n_cards, n_categories))
+        coverage = np.zeros((n_cards, n_categories))
+        other_rates = np.zeros(n_cards)
+        caps = np.full(n_cards, np.inf)
+        valid = np.zeros(n_cards, dtype=bool)
+
+        for row, plan in enumerate(plans):
+            if plan is None:
+                continue
+            valid[row] = True
+            for kind, category, rate, _ in plan.steps:
+                if kind != ALL_OTHER_STEP:
+                    # Merchant rules pay on online shopping spend, like a second online rate.
+                    rates[row, category_index[category]] += rate
+            for category, count in plan.coverage.items():
+                if category in category_index:
+                    coverage[row, category_index[category]] = count
+            other_rates[row] = plan.all_other_rate
+            if plan.cap is not None:
+                caps[row] = plan.cap
+
+        self._set_arrays(
+            categories, rates, coverage, other_rates, caps, valid,
+            joining_fees=np.array([card.joining_fee for card in cards], dtype=float),
+            annual_fees=np.array([card.annual_fee for card in cards], dtype=float),
+            welcome_bonuses=np.array([card.welcome_bonus_value for card in cards], dtype=float))
+
+    @classmethod
+    def from_arrays(cls, categories, rates, coverage, other_rates, caps, valid, joining_fees, annual_fees, welcome_bonuses):
+        """
+        Builds an engine over precomputed arrays (see arrays()), e.g. memory-mapped from a
+        binary catalog file, without looking at any card.
+        """
+        engine = cls.__new__(cls)
+        engine._set_arrays(categories, rates, coverage, other_rates, caps, valid, joining_fees, annual_fees, welcome_bonuses)
+        return engine
+
+    def _set_arrays(self, categories, rates, coverage, other_rates, caps, valid, joining_fees, annual_fees, welcome_bonuses):
+        self.categories = tuple(categories)
+        self.category_index = {category: i for i, category in enumerate(self.categories)}
+        self.rates = rates
+        self.coverage = coverage
+        self.other_rates = other_rates
+        self.caps = caps
+        self.valid = valid
+        self.joining_fees = joining_fees
+        self.annual_fees = annual_fees
+        self.welcome_bonuses = welcome_bonuses
+        self.first_year_offsets = welcome_bonuses - joining_fees - annual_fees
+        # Best rate a card pays on any spend: its top category rate plus its all-other rate.
+        self.max_rates = (rates.max(axis=1, initial=0.0) + other_rates) if len(valid) else np.zeros(0)
+
+    def arrays(self):
+        """
+        The engine's inputs, as accepted by from_arrays().
+        """
+        return {
+            'categories': self.categories,
+            'rates': self.rates,
+            'coverage': self.coverage,
+            'other_rates': self.other_rates,
+            'caps': self.caps,
+            'valid': self.valid,
+            'joining_fees': self.joining_fees,
+            'annual_fees': self.annual_fees,
+            'welcome_bonuses': self.welcome_bonuses,
+        }
+
+    def __len__(self):
+        return len(self.valid)
+
+    def spending_matrix(self, spendings):
+        """
+        Lays spending dicts out along the engine's category axis, one row per profile.
+
+        Returns:
+            tuple: (profiles x categories spend matrix, per-profile total spend including
+                    categories the catalog has no rules for)
+        """
+        spend = np.zeros((len(spendings), len(self.categories)))
+        totals = np.zeros(len(spendings))
+        for row, user_spending in enumerate(spendings):
+            for category, amount in user_spending.items():
+                column = self.category_index.get(category)
+                if column is not None:
+                    spend[row, column] = amount
+            totals[row] = sum(user_spending.values())
+        return spend, totals
+
+    def _monthly_rewards(self, spend, totals, indices):
+        """
+        Monthly spending rewards for every (profile, card) pair as a profiles x cards matrix.
+        """
+        # Category rules only pay on categories the user actually spends on.
+        positive_spend = np.where(spend > 0, spend, 0.0)
+        monthly = positive_spend @ self.rates[indices].T / 100
+        uncovered = totals[:, None] - spend @ self.coverage[indices].T
+        monthly += np.where(uncovered > 0, uncovered * self.other_rates[indices] / 100, 0.0)
+        return np.minimum(monthly, self.caps[indices])
+
+    def _valid_indices(self, card_indices):
+        if card_indices is None:
+            return np.flatnonzero(self.valid)
+        indices = np.asarray(card_indices, dtype=np.intp)
+        return indices[self.valid[indices]]
+
+    def score(self, user_spending, card_indices=None):
+        """
+        Computes rewards for many cards at once.
+
+        Args:
+            user_spending (dict): Monthly spend per category.
+            card_indices (array-like, optional): Rows to score. Defaults to every card.
+
+        Returns:
+            dict: 'indices' (the valid rows scored) and, aligned with them, arrays for
+                  'monthly_rewards', 'net_rewards_first_year' and 'net_rewards_subsequent_years'.
+        """
+        indices = self._valid_indices(card_indices)
+        spend, totals = self.spending_matrix([user_spending])
+        monthly = self._monthly_rewards(spend, totals, indices)[0]
+
+        annual = monthly * 12
+        annual_fees = self.annual_fees[indices]
+        return {
+            'indices': indices,
+            'monthly_rewards': monthly,
+            'net_rewards_first_year': annual + self.welcome_bonuses[indices] - self.joining_fees[indices] - annual_fees,
+            'net_rewards_subsequent_years': annual - annual_fees,
+        }
+
+    def upper_bounds(self, user_spending, indices):
+        """
+        An upper bound on first-year net rewards for each row in `indices`, from one
+        multiply per card instead of the full rate matrix product: no card can pay more
+        than its best rate on all spend, or more than its cap.
+
+        Returns None when the bound does not hold (negative spend amounts).
+        """
+        amounts = list(user_spending.values())
+        if any(amount < 0 for amount in amounts):
+            return None
+        total = float(sum(amounts))
+        monthly = np.minimum(total * self.max_rates[indices] / 100, self.caps[indices])
+        bound = monthly * 12 + self.first_year_offsets[indices]
+        return bound + np.abs(bound) * UPPER_BOUND_SLACK + UPPER_BOUND_SLACK
+
+    def top_k(self, user_spending, k, card_indices=None):
+        """
+        Returns the rows of the `k` best cards by first-year net rewards, best first.
+        Ties keep catalog order, as the stable sort over the full list did.
+
+        With many candidates, the k cards with the highest upper bounds are scored
+        exactly first; their k-th best reward is a floor the winners must reach, so only
+        cards whose upper bound reaches it are scored exactly too.
+        """
+        indices = self._valid_indices(card_indices)
+        if k > 0 and len(indices) >= k * PRUNE_MIN_CANDIDATES_PER_K:
+            bounds = self.upper_bounds(user_spending, indices)
+            if bounds is not None:
+                probe = np.argpartition(-bounds, k - 1)[:k]
+                floor = self.score(user_spending, indices[probe])['net_rewards_first_year'].min()
+                # Keep catalog order so ties still resolve as they would without pruning.
+                indices = indices[bounds >= floor]
+        scores = self.score(user_spending, indices)
+        return _top_k_rows(scores['indices'], scores['net_rewards_first_year'], k)
+
+    def rank(self, user_spending, card_indices=None):
+        """
+        Returns every valid card row ordered by first-year net rewards, best first.
+        """
+        scores = self.score(user_spending, card_indices)
+        order = np.argsort(-scores['net_rewards_first_year'], kind='stable')
+        return scores['indices'][order]
+
+    def top_k_batch(self, spendings, k, candidate_lists, chunk_size=256):
+        """
+        Ranks cards for many spending profiles at once.
+
+        Profiles are scored as a profiles x cards matrix over only the cards some profile
+        in it can get, up to `chunk_size` profiles at a time and fewer when needed to keep
+        the matrix within BATCH_MAX_MATRIX_ELEMENTS, so memory stays bounded for large
+        catalogs.
+
+        Args:
+            spendings (list of dict): One spending dict per profile.
+            k (int): Cards to keep per profile.
+            candidate_lists (list): Per profile, the card rows that passed its filters.
+
+        Returns:
+            list of numpy arrays: The top-k card rows for each profile, best first.
+        """
+        results = []
+        start = 0
+        while start < len(spendings):
+            # Take profiles while the matrix over the union of their cards stays in budget.
+            scored = np.zeros(len(self.valid), dtype=bool)
+            chunk, union_size = [], 0
+            for candidates in candidate_lists[start:start + chunk_size]:
+                indices = self._valid_indices(candidates)
+                if chunk and (len(chunk) + 1) * (union_size + len(indices)) > BATCH_MAX_MATRIX_ELEMENTS:
+                    break
+                scored[indices] = True
+                union_size = np.count_nonzero(scored)
+                chunk.append(indices)
+            rows = np.flatnonzero(scored)
+            spend, totals = self.spending_matrix(spendings[start:start + len(chunk)])
+            first_year = self._monthly_rewards(spend, totals, rows) * 12 + self.first_year_offsets[rows]
+            for row, indices in enumerate(chunk):
+                results.append(_top_k_rows(indices, first_year[row, np.searchsorted(rows, indices)], k))
+            start += len(chunk)
+        return results
+
+
+def _top_k_rows(indices, values, k):
+    if len(values) > k:
+        kth_best = np.partition(values, len(values) - k)[len(values) - k]
+        keep = np.flatnonzero(values >= kth_best)
+        indices, values = indices[keep], values[keep]
+    order = np.argsort(-values, kind='stable')[:k]
+    return indices[order]
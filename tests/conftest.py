@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the repository root; the synthetic catalog generator
+# lives with the benchmarks.
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+@pytest.fixture
+def catalog():
+    """
+    Serves main's routes from a small seeded synthetic catalog instead of MySQL.
+    """
+    import main
+    from synthetic_data import SyntheticCatalogSource, generate_cards
+
+    store = main.card_catalog.db_manager
+    main.card_catalog.db_manager = SyntheticCatalogSource(generate_cards(300, seed=7))
+    main.card_catalog.load()
+    main.invalidate_caches()
+    yield main.card_catalog.snapshot
+    main.card_catalog.db_manager = store
+    main.invalidate_caches()
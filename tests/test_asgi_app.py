@@ -0,0 +1,51 @@
+"""
+The ASGI app keeps the blocking recommendation work off its event loop.
+"""
+import threading
+
+import pytest
+
+pytest.importorskip('starlette')
+from starlette.testclient import TestClient
+
+import asgi_app
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def loaded():
+        pass
+
+    monkeypatch.setattr(asgi_app.catalog_loader, 'ensure_loaded', loaded)
+    # Not used as a context manager: no lifespan, so no catalog load or refresh task.
+    return TestClient(asgi_app.app)
+
+
+def test_handlers_run_in_the_threadpool(monkeypatch, client):
+    calls = []
+    loop_threads = []
+
+    def recommend(*args, **kwargs):
+        calls.append(threading.current_thread())
+        return {'recommendations': []}, 200, False
+
+    def portfolio(*args, **kwargs):
+        calls.append(threading.current_thread())
+        return {'portfolio': []}, 200
+
+    def recording_json_response(body, status=200):
+        # Runs on the event loop, after the handler.
+        loop_threads.append(threading.current_thread())
+        return json_response(body, status)
+
+    json_response = asgi_app.json_response
+    monkeypatch.setattr(main, 'handle_recommend_request', recommend)
+    monkeypatch.setattr(main, 'handle_portfolio_request', portfolio)
+    monkeypatch.setattr(asgi_app, 'json_response', recording_json_response)
+
+    assert client.post('/recommend', json={'query': 'I earn 90000 a month'}).json() == {'recommendations': []}
+    assert client.post('/recommend/portfolio', json={'query': 'I earn 90000 a month'}).json() == {'portfolio': []}
+    assert len(calls) == len(loop_threads) == 2
+    for handler_thread, loop_thread in zip(calls, loop_threads):
+        assert handler_thread is not loop_thread
@@ -0,0 +1,73 @@
+"""
+Binary catalog files: write_binary_catalog(), BinaryCatalog and BinaryCatalogStore.
+"""
+import pytest
+
+import main
+from binary_catalog import (FORMAT_VERSION, HEADER, MAGIC, BinaryCatalog, BinaryCatalogError,
+                            BinaryCatalogStore, write_binary_catalog)
+from card_catalog import CardCatalog
+from synthetic_data import SyntheticCatalogSource, generate_cards
+
+
+def test_mapped_catalog_matches_the_row_catalog(tmp_path):
+    path = str(tmp_path / 'catalog.bin')
+    rows = generate_cards(120, seed=23)
+    meta = write_binary_catalog(rows, path)
+
+    mapped = BinaryCatalog(path)
+    assert mapped.version == meta['version'] and mapped.card_count == len(rows)
+    expected = CardCatalog(SyntheticCatalogSource(rows))
+    expected.load()
+    assert [card.columns() for card in mapped.cards()] == [card.columns() for card in expected.snapshot.cards]
+
+    snapshot = mapped.snapshot()
+    for income in (0, 25000, 60000, 150000):
+        parsed_query = {'income': income, 'reward_preference': None, 'category_preference': 'fuel',
+                        'perks_preference': 'lounge'}
+        assert [card.id for card in main.select_candidates(snapshot, parsed_query)] == \
+            [card.id for card in main.select_candidates(expected.snapshot, parsed_query)]
+
+
+def test_rebuilt_file_is_remapped_on_refresh(tmp_path):
+    path = str(tmp_path / 'catalog.bin')
+    first = write_binary_catalog(generate_cards(30, seed=1), path)
+    store = BinaryCatalogStore(path)
+    catalog = CardCatalog(store)
+    catalog.load()
+    assert catalog.snapshot.version == first['version']
+    assert not catalog.refresh_if_changed()
+
+    rows = generate_cards(35, seed=2)
+    second = write_binary_catalog(rows, path)
+    assert second['version'] != first['version']
+    assert store.fetch_catalog_version() == second['version']
+    assert catalog.refresh_if_changed()
+    assert catalog.snapshot.version == second['version']
+    assert [card.name for card in catalog.snapshot.cards] == [row['name'] for row in rows]
+    assert store.stats()['maps'] == 2
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = tmp_path / 'catalog.bin'
+    write_binary_catalog(generate_cards(30, seed=3), str(path))
+    data = path.read_bytes()
+    for size in (0, HEADER.size - 1, HEADER.size, len(data) // 2, len(data) - 1):
+        path.write_bytes(data[:size])
+        with pytest.raises(BinaryCatalogError):
+            BinaryCatalog(str(path))
+
+
+def test_foreign_and_other_version_files_are_rejected(tmp_path):
+    path = tmp_path / 'catalog.bin'
+    write_binary_catalog(generate_cards(30, seed=4), str(path))
+    data = path.read_bytes()
+    _, _, toc_offset, toc_length = HEADER.unpack_from(data)
+
+    path.write_bytes(b'SQLite f' + data[len(MAGIC):])
+    with pytest.raises(BinaryCatalogError, match="not a binary catalog"):
+        BinaryCatalog(str(path))
+
+    path.write_bytes(HEADER.pack(MAGIC, FORMAT_VERSION + 1, toc_offset, toc_length) + data[HEADER.size:])
+    with pytest.raises(BinaryCatalogError, match=f"format version {FORMAT_VERSION + 1}"):
+        BinaryCatalog(str(path))
@@ -0,0 +1,51 @@
+"""
+CardCatalog loading and its background refresher.
+"""
+import threading
+import time
+
+from card_catalog import CardCatalog
+from synthetic_data import SyntheticCatalogSource, generate_cards
+
+
+class SlowSource(SyntheticCatalogSource):
+    """
+    A synthetic catalog whose full load takes a while and is counted.
+    """
+    def __init__(self, cards):
+        super().__init__(cards)
+        self.loads = 0
+
+    def fetch_all_credit_cards(self):
+        self.loads += 1
+        time.sleep(0.05)
+        return super().fetch_all_credit_cards()
+
+
+def refresh_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'card-catalog-refresh']
+
+
+def test_concurrent_first_requests_load_once_and_start_one_refresher():
+    source = SlowSource(generate_cards(50, seed=2))
+    catalog = CardCatalog(source, refresh_interval=3600)
+    before = len(refresh_threads())
+    barrier = threading.Barrier(8)
+    snapshots = []
+
+    def first_request():
+        barrier.wait()
+        snapshots.append(catalog.snapshot)
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    try:
+        assert source.loads == 1
+        assert len(snapshots) == 8 and all(snapshot is snapshots[0] for snapshot in snapshots)
+        assert len(refresh_threads()) == before + 1
+    finally:
+        catalog.stop()
+    assert len(refresh_threads()) == before
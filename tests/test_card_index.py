@@ -0,0 +1,48 @@
+"""
+The inverted bitset index (card_index.CardIndex) selects exactly the cards the per-card
+filter_cards loop does.
+"""
+import random
+
+import main
+from synthetic_data import PERKS, REWARD_TYPES, SPENDING_CATEGORIES
+
+REWARD_PREFERENCES = (None, '') + REWARD_TYPES + tuple(reward_type.lower() for reward_type in REWARD_TYPES) + \
+    ('miles', 'points', 'lounge')
+CATEGORY_PREFERENCES = (None, '') + SPENDING_CATEGORIES + ('online shopping', 'food', 'shopping', 'entertainment')
+# Each perk text and the parser's keywords, plus wording that matches no card.
+PERK_PREFERENCES = (None, '') + tuple(perk.split(' ({')[0].split(' Rs')[0] for perk in PERKS) + \
+    ('lounge', 'lounge access', 'fuel surcharge waiver', 'dining offers', 'amazon prime', 'voucher', 'metal card')
+
+
+def filter_loop(snapshot, parsed_query):
+    return [card for card in snapshot.cards if main.filter_cards([card], parsed_query)]
+
+
+def test_select_candidates_matches_filter_cards(catalog):
+    rng = random.Random(13)
+    min_incomes = sorted({card.min_income for card in catalog.cards})
+    # Every card's minimum income exactly, and just either side of it.
+    incomes = [0] + [income + delta for income in min_incomes for delta in (-1, 0, 1)] + [10 ** 9]
+
+    queries = [{'income': income, 'reward_preference': None, 'category_preference': None, 'perks_preference': None}
+               for income in incomes]
+    for income in incomes[::3]:
+        queries += [dict(queries[0], income=income, reward_preference=value) for value in REWARD_PREFERENCES]
+        queries += [dict(queries[0], income=income, category_preference=value) for value in CATEGORY_PREFERENCES]
+        queries += [dict(queries[0], income=income, perks_preference=value) for value in PERK_PREFERENCES]
+    for _ in range(2000):
+        queries.append({
+            'income': rng.choice(incomes),
+            'reward_preference': rng.choice(REWARD_PREFERENCES),
+            'category_preference': rng.choice(CATEGORY_PREFERENCES),
+            'perks_preference': rng.choice(PERK_PREFERENCES),
+        })
+
+    selected_any = 0
+    for parsed_query in queries:
+        expected = filter_loop(catalog, parsed_query)
+        assert main.select_candidates(catalog, parsed_query) == expected, parsed_query
+        selected_any += bool(expected)
+    # The queries exercise the index, not only its empty results.
+    assert selected_any > len(queries) // 4
@@ -0,0 +1,61 @@
+"""
+Card: immutable, slotted, and read as the parse_card_row dict it replaces.
+"""
+import pickle
+
+import pytest
+
+from card_catalog import parse_card_row
+from card_model import TYPED_CARD_FIELDS, Card, CardBuilder
+from synthetic_data import generate_cards
+
+
+@pytest.fixture
+def cards():
+    builder = CardBuilder()
+    return [builder.build(parse_card_row(row), index) for index, row in enumerate(generate_cards(50, seed=24))]
+
+
+def test_cards_are_immutable(cards):
+    card = cards[0]
+    for field in ('name', 'min_income', 'reward_type_lower', 'reward_plan', 'catalog_index', 'brand_new'):
+        with pytest.raises(AttributeError, match="immutable"):
+            setattr(card, field, 1)
+        with pytest.raises(AttributeError, match="immutable"):
+            delattr(card, field)
+    with pytest.raises(TypeError):
+        card['name'] = 'Other'
+
+
+def test_cards_are_slotted(cards):
+    assert not hasattr(cards[0], '__dict__')
+    assert '__dict__' not in Card.__slots__
+    # Every card of a load shares one schema.
+    assert len({id(card._schema) for card in cards}) == 1
+
+
+def test_card_reads_as_its_parsed_row():
+    rows = generate_cards(50, seed=24)
+    builder = CardBuilder()
+    for index, row in enumerate(rows):
+        parsed = parse_card_row(row)
+        card = builder.build(parsed, index)
+        assert dict(card) == dict(parsed, catalog_index=index)
+        assert card.columns() == {key: value for key, value in parsed.items() if key != 'reward_plan'}
+        assert card.get('missing', 'default') == 'default' and 'missing' not in card
+        assert card.reward_type_lower == parsed['reward_type'].lower()
+        assert card.special_perks_lower == parsed['special_perks'].lower()
+
+
+def test_missing_typed_columns_read_their_defaults():
+    card = CardBuilder().build(parse_card_row({'id': 1, 'name': 'Bare'}), 0)
+    for field, default in TYPED_CARD_FIELDS:
+        if field not in ('id', 'name'):
+            assert getattr(card, field) == parse_card_row({}).get(field, default), field
+    assert card.special_perks_lower == '' and 'issuer' not in card
+
+
+def test_pickled_card_round_trips(cards):
+    card = pickle.loads(pickle.dumps(cards[3]))
+    assert card.columns() == cards[3].columns() and card.catalog_index == 3
+    assert card.min_income == cards[3].min_income and card.special_perks_lower == cards[3].special_perks_lower
@@ -0,0 +1,65 @@
+"""
+card_rules: the rows load_card_rules writes, and the codes the database filters use.
+"""
+import json
+
+import pytest
+
+from card_rules import categories_for, parse_reward_rules, perk_codes_for
+from query_parser import PERK_KEYWORDS
+from reward_rules import SPENDING_CATEGORIES, compile_reward_plan
+from synthetic_data import generate_cards
+
+
+def test_json_rules_match_the_in_memory_category_filter():
+    # A card has a card_reward_rules row for a category exactly when the catalog's
+    # category filter (RewardPlan.matches_category) accepts it.
+    for card in generate_cards(500, seed=3):
+        plan = compile_reward_plan(card['reward_rate'])
+        categories = {rule['category'] for rule in parse_reward_rules(card['reward_rate'])}
+        for category in SPENDING_CATEGORIES:
+            assert plan.matches_category(category) == bool(categories & set(categories_for(category))), (card['name'], category)
+
+
+def test_json_rules_rows():
+    reward_rate = json.dumps({'rewards': [
+        {'category_type': 'fuel', 'rate_percent': 5},
+        {'category_type': 'specific_merchants', 'merchants': ['Amazon.in', 'Flipkart'], 'rate_percent': 3},
+        {'category_type': 'movies', 'rate_percent': 10},
+        {'category_type': 'all_other_spends', 'rate_percent': 1},
+    ], 'max_cashback_per_month': 750.0})
+    assert parse_reward_rules(reward_rate) == [
+        {'category': 'fuel', 'rate': 5.0, 'cap': 750, 'merchant': None},
+        {'category': 'online_shopping', 'rate': 3.0, 'cap': 750, 'merchant': 'amazon.in'},
+        {'category': 'online_shopping', 'rate': 3.0, 'cap': 750, 'merchant': 'flipkart'},
+        {'category': 'all_other', 'rate': 1.0, 'cap': 750, 'merchant': None},
+    ]
+
+
+def test_legacy_text_rules_rows():
+    rows = parse_reward_rules("10 reward points per Rs 100 spent on Dining, Departmental Stores, Groceries & Movies. "
+                              "2 reward points per Rs 100 on all other spends. (Max Rs. 1,000 per month)")
+    assert rows == [
+        {'category': 'groceries', 'rate': 10.0, 'cap': 1000, 'merchant': None},
+        {'category': 'dining', 'rate': 10.0, 'cap': 1000, 'merchant': None},
+        {'category': 'all_other', 'rate': 2.0, 'cap': 1000, 'merchant': None},
+    ]
+
+
+@pytest.mark.parametrize('special_perk, codes', [
+    ('lounge access', ['lounge_access']),
+    ('  Lounge   Access ', ['lounge_access']),
+    ('vouchers', ['vouchers']),
+    ('Fee waivers', ['fee_waiver']),
+    # Narrower than the code: these keep the substring search on special_perks.
+    ('Amazon vouchers', []),
+    ('airport lounge access', []),
+    ('metal card', []),
+])
+def test_perk_codes_only_for_whole_phrases(special_perk, codes):
+    assert perk_codes_for(special_perk) == codes
+
+
+def test_parsed_perk_preferences_map_to_codes():
+    for _, perk_type in PERK_KEYWORDS:
+        assert perk_codes_for(perk_type), perk_type
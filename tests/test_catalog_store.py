@@ -0,0 +1,45 @@
+"""
+SQLite catalog files: export_catalog() and SQLiteCatalogStore.
+"""
+import os
+import sqlite3
+
+from card_catalog import CardCatalog
+from catalog_store import SQLiteCatalogStore, export_catalog
+from synthetic_data import SyntheticCatalogSource, generate_cards
+
+
+def test_export_round_trip(tmp_path):
+    path = str(tmp_path / 'catalog.sqlite3')
+    cards = generate_cards(40, seed=22)
+    meta = export_catalog(SyntheticCatalogSource(cards), path)
+    store = SQLiteCatalogStore(path)
+    assert store.fetch_catalog_version() == meta['version']
+    assert [row['name'] for row in store.fetch_all_credit_cards()] == [card['name'] for card in cards]
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+
+
+def test_reader_opened_before_an_export_sees_the_new_catalog(tmp_path):
+    path = str(tmp_path / 'catalog.sqlite3')
+    first = export_catalog(SyntheticCatalogSource(generate_cards(30, seed=1)), path)
+    store = SQLiteCatalogStore(path)
+    catalog = CardCatalog(store)
+    catalog.load()
+    assert catalog.snapshot.version == first['version']
+
+    # Left behind by an older export written in WAL mode.
+    for suffix in ('-wal', '-shm'):
+        with open(path + suffix, 'wb') as leftover:
+            leftover.write(b'\0' * 64)
+
+    cards = generate_cards(35, seed=2)
+    second = export_catalog(SyntheticCatalogSource(cards), path)
+    assert second['version'] != first['version']
+    assert not os.path.exists(path + '-wal') and not os.path.exists(path + '-shm')
+
+    assert catalog.refresh_if_changed()
+    assert catalog.snapshot.version == second['version']
+    assert [card.name for card in catalog.snapshot.cards] == [card['name'] for card in cards]
+    assert store.stats()['reopens'] == 1
+    assert not catalog.refresh_if_changed()
@@ -0,0 +1,93 @@
+"""
+DatabaseManager's ingest steps (load_card_rules, backfill_eligibility_columns) against a
+fake pool.
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from database_manager import DatabaseManager
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary=False):
+        self.connection = connection
+
+    def execute(self, query, params=()):
+        self.rows = self.connection.cards
+
+    def fetchall(self):
+        return self.rows
+
+    def executemany(self, query, rows):
+        if query.startswith('INSERT INTO card_perks') and self.connection.fail_on_perks:
+            raise self.connection.fail_on_perks
+        self.connection.statements.append(query)
+        self.connection.rows.append(list(rows))
+        self.rowcount = len(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cards, fail_on_perks=None):
+        self.cards = cards
+        self.fail_on_perks = fail_on_perks
+        self.statements = []
+        self.rows = []
+        self.events = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self, dictionary)
+
+    def start_transaction(self):
+        self.events.append('start')
+
+    def commit(self):
+        self.events.append('commit')
+
+    def rollback(self):
+        self.events.append('rollback')
+
+
+class FakePool:
+    def __init__(self, connection):
+        self._connection = connection
+
+    @contextmanager
+    def connection(self, timeout=None):
+        yield self._connection
+
+
+CARDS = [{'id': 1, 'reward_rate': '{"rewards": [{"category_type": "fuel", "rate_percent": 5}]}',
+          'special_perks': 'Airport lounge access'}]
+
+
+def manager(connection):
+    return DatabaseManager('localhost', 'user', 'password', 'cards', pool=FakePool(connection))
+
+
+def test_load_card_rules_commits():
+    connection = FakeConnection(CARDS)
+    assert manager(connection).load_card_rules() == (1, 1)
+    assert connection.events == ['start', 'commit']
+
+
+@pytest.mark.parametrize('error', [RuntimeError('driver bug'), KeyboardInterrupt()])
+def test_load_card_rules_rolls_back_on_any_error(error):
+    connection = FakeConnection(CARDS, fail_on_perks=error)
+    with pytest.raises(type(error)):
+        manager(connection).load_card_rules()
+    assert connection.events == ['start', 'rollback']
+
+
+def test_backfill_leaves_unparsed_criteria_alone(caplog):
+    connection = FakeConnection([
+        {'id': 1, 'eligibility_criteria': 'Salaried: Rs 3L p.a.'},
+        {'id': 2, 'eligibility_criteria': 'Must be a resident of India'},
+        {'id': 3, 'eligibility_criteria': None},
+    ])
+    assert manager(connection).backfill_eligibility_columns(only_missing=False) == 1
+    assert connection.rows == [[(25000, 300000, None, None, 1)]]
+    assert "'Must be a resident of India'" in caplog.text
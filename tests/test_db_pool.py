@@ -0,0 +1,131 @@
+"""
+ConnectionPool against fake connections, and the pools DatabaseManagers share.
+"""
+import itertools
+import os
+import threading
+import time
+
+import mysql.connector
+import pytest
+
+import database_manager
+import db_pool
+import main
+from db_pool import POOL_CONFIG, ConnectionPool, PoolTimeoutError, get_shared_pool
+
+_config_ids = itertools.count()
+
+
+class FakeConnection:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_connect(monkeypatch):
+    opened = []
+
+    def connect(**config):
+        connection = FakeConnection()
+        opened.append(connection)
+        return connection
+
+    monkeypatch.setattr(mysql.connector, 'connect', connect)
+    return opened
+
+
+def unique_config():
+    # A config no other test has used, so get_shared_pool creates a fresh pool.
+    return {'host': 'localhost', 'user': 'test', 'password': '', 'database': f"pool_test_{next(_config_ids)}"}
+
+
+def test_connections_are_reused(fake_connect):
+    pool = ConnectionPool({}, pool_size=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    assert len(fake_connect) == 1
+    assert pool.stats()['connections_reused'] == 1
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted():
+    pool = ConnectionPool({}, pool_size=1, acquire_timeout=5)
+    held = pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - started < 2
+    assert pool.stats()['acquire_timeouts'] == 1
+
+    # A waiting caller gets the connection as soon as it is released.
+    threading.Timer(0.05, pool.release, (held,)).start()
+    assert pool.acquire(timeout=5) is held
+
+
+def test_old_connections_are_recycled(fake_connect):
+    pool = ConnectionPool({}, max_lifetime_seconds=0.01)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.02)
+    second = pool.acquire()
+    assert second is not first and first.closed
+    assert pool.stats()['connections_recycled'] == 1
+
+
+def test_dead_idle_connections_are_replaced():
+    pool = ConnectionPool({}, health_check_interval=0)
+    first = pool.acquire()
+    pool.release(first)
+    first.connected = False
+    time.sleep(0.001)
+    assert pool.acquire() is not first
+    assert pool.stats()['health_check_failures'] == 1
+
+
+def test_connection_that_raised_a_driver_error_is_discarded():
+    pool = ConnectionPool({}, pool_size=1)
+    with pytest.raises(mysql.connector.Error):
+        with pool.connection() as connection:
+            raise mysql.connector.Error("lost connection")
+    assert connection.closed
+    assert pool.stats()['idle'] == 0 and pool.stats()['in_use'] == 0
+    with pool.connection() as replacement:
+        assert replacement is not connection
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork()")
+def test_forked_child_never_uses_the_parents_connections():
+    pool = get_shared_pool(unique_config())
+    inherited = pool.acquire()
+    pool.release(inherited)
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            connection = pool.acquire()
+            ok = connection is not inherited and not inherited.closed and pool.stats()['in_use'] == 1
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert pool.acquire() is inherited
+
+
+def test_both_database_managers_share_one_pool_with_pool_config(caplog):
+    config = unique_config()
+    manager = database_manager.DatabaseManager(config['host'], config['user'], config['password'], config['database'])
+    assert main.DatabaseManager(config).pool is manager.pool
+    assert manager.pool.options() == POOL_CONFIG
+
+    assert get_shared_pool(config, pool_size=POOL_CONFIG['pool_size'] + 1) is manager.pool
+    assert "ignoring" in caplog.text
+    assert db_pool.get_shared_pool(config).pool_size == POOL_CONFIG['pool_size']
@@ -0,0 +1,58 @@
+"""
+Minimum income parsed out of eligibility_criteria text.
+"""
+import os
+import re
+
+import pytest
+
+from eligibility import parse_eligibility_criteria
+
+SEED_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Credit_card_advisor_db.sql')
+# The criteria seeded by Credit_card_advisor_db.sql, with the values
+# migrations/001_eligibility_income_columns.sql backfills for them.
+SEEDED = {
+    'Salaried: Gross Monthly Income > Rs 35,000; Self-Employed: ITR > Rs 6 Lakhs p.a.': (35000, 420000, 50000, 600000),
+    'Salaried: Age 21-60, Net Monthly Income > Rs 30,000; Self-Employed: Age 25-65, ITR > Rs 6 Lakhs p.a.':
+        (30000, 360000, 50000, 600000),
+    'Salaried: Minimum Net Monthly Income Rs. 15,000; Self-Employed: Minimum ITR Rs. 3 Lakhs p.a.':
+        (15000, 180000, 25000, 300000),
+}
+
+
+def columns(text):
+    parsed = parse_eligibility_criteria(text)
+    return (parsed['salaried_min_monthly_income'], parsed['salaried_min_annual_income'],
+            parsed['self_employed_min_monthly_income'], parsed['self_employed_min_annual_income'])
+
+
+def test_seed_sql_matches_the_migration_backfill():
+    with open(SEED_SQL, encoding='utf-8') as seed:
+        seeded = re.findall(r"'(Salaried:[^']*)'", seed.read())
+    assert sorted(seeded) == sorted(SEEDED)
+    for text, expected in SEEDED.items():
+        assert columns(text) == expected, text
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Lakh shorthand and p.a.
+    ('Salaried: Rs 3L p.a.', (25000, 300000, None, None)),
+    ('Salaried: Rs 3 L', (25000, 300000, None, None)),
+    ('Salaried: 4.5 lac p.a.; Self-employed: ITR of 6 lakh', (37500, 450000, 50000, 600000)),
+    ('Income: 3 Lakhs per annum', (25000, 300000, 25000, 300000)),
+    ('Min. income 25k per month', (25000, 300000, 25000, 300000)),
+    ('Income > Rs 1.2 Cr p.a.', (1000000, 12000000, 1000000, 12000000)),
+    # The amount before the word "income".
+    ('Rs. 3,00,000 annual income for salaried', (25000, 300000, None, None)),
+    ('35000 net monthly income', (35000, 420000, 35000, 420000)),
+    ('Self-Employed: Rs 5 Lakhs ITR', (None, None, 41667, 500000)),
+    # Ages and tenures are not income.
+    ('Salaried: Age 21-60, Net Monthly Income > Rs 30,000', (30000, 360000, None, None)),
+])
+def test_income_wordings(text, expected):
+    assert columns(text) == expected
+
+
+@pytest.mark.parametrize('text', [None, '', 'Age 21-60', 'Resident of India, 2 years in business'])
+def test_no_income(text):
+    assert columns(text) == (None, None, None, None)
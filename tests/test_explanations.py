@@ -0,0 +1,116 @@
+"""
+LLM explanations end to end: HTTPBackend against a fake local LLM server, the
+ExplanationService budget, and "explain": true on /recommend.
+"""
+import json
+import re
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import agent
+import main
+from explanations import ExplanationService
+from llm_client import CachedLLMClient, HTTPBackend
+
+CARD_LINE = re.compile(r"^Card: (?P<name>.*) by ", re.MULTILINE)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """
+    Answers {"text": "Explained: <card name>"}. Cards named "Slow ..." answer after
+    server.delay seconds; cards named "Broken ..." get a 500.
+    """
+    def do_POST(self):
+        prompt = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['prompt']
+        self.server.prompts.append(prompt)
+        match = CARD_LINE.search(prompt)
+        name = match.group('name') if match else prompt
+        if name.startswith('Slow'):
+            time.sleep(self.server.delay)
+        if name.startswith('Broken'):
+            self.send_error(500)
+            return
+        body = json.dumps({'text': f"Explained: {name}"}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def llm_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLMHandler)
+    server.daemon_threads = True
+    server.prompts = []
+    server.delay = 0.5
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/generate"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def recommendation(name):
+    return {'name': name, 'issuer': 'Test Bank', 'reward_type': 'Cashback', 'reasoning': 'n/a'}
+
+
+def test_http_backend_round_trip(llm_server):
+    backend = HTTPBackend(llm_server.url, timeout=5)
+    assert backend('Card: Alpha by Test Bank') == 'Explained: Alpha'
+    assert llm_server.prompts == ['Card: Alpha by Test Bank']
+    with pytest.raises(urllib.error.HTTPError):
+        backend('Card: Broken by Test Bank')
+
+
+def test_http_backend_times_out(llm_server):
+    llm_server.delay = 1.0
+    with pytest.raises(OSError):
+        HTTPBackend(llm_server.url, timeout=0.1)('Card: Slow by Test Bank')
+
+
+def test_explanations_attach_within_the_budget(llm_server):
+    client = CachedLLMClient(HTTPBackend(llm_server.url), fallback=lambda prompt: None)
+    service = ExplanationService(client.generate, budget_seconds=0.2, top_n=3)
+    recommendations = [recommendation(name) for name in ('Alpha', 'Slow Beta', 'Broken Gamma', 'Delta')]
+
+    explanations, pending = service.collect(service.start(recommendations, {'income': 50000}))
+    assert explanations == {0: 'Explained: Alpha'}
+    assert list(pending.values()) == [1]
+    # The slow one can still be streamed once it finishes.
+    assert list(service.iter_late(pending, timeout=5)) == [(1, 'Explained: Slow Beta')]
+    assert service.stats() == {'requested': 3, 'attached': 1, 'streamed': 1, 'dropped': 1}
+    assert client.stats()['errors'] == 1
+
+
+def test_recommend_with_explain(monkeypatch, tmp_path, catalog, llm_server):
+    monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'llm_cache.sqlite3'))
+    monkeypatch.setattr(agent, '_backend', HTTPBackend(llm_server.url))
+    monkeypatch.setattr(agent, '_llm_client', None)
+    monkeypatch.setattr(main, '_explanation_service', None)
+
+    client = main.app.test_client()
+    query = {'query': 'I earn 90000 a month and spend 4000 on fuel'}
+    plain = client.post('/recommend', json=query).get_json()
+    explained = client.post('/recommend', json=dict(query, explain=True)).get_json()
+
+    recommendations = explained['recommendations']
+    assert recommendations
+    assert [card['name'] for card in recommendations] == [card['name'] for card in plain['recommendations']]
+    top_n = main.EXPLANATION_CONFIG['top_n']
+    for card in recommendations[:top_n]:
+        assert card['explanation'] == f"Explained: {card['name']}"
+    assert not any('explanation' in card for card in recommendations[top_n:])
+    assert len(llm_server.prompts) == min(top_n, len(recommendations))
+
+    # Answered from the prompt cache the second time.
+    client.post('/recommend', json=dict(query, explain=True))
+    assert len(llm_server.prompts) == min(top_n, len(recommendations))
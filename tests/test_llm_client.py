@@ -0,0 +1,122 @@
+"""
+CachedLLMClient: caching, coalescing of identical prompts and time-boxed calls.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from llm_client import DEFAULT_FALLBACK_RESPONSE, CachedLLMClient, PromptCache
+
+
+class StubBackend:
+    """
+    Answers "answer: <prompt>", optionally only once `release` is set.
+    """
+    model_name = 'stub'
+
+    def __init__(self, release=None):
+        self.release = release
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        if self.release is not None:
+            self.release.wait(5)
+        return f"answer: {prompt}"
+
+
+class ImmediateExecutor:
+    """
+    Runs submitted calls in the caller's thread, so the future is already done when
+    CachedLLMClient registers its done callback.
+    """
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def run_with_deadline(fn, seconds=5):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(fn()), daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "call did not return (deadlock?)"
+    return results[0]
+
+
+def wait_until(condition, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_backend_that_finishes_before_the_callback_is_registered():
+    client = CachedLLMClient(StubBackend())
+    client._executor = ImmediateExecutor()
+    assert run_with_deadline(lambda: client.generate('hello')) == 'answer: hello'
+    assert client.stats()['in_flight'] == 0
+
+
+def test_cache_hit_skips_the_backend():
+    backend = StubBackend()
+    client = CachedLLMClient(backend, cache=PromptCache(':memory:'))
+    assert client.generate('hello') == 'answer: hello'
+    assert client.generate('hello') == 'answer: hello'
+    assert backend.prompts == ['hello']
+    stats = client.stats()
+    assert (stats['calls'], stats['cache_hits']) == (1, 1)
+    assert stats['cache']['size'] == 1
+
+
+def test_cache_is_per_model():
+    cache = PromptCache(':memory:')
+    CachedLLMClient(StubBackend(), cache=cache).generate('hello')
+    other = StubBackend()
+    CachedLLMClient(other, model_name='other', cache=cache).generate('hello')
+    assert other.prompts == ['hello']
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    release = threading.Event()
+    backend = StubBackend(release)
+    client = CachedLLMClient(backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.generate('hello'))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: client.stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['answer: hello'] * 5
+    assert backend.prompts == ['hello']
+    assert client.stats()['in_flight'] == 0
+
+
+def test_slow_call_times_out_to_the_fallback_and_is_not_cached():
+    release = threading.Event()
+    cache = PromptCache(':memory:')
+    client = CachedLLMClient(StubBackend(release), cache=cache, timeout=0.05,
+                             fallback=lambda prompt: f"fallback: {prompt}")
+    started = time.monotonic()
+    assert client.generate('hello') == 'fallback: hello'
+    assert time.monotonic() - started < 2
+    assert client.stats()['timeouts'] == 1
+    release.set()
+    wait_until(lambda: client.stats()['in_flight'] == 0)
+    # The late answer is cached for the next caller.
+    assert client.generate('hello') == 'answer: hello'
+
+
+@pytest.mark.parametrize('backend', [lambda prompt: None, lambda prompt: 1 / 0])
+def test_no_answer_or_error_returns_the_fallback_uncached(backend):
+    cache = PromptCache(':memory:')
+    client = CachedLLMClient(backend, model_name='stub', cache=cache)
+    assert client.generate('hello') == DEFAULT_FALLBACK_RESPONSE
+    assert cache.stats()['size'] == 0
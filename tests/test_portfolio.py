@@ -0,0 +1,120 @@
+"""
+PortfolioOptimizer's branch-and-bound search against brute-force enumeration.
+"""
+import itertools
+import json
+import random
+
+import pytest
+
+import main
+from card_catalog import parse_card_row
+from card_model import CardBuilder
+from portfolio import PORTFOLIO_OBJECTIVES, PortfolioOptimizer
+from reward_rules import SPENDING_CATEGORIES
+from scoring_engine import ScoringEngine
+
+# 'utilities' is paid by 'all_other_spends' rules only.
+USER_CATEGORIES = SPENDING_CATEGORIES + ('utilities',)
+RESULT_FIELD = {'first_year': 'net_rewards_first_year', 'subsequent_years': 'net_rewards_subsequent_years'}
+
+
+def random_row(rng, card_id):
+    rules = []
+    for category in rng.sample(SPENDING_CATEGORIES, rng.randint(0, 3)):
+        rules.append({'category_type': category, 'rate_percent': rng.choice([1, 2, 5, 10])})
+    if rng.random() < 0.3:
+        rules.append({'category_type': 'specific_merchants', 'rate_percent': rng.choice([3, 5]),
+                      'merchants': rng.choice([['Amazon.in'], ['Flipkart']])})
+    if rng.random() < 0.6:
+        rules.append({'category_type': 'all_other_spends', 'rate_percent': rng.choice([0.5, 1, 1.5, 2])})
+    rng.shuffle(rules)
+    reward_rate = {'rewards': rules}
+    if rng.random() < 0.5:
+        reward_rate['max_cashback_per_month'] = rng.choice([50, 150, 400, 1000])
+    return {
+        'id': card_id, 'name': f"Card {card_id}", 'reward_rate': json.dumps(reward_rate),
+        'joining_fee': rng.choice([0, 500, 1000]), 'annual_fee': rng.choice([0, 500, 2500]),
+        'welcome_bonus_value': rng.choice([0, 500, 3000]),
+    }
+
+
+def build_catalog(rng, n_cards):
+    builder = CardBuilder()
+    return [builder.build(parse_card_row(random_row(rng, card_id)), card_id) for card_id in range(n_cards)]
+
+
+def random_spending(rng):
+    return {category: rng.choice([500, 2000, 8000, 25000])
+            for category in rng.sample(USER_CATEGORIES, rng.randint(1, 4))}
+
+
+def brute_force(cards, user_spending, max_cards, objective):
+    """
+    The best total over every routing of the categories to at most `max_cards` cards,
+    each card valued by calculate_estimated_rewards on the spending routed to it.
+    """
+    categories = list(user_spending)
+    best = None
+    for routing in itertools.product(range(len(cards)), repeat=len(categories)):
+        held = {}
+        for category, card in zip(categories, routing):
+            held.setdefault(card, {})[category] = user_spending[category]
+        if len(held) > max_cards:
+            continue
+        value = sum(main.calculate_estimated_rewards(cards[card], spending)[RESULT_FIELD[objective]]
+                    for card, spending in held.items())
+        best = value if best is None else max(best, value)
+    return best
+
+
+@pytest.mark.parametrize('objective', PORTFOLIO_OBJECTIVES)
+@pytest.mark.parametrize('max_cards', [1, 2, 3])
+def test_optimize_matches_brute_force(objective, max_cards):
+    rng = random.Random(f"{objective}-{max_cards}")
+    for _ in range(25):
+        cards = build_catalog(rng, rng.randint(1, 7))
+        user_spending = random_spending(rng)
+        result = PortfolioOptimizer(ScoringEngine(cards), user_spending, objective=objective).optimize(max_cards)
+
+        assert result['optimal']
+        assert result['value'] == pytest.approx(brute_force(cards, user_spending, max_cards, objective), abs=1e-6)
+        # The routing is a real portfolio worth what it claims.
+        routing = result['routing']
+        assert 1 <= len(routing) <= max_cards
+        assert sorted(category for categories in routing.values() for category in categories) == sorted(user_spending)
+        value = sum(main.calculate_estimated_rewards(cards[card], {category: user_spending[category]
+                                                                   for category in categories})[RESULT_FIELD[objective]]
+                    for card, categories in routing.items())
+        assert value == pytest.approx(result['value'], abs=1e-6)
+
+
+def test_caps_and_several_all_other_cards():
+    rows = [
+        # A capped high rate, and two catch-all cards with different rates.
+        {'id': 0, 'name': 'Capped', 'reward_rate': json.dumps({'rewards': [
+            {'category_type': 'groceries', 'rate_percent': 10}, {'category_type': 'dining', 'rate_percent': 10}],
+            'max_cashback_per_month': 300})},
+        {'id': 1, 'name': 'Other 2%', 'reward_rate': json.dumps({'rewards': [
+            {'category_type': 'all_other_spends', 'rate_percent': 2}]}), 'annual_fee': 500},
+        {'id': 2, 'name': 'Other 1%', 'reward_rate': json.dumps({'rewards': [
+            {'category_type': 'all_other_spends', 'rate_percent': 1}, {'category_type': 'fuel', 'rate_percent': 5}]})},
+    ]
+    builder = CardBuilder()
+    cards = [builder.build(parse_card_row(row), row['id']) for row in rows]
+    user_spending = {'groceries': 3000, 'dining': 4000, 'fuel': 6000, 'utilities': 10000, 'travel': 5000}
+    for objective in PORTFOLIO_OBJECTIVES:
+        for max_cards in (1, 2, 3):
+            result = PortfolioOptimizer(ScoringEngine(cards), user_spending, objective=objective).optimize(max_cards)
+            assert result['value'] == pytest.approx(brute_force(cards, user_spending, max_cards, objective), abs=1e-6)
+
+
+def test_cards_are_not_added_for_their_welcome_bonus_alone():
+    rows = [
+        {'id': 0, 'name': 'Earner', 'reward_rate': json.dumps({'rewards': [{'category_type': 'fuel', 'rate_percent': 5}]})},
+        {'id': 1, 'name': 'Bonus only', 'reward_rate': json.dumps({'rewards': []}), 'welcome_bonus_value': 5000},
+    ]
+    builder = CardBuilder()
+    cards = [builder.build(parse_card_row(row), row['id']) for row in rows]
+    result = PortfolioOptimizer(ScoringEngine(cards), {'fuel': 10000}).optimize(2)
+    assert result['routing'] == {0: ['fuel']}
@@ -0,0 +1,51 @@
+"""
+Validation of pre-parsed profiles and queries (/recommend/batch items and /recommend/portfolio).
+"""
+import math
+
+import pytest
+
+import main
+
+
+def test_valid_profile_is_normalized():
+    parsed = main.parse_user_profile({'income': '50000', 'spending': {'fuel': 2000, 'dining': 500.5},
+                                      'reward_preference': 'cashback'})
+    assert parsed == {'income': 50000.0, 'spending': {'fuel': 2000.0, 'dining': 500.5},
+                      'reward_preference': 'cashback', 'category_preference': 'fuel', 'perks_preference': None}
+
+
+@pytest.mark.parametrize('profile', [
+    [],
+    {'income': 50000, 'spending': [100]},
+    {'income': True},
+    {'income': 50000, 'spending': {'fuel': False}},
+    {'income': 'lots'},
+    {'income': math.nan},
+    {'income': 50000, 'spending': {'fuel': math.inf}},
+    {'income': 50000, 'spending': {'fuel': '-inf'}},
+    {'income': 50000, 'reward_preference': 5},
+    {'income': 50000, 'category_preference': {'fuel': 1}},
+    {'income': 50000, 'perks_preference': ['lounge']},
+])
+def test_invalid_profile_is_rejected(profile):
+    with pytest.raises(ValueError):
+        main.parse_user_profile(profile)
+
+
+def test_invalid_batch_item_is_a_400_entry(catalog):
+    client = main.app.test_client()
+    response = client.post('/recommend/batch', json={'items': [{'profile': {'income': 50000, 'reward_preference': 5}}]})
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [
+        {'index': 0, 'status': 400, 'error': "Profile 'reward_preference' must be a string."}]
+
+
+@pytest.mark.parametrize('query', [123, ['a'], {'text': 'I earn 50000'}, True])
+def test_non_string_batch_query_is_a_400_entry(catalog, query):
+    client = main.app.test_client()
+    response = client.post('/recommend/batch', json={'items': [{'query': query}, 'I earn 90000 a month']})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0] == {'index': 0, 'status': 400, 'error': "'query' must be a string."}
+    assert results[1]['status'] == 200
@@ -0,0 +1,190 @@
+"""
+Parity of the compiled reward plans with the per-rule calculation they replaced.
+
+legacy_estimated_rewards is calculate_estimated_rewards as it was before reward plans:
+it decodes reward_rate and walks the rule list on every call. Random cards and spending
+profiles must get exactly the same numbers and reasoning from the compiled path, for
+plain row dicts and for catalog Cards.
+"""
+import json
+import random
+
+import pytest
+
+import main
+from card_catalog import parse_card_row
+from card_model import CardBuilder
+from reward_rules import SPENDING_CATEGORIES, compile_reward_plan
+from scoring_engine import ScoringEngine
+
+# Rule categories the generator draws from: the paid categories, merchant rules, the
+# catch-all, and one type no user spending matches.
+RULE_CATEGORIES = SPENDING_CATEGORIES + ('specific_merchants', 'all_other_spends', 'movies')
+# Spending categories: the paid ones plus some only 'all_other_spends' pays on.
+USER_CATEGORIES = SPENDING_CATEGORIES + ('utilities', 'rent', 'specific_merchants')
+
+
+def legacy_estimated_rewards(card_data, user_spending):
+    monthly_cashback_from_spending = 0.0
+    reasoning_parts = []
+    card_reward_rules = json.loads(card_data.get('reward_rate', '{}'))
+
+    for category_rule in card_reward_rules.get('rewards', []):
+        category_type = category_rule.get('category_type')
+        rate = float(category_rule.get('rate_percent', 0.0))
+
+        if category_type in SPENDING_CATEGORIES and user_spending.get(category_type, 0) > 0:
+            monthly_spend = user_spending[category_type]
+            cashback_from_category = (monthly_spend * rate) / 100
+            monthly_cashback_from_spending += cashback_from_category
+            reasoning_parts.append(f"{cashback_from_category:.2f} cashback from {category_type} ({monthly_spend:.2f} spent at {rate}%)")
+
+        elif category_type == 'specific_merchants' and user_spending.get('online_shopping', 0) > 0:
+            merchants = category_rule.get('merchants', [])
+            if "amazon.in" in [m.lower() for m in merchants]:
+                monthly_spend = user_spending['online_shopping']
+                condition = category_rule.get('condition', '')
+                cashback_from_category = (monthly_spend * rate) / 100
+                monthly_cashback_from_spending += cashback_from_category
+                reasoning_parts.append(f"{cashback_from_category:.2f} cashback from specific merchants (e.g., Amazon) ({monthly_spend:.2f} spent at {rate}% {condition})")
+
+        elif category_type == 'all_other_spends':
+            total_user_spending = sum(user_spending.values())
+            covered_spending = 0
+            for r in card_reward_rules.get('rewards', []):
+                if r.get('category_type') != 'all_other_spends':
+                    for k, v in user_spending.items():
+                        if k == r.get('category_type') or \
+                           (k == 'online_shopping' and r.get('category_type') == 'specific_merchants'):
+                            covered_spending += v
+            uncovered_spend = total_user_spending - covered_spending
+            if uncovered_spend > 0:
+                cashback_from_category = (uncovered_spend * rate) / 100
+                monthly_cashback_from_spending += cashback_from_category
+                reasoning_parts.append(f"{cashback_from_category:.2f} cashback from all other spends ({uncovered_spend:.2f} spent at {rate}%)")
+
+    max_cashback_per_month = card_reward_rules.get('max_cashback_per_month')
+    if max_cashback_per_month is not None and monthly_cashback_from_spending > float(max_cashback_per_month):
+        monthly_cashback_from_spending = float(max_cashback_per_month)
+        reasoning_parts.append(f"Monthly spending rewards capped at card's monthly limit of {max_cashback_per_month:.2f}.")
+
+    annual_cashback_from_spending = monthly_cashback_from_spending * 12
+    joining_fee = float(card_data.get('joining_fee', 0.0))
+    annual_fee = float(card_data.get('annual_fee', 0.0))
+    welcome_bonus = float(card_data.get('welcome_bonus_value', 0.0))
+    net_rewards_first_year = (annual_cashback_from_spending + welcome_bonus) - joining_fee - annual_fee
+    net_rewards_subsequent_years = annual_cashback_from_spending - annual_fee
+
+    reasoning = "; ".join([p for p in reasoning_parts if p])
+    if welcome_bonus > 0:
+        reasoning += f"; Includes Welcome Bonus: +₹{welcome_bonus:.2f}"
+    if joining_fee > 0:
+        reasoning += f"; Deducts Joining Fee: -₹{joining_fee:.2f}"
+    if annual_fee > 0:
+        reasoning += f"; Deducts Annual Fee: -₹{annual_fee:.2f}"
+    if not reasoning:
+        reasoning = "No specific reward calculations applicable based on provided spending categories."
+
+    return {
+        'estimated_cashback_monthly_from_spending': monthly_cashback_from_spending,
+        'net_rewards_first_year': net_rewards_first_year,
+        'net_rewards_subsequent_years': net_rewards_subsequent_years,
+        'reasoning': reasoning
+    }
+
+
+def random_rule(rng):
+    category_type = rng.choice(RULE_CATEGORIES)
+    rule = {'category_type': category_type, 'rate_percent': rng.choice([0.5, 1, 1.5, 2, 5, 10])}
+    if category_type == 'specific_merchants':
+        merchants = rng.sample(['Amazon.in', 'Flipkart', 'Myntra', 'Swiggy'], rng.randint(0, 2))
+        rule['merchants'] = merchants
+        rule['condition'] = rng.choice(['', 'for Prime members'])
+    return rule
+
+
+def random_card(rng, card_id):
+    rules = {'rewards': [random_rule(rng) for _ in range(rng.randint(0, 5))]}
+    if rng.random() < 0.5:
+        rules['max_cashback_per_month'] = rng.choice([100, 250, 500.0, 1000, 5000])
+    return {
+        'id': card_id,
+        'name': f"Card {card_id}",
+        'reward_rate': json.dumps(rules),
+        'joining_fee': rng.choice([0, 499, 1000]),
+        'annual_fee': rng.choice([0, 499, 2500]),
+        'welcome_bonus_value': rng.choice([0, 500, 1500]),
+    }
+
+
+def random_spending(rng):
+    # Whole rupee amounts, so both sides sum them without rounding differences.
+    return {category: rng.choice([0, 100, 1500, 4000, 12000])
+            for category in rng.sample(USER_CATEGORIES, rng.randint(0, len(USER_CATEGORIES)))}
+
+
+def as_card(row):
+    return CardBuilder().build(parse_card_row(row), 0)
+
+
+def assert_same(row, user_spending):
+    expected = legacy_estimated_rewards(row, user_spending)
+    assert main.calculate_estimated_rewards(row, user_spending) == expected
+    assert main.calculate_estimated_rewards(as_card(row), user_spending) == expected
+
+
+def test_random_cards_match_legacy_calculation():
+    rng = random.Random(20240603)
+    for card_id in range(500):
+        row = random_card(rng, card_id)
+        for _ in range(10):
+            assert_same(row, random_spending(rng))
+
+
+def test_all_other_spends_does_not_pay_on_covered_categories():
+    row = random_card(random.Random(0), 1)
+    row['reward_rate'] = json.dumps({'rewards': [
+        {'category_type': 'all_other_spends', 'rate_percent': 1},
+        {'category_type': 'groceries', 'rate_percent': 5},
+        {'category_type': 'groceries', 'rate_percent': 2},
+        {'category_type': 'specific_merchants', 'merchants': ['Amazon.in'], 'rate_percent': 3},
+        {'category_type': 'all_other_spends', 'rate_percent': 0.5},
+    ]})
+    user_spending = {'groceries': 2000, 'online_shopping': 3000, 'utilities': 10000}
+    assert_same(row, user_spending)
+    # Groceries are covered twice, so the uncovered spend goes negative and nothing is paid on it.
+    assert_same(row, {'groceries': 8000, 'utilities': 1000})
+
+
+def test_merchant_rule_without_amazon_pays_nothing_but_still_covers_online_shopping():
+    row = random_card(random.Random(0), 2)
+    row['reward_rate'] = json.dumps({'rewards': [
+        {'category_type': 'specific_merchants', 'merchants': ['Flipkart'], 'rate_percent': 10},
+        {'category_type': 'all_other_spends', 'rate_percent': 1},
+    ]})
+    user_spending = {'online_shopping': 5000, 'fuel': 1000}
+    assert_same(row, user_spending)
+    result = main.calculate_estimated_rewards(row, user_spending)
+    assert result['estimated_cashback_monthly_from_spending'] == 10.0 # 1% of the fuel spend only
+
+
+def test_no_cap():
+    row = random_card(random.Random(0), 3)
+    row['reward_rate'] = json.dumps({'rewards': [{'category_type': 'travel', 'rate_percent': 10}],
+                                     'max_cashback_per_month': None})
+    assert compile_reward_plan(row['reward_rate']).cap is None
+    assert_same(row, {'travel': 100000})
+
+
+def test_uncompilable_plan_raises_like_legacy_and_is_never_scored():
+    row = random_card(random.Random(0), 4)
+    row['reward_rate'] = '{"rewards": [{"category_type": "fuel", "rate_percent": "lots"}]}'
+    with pytest.raises(ValueError):
+        legacy_estimated_rewards(row, {'fuel': 1000})
+    card = as_card(row)
+    assert card.reward_plan is None
+    with pytest.raises(ValueError):
+        main.calculate_estimated_rewards(card, {'fuel': 1000})
+    with pytest.raises(ValueError):
+        main.calculate_estimated_rewards(row, {'fuel': 1000})
+    assert not ScoringEngine([card]).valid[0]
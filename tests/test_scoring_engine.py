@@ -0,0 +1,73 @@
+"""
+ScoringEngine.top_k with upper-bound pruning returns the head of the full ranking, and
+/recommend validates "top_k".
+"""
+import random
+
+import numpy as np
+import pytest
+
+import main
+from card_catalog import parse_card_row
+from card_model import CardBuilder
+from scoring_engine import PRUNE_MIN_CANDIDATES_PER_K, ScoringEngine
+from synthetic_data import SPENDING_CATEGORIES, generate_cards
+
+
+@pytest.fixture(scope='module')
+def engine():
+    rows = generate_cards(1500, seed=14)
+    # Every card twice, so ties are everywhere and must resolve in catalog order.
+    rows += [dict(row, id=row['id'] + len(rows), name=f"{row['name']} (copy)") for row in rows]
+    builder = CardBuilder()
+    return ScoringEngine([builder.build(parse_card_row(row), index) for index, row in enumerate(rows)])
+
+
+def full_ranking(engine, user_spending, indices):
+    # Every candidate scored, then a stable sort: ties keep catalog order.
+    scores = engine.score(user_spending, indices)
+    return scores['indices'][np.argsort(-scores['net_rewards_first_year'], kind='stable')]
+
+
+def random_spending(rng):
+    return {category: rng.choice([0, 500, 3000, 12000, 40000])
+            for category in rng.sample(SPENDING_CATEGORIES, rng.randint(0, len(SPENDING_CATEGORIES)))}
+
+
+def test_pruned_top_k_is_the_head_of_the_full_ranking(engine):
+    rng = random.Random(14)
+    n_cards = len(engine.valid)
+    # Large enough that k up to 23 over the whole catalog takes the pruned path.
+    assert n_cards >= 23 * PRUNE_MIN_CANDIDATES_PER_K
+    for _ in range(200):
+        user_spending = random_spending(rng)
+        size = rng.choice([0, 1, 7, 300, n_cards // 2, n_cards])
+        indices = np.array(sorted(rng.sample(range(n_cards), size)), dtype=np.intp)
+        for k in (1, 3, 10, 23, 50, size + 5):
+            expected = full_ranking(engine, user_spending, indices)[:k]
+            assert engine.top_k(user_spending, k, indices).tolist() == expected.tolist(), (user_spending, size, k)
+
+
+def test_top_k_over_the_whole_catalog(engine):
+    user_spending = {'fuel': 4000, 'groceries': 9000}
+    expected = full_ranking(engine, user_spending, None)
+    for k in (1, 3, 50, len(expected) + 1):
+        assert engine.top_k(user_spending, k).tolist() == expected[:k].tolist()
+
+
+@pytest.mark.parametrize('top_k', [0, -1, main.MAX_TOP_K + 1, 2.5, 3.0, '3', True, [3], {'k': 3}])
+def test_invalid_top_k_is_a_400(top_k):
+    response = main.app.test_client().post(
+        '/recommend', json={'query': 'I earn 90000 a month and spend 4000 on fuel', 'top_k': top_k})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': f"'top_k' must be an integer between 1 and {main.MAX_TOP_K}."}
+
+
+def test_top_k_larger_than_the_candidates(catalog):
+    query = 'I earn 30000 a month and spend 4000 on fuel'
+    candidates = main.select_candidates(catalog, main.parse_user_query(query))
+    assert 0 < len(candidates) < main.MAX_TOP_K
+    response = main.app.test_client().post('/recommend', json={'query': query, 'top_k': main.MAX_TOP_K})
+    assert response.status_code == 200
+    names = [recommendation['name'] for recommendation in response.get_json()['recommendations']]
+    assert sorted(names) == sorted(card.name for card in candidates)
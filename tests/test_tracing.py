@@ -0,0 +1,33 @@
+"""
+Per-card traces forced through the debug header.
+"""
+import main
+from app_logging import card_trace_enabled
+
+
+def traced_requests(monkeypatch, header_value):
+    seen = []
+    select_candidates = main.select_candidates
+
+    def recording_select_candidates(snapshot, parsed_query):
+        seen.append(card_trace_enabled())
+        return select_candidates(snapshot, parsed_query)
+
+    monkeypatch.setattr(main, 'select_candidates', recording_select_candidates)
+    headers = {} if header_value is None else {main.TRACE_HEADER: header_value}
+    response = main.app.test_client().post(
+        '/recommend', json={'query': 'I earn 90000 a month and spend 4000 on fuel'}, headers=headers)
+    assert response.status_code == 200
+    return seen
+
+
+def test_header_is_ignored_without_a_secret(monkeypatch, catalog):
+    monkeypatch.setattr(main, 'TRACE_HEADER_SECRET', None)
+    assert traced_requests(monkeypatch, '1') == [False]
+
+
+def test_header_must_match_the_secret(monkeypatch, catalog):
+    monkeypatch.setattr(main, 'TRACE_HEADER_SECRET', 's3cret')
+    assert traced_requests(monkeypatch, '1') == [False]
+    main.invalidate_caches()
+    assert traced_requests(monkeypatch, 's3cret') == [True]